@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""cell_compilation_benchmark.py: measures per-step latency of recurrent models (forward and backward) with cells executed in eager mode, compiled with TorchScript and with torch.compile.
+
+Every measurement is performed in a separate process, so the (process-wide) parameters and compilation caches of the previous ones do not affect it.
+
+Run from the main directory: python -m models.cell_compilation_benchmark
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import time
+import multiprocessing
+import torch
+
+from utils.app_state import AppState
+from utils.param_interface import ParamInterface
+from models.model_factory import ModelFactory
+from problems.problem import DataTuple
+
+# Parameters of the benchmarked models.
+MODEL_PARAMS = {
+    'ntm': {'num_control_bits': 3, 'num_data_bits': 8,
+            'controller': {'name': 'rnn', 'hidden_state_size': 20,
+                           'num_layers': 1, 'non_linearity': 'sigmoid'},
+            'interface': {'num_read_heads': 1, 'shift_size': 3},
+            'memory': {'num_content_bits': 15, 'num_addresses': 30}},
+    'dnc': {'control_bits': 3, 'data_bits': 8, 'hidden_state_dim': 20,
+            'memory_content_size': 15, 'memory_addresses_size': 30,
+            'num_writes': 1, 'num_reads': 1, 'shift_size': 3,
+            'controller_type': 'lstm', 'use_ntm_write': False,
+            'use_ntm_read': False, 'use_ntm_order': False,
+            'use_extra_write_gate': False, 'non_linearity': 'sigmoid',
+            'plot_memory': False},
+    'dwm': {'control_bits': 3, 'data_bits': 8, 'hidden_state_dim': 5,
+            'memory_content_size': 10, 'memory_addresses_size': 30,
+            'num_heads': 1, 'use_content_addressing': False,
+            'shift_size': 3, 'plot_memory': False},
+    'thalnet': {'context_input_size': 32, 'input_size': 11, 'output_size': 8,
+                'center_size_per_module': 32, 'num_modules': 4}}
+
+
+def step_latency(name, compile_cells, seq_length, batch_size, repeats):
+    """
+    Measures average latency of a single step (forward and backward) of the
+    model.
+
+    :returns: Latency [ms].
+    """
+    AppState().set_dtype('float')
+    AppState().set_itype('int')
+    torch.manual_seed(0)
+    params = ParamInterface()
+    params.add_custom_params(MODEL_PARAMS[name])
+    params.add_custom_params({'name': name})
+    if compile_cells:
+        params.add_custom_params({'compile_cells': compile_cells})
+    model = ModelFactory.build_model(params)
+
+    inputs = torch.bernoulli(0.5 * torch.ones(batch_size, seq_length, 11))
+    data_tuple = DataTuple(inputs, None)
+
+    def training_step():
+        model.zero_grad()
+        model(data_tuple).sum().backward()
+
+    # Warm-up (compilation).
+    training_step()
+    start = time.time()
+    for _ in range(repeats):
+        training_step()
+    return 1000 * (time.time() - start) / (repeats * seq_length)
+
+
+if __name__ == "__main__":
+    seq_length = 20
+    batch_size = 16
+    repeats = 10
+
+    modes = ['', 'script', 'compile']
+
+    # Fresh process for every measurement.
+    pool_context = multiprocessing.get_context('spawn')
+
+    print("{:>8} {:>14} {:>14} {:>14}".format(
+        'model', 'eager [ms]', 'script [ms]', 'compile [ms]'))
+    for name in ['ntm', 'dnc', 'dwm', 'thalnet']:
+        latencies = []
+        for mode in modes:
+            with pool_context.Pool(1) as pool:
+                latencies.append(pool.apply(
+                    step_latency,
+                    (name, mode, seq_length, batch_size, repeats)))
+        print("{:>8} {:>14.3f} {:>14.3f} {:>14.3f}".format(name, *latencies))
@@ -6,7 +6,7 @@ from .memory import Memory
 from .memory_usage import MemoryUsage
 from .param_gen import Param_Generator
 from .plot_data import plot_memory_attention, plot_memory
-from .temporal_linkage import TemporalLinkageState, TemporalLinkage
+from .temporal_linkage import TemporalLinkageState, SparseLink, TemporalLinkage
 from .tensor_utils import normalize, sim, outer_prod, circular_conv
 
 __all__ = [
@@ -21,6 +21,7 @@ __all__ = [
     'plot_memory_attention',
     'plot_memory',
     'TemporalLinkageState',
+    'SparseLink',
     'TemporalLinkage',
     'normalize',
     'sim',
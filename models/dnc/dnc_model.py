@@ -19,7 +19,6 @@
 __author__ = " Ryan L. McAvoy"
 
 import numpy as np
-import torch
 
 import logging
 from models.sequential_model import SequentialModel
@@ -68,8 +67,6 @@ class DNC(SequentialModel):
 
         dtype = self.app_state.dtype
 
-        output = None
-
         if self.app_state.visualize:
             self.cell_state_history = []
 
@@ -86,31 +83,19 @@ class DNC(SequentialModel):
         # init state
         cell_state = self.DNCCell.init_state(memory_addresses_size, batch_size)
 
+        # This is for the time plot
+        def record_state_hook(cell_state):
+            self.cell_state_history.append(
+                (cell_state.memory_state.detach().cpu().numpy(),
+                 cell_state.int_init_state.usage.detach().cpu().numpy(),
+                 cell_state.int_init_state.links.precedence_weights.detach().cpu().numpy(),
+                 cell_state.int_init_state.read_weights.detach().cpu().numpy(),
+                 cell_state.int_init_state.write_weights.detach().cpu().numpy()))
+
         #cell_state = self.init_state(memory_addresses_size)
-        for j in range(seq_length):
-            output_cell, cell_state = self.DNCCell(
-                inputs[..., j, :], cell_state)
-
-            if output_cell is None:
-                continue
-
-            output_cell = output_cell[..., None, :]
-            if output is None:
-                output = output_cell
-            else:
-                output = torch.cat([output, output_cell], dim=-2)
-
-            # This is for the time plot
-            if self.app_state.visualize:
-                self.cell_state_history.append(
-                    (cell_state.memory_state.detach().cpu().numpy(),
-                     cell_state.int_init_state.usage.detach().cpu().numpy(),
-                     cell_state.int_init_state.links.precedence_weights.detach().cpu().numpy(),
-                     cell_state.int_init_state.read_weights.detach().cpu().numpy(),
-                     cell_state.int_init_state.write_weights.detach().cpu().numpy()))
-
-            # if self.plot_active:
-            #    self.plot_memory_attention(output, cell_state)
+        output, cell_state = self.run_recurrent(
+            self.DNCCell, inputs, cell_state,
+            record_state_hook if self.app_state.visualize else None)
 
         return output
 
@@ -62,9 +62,23 @@ class Interface:
         self.use_ntm_order = params['use_ntm_order']
         self.use_extra_write_gate = params['use_extra_write_gate']
 
-        self.mem_usage = MemoryUsage()
+        # Number of the least used memory slots considered during allocation
+        # (DEFAULT: 0, i.e. all slots - exact allocation).
+        if 'num_allocation_slots' not in params:
+            params.add_default_params({'num_allocation_slots': 0})
+        self._num_allocation_slots = params['num_allocation_slots']
 
-        self.temporal_linkage = TemporalLinkage(self._num_writes)
+        self.mem_usage = MemoryUsage(
+            num_allocation_slots=self._num_allocation_slots)
+
+        # Number of links kept per memory address - if positive, the link
+        # matrices are stored in the sparse form (DEFAULT: 0, i.e. dense).
+        if 'num_sparse_links' not in params:
+            params.add_default_params({'num_sparse_links': 0})
+        self._num_sparse_links = params['num_sparse_links']
+
+        self.temporal_linkage = TemporalLinkage(
+            self._num_writes, self._num_sparse_links)
 
     @property
     def read_size(self):
@@ -226,8 +240,8 @@ class Interface:
         time.
 
         :param link: A tensor of shape `[batch_size, num_writes, memory_size,
-              memory_size]` representing the previous link graphs for each write
-              head.
+              memory_size]` (or `SparseLink` tuple) representing the previous
+              link graphs for each write head.
         :param memory: the memory of the previous step (class)
         :param prev_read_weights: tensor of shape `[batch_size, num_reads,
               memory_size]` containing the previous read weights w_{t-1}^r.
@@ -270,7 +284,7 @@ class Interface:
 
         :param update_data: the parameters from the controllers [dictionary]
         :param prev_interface_tuple: Tuple [previous read, previous write, prev usage, prev links[
-        :param prev_memory_BxMxA: the memory of the previous step (class)
+        :param mem: the memory of the previous step [batch_size, content_size, memory_size] or its view (Memory)
         :return: The new interface tuple with an updated usage and write attention
 
         """
@@ -281,8 +295,8 @@ class Interface:
         key = update_data['read_content_keys']
         strength = update_data['read_content_strengths']
 
-        # retrieve memory Class
-        memory = Memory(mem)
+        # retrieve memory Class (reuse the view - if given)
+        memory = mem if isinstance(mem, Memory) else Memory(mem)
 
         # update the attention using either the NTM read mechanism (True) or
         # the DNC (False)
@@ -314,7 +328,7 @@ class Interface:
 
         :param update_data: the parameters from the controllers [dictionary]
         :param prev_interface_tuple: Tuple [previous read, previous write, prev usage, prev links]
-        :param prev_memory_BxMxA: the memory of the previous step (class)
+        :param mem: the memory of the previous step [batch_size, content_size, memory_size] or its view (Memory)
         :return: The new interface tuple with an updated usage and write attention
 
         """
@@ -328,8 +342,8 @@ class Interface:
         strength = update_data['write_content_strengths']
         gate = update_data['allocation_gate']
 
-        # retrieve memory Class
-        memory = Memory(mem)
+        # retrieve memory Class (reuse the view - if given)
+        memory = mem if isinstance(mem, Memory) else Memory(mem)
 
         free_gate = update_data['free_gate']
         usage = self.mem_usage.calculate_usage(
@@ -370,9 +384,13 @@ class Interface:
         (prev_read_attention, prev_write_attention,
          prev_usage, prev_links) = prev_interface_tuple
 
+        # View of the previous memory - shared by all heads using it, so the
+        # memory is normalized (for content addressing) only once.
+        prev_memory = Memory(prev_memory_BxMxA)
+
         # Step 1: update the write weights
         interface_tuple = self.update_write(
-            update_data, prev_interface_tuple, prev_memory_BxMxA)
+            update_data, prev_interface_tuple, prev_memory)
 
         # Step 2: Write and Erase Data
         memory_BxMxA = self.edit_memory(
@@ -381,12 +399,12 @@ class Interface:
         # Step 3: Update read weights using either the current or previous
         # memory
         if self.use_ntm_order:
-            read_memory_BxMxA = prev_memory_BxMxA
+            read_memory = prev_memory
         else:
-            read_memory_BxMxA = memory_BxMxA
+            read_memory = Memory(memory_BxMxA)
 
         interface_tuple = self.update_read(
-            update_data, interface_tuple, read_memory_BxMxA)
+            update_data, interface_tuple, read_memory)
 
         # Step 4: Read the data from memory
         read_vector_BxM = self.read(interface_tuple, memory_BxMxA)
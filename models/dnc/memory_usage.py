@@ -49,16 +49,20 @@ class MemoryUsage(object):
 
     The function `write_allocation_weights` can be invoked to get free locations to write to for a number of write heads.
 
+    For large memories the allocation can be approximated by considering only the `num_allocation_slots` least used slots (the remaining ones get zero allocation weights, whereas their exact weights are bounded by the product of usages of those slots).
+
     """
 
-    def __init__(self, name='MemoryUsage'):
+    def __init__(self, name='MemoryUsage', num_allocation_slots=0):
         """
         Creates a MemoryUsages module.
 
         :param name: Name of the module.
+        :param num_allocation_slots: Number of the least used slots considered during allocation (DEFAULT: 0, i.e. all slots - exact allocation).
 
         """
         super(MemoryUsage, self).__init__()
+        self._num_allocation_slots = num_allocation_slots
 
     def init_state(self, memory_address_size, batch_size):
         """
@@ -181,8 +185,17 @@ class MemoryUsage(object):
         # Ensure values are not too small prior to cumprod.
         usage = _EPSILON + (1 - _EPSILON) * usage
 
-        # sorts usage along the last index
-        sorted_usage, indices = torch.sort(usage, descending=False)
+        if 0 < self._num_allocation_slots < usage.shape[1]:
+            # approximate allocation - takes only the K least used slots (in
+            # ascending order), the remaining slots get zero weights
+            sorted_usage, indices = torch.topk(
+                usage, self._num_allocation_slots, dim=1, largest=False,
+                sorted=True)
+            unsorted_all = torch.zeros_like(usage)
+        else:
+            # sorts usage along the last index
+            sorted_usage, indices = torch.sort(usage, descending=False)
+            unsorted_all = usage.new(*usage.size())
         sorted_nonusage = 1 - sorted_usage
 
         # this computes the exclusive cumulative product
@@ -197,7 +210,6 @@ class MemoryUsage(object):
 
         # This final line "unsorts" sorted_allocation, so that the indexing
         # corresponds to the original indexing of `usage`.
-        unsorted_all = sorted_allocation.new(*sorted_allocation.size())
         unsorted_all.scatter_(1, indices, sorted_allocation)
 
         return unsorted_all
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""memory_usage_benchmark.py: compares the exact and the approximate (top-k) allocation of the DNC.
+
+First measures latency and error of the allocation weights for different memory sizes, then trains the DNC on dwm_baselines tasks with the exact and the approximate allocation and compares the final loss and accuracy (on the training and the validation problem of the task).
+
+Every training is performed in a separate process, so the (process-wide) parameters of the previous ones do not affect it.
+
+Run from the main directory: python -m models.dnc.memory_usage_benchmark
+
+"""
+__author__ = " Ryan L. McAvoy"
+
+import collections
+import multiprocessing
+import timeit
+import numpy as np
+import torch
+import yaml
+
+from utils.app_state import AppState
+from utils.param_interface import ParamInterface
+from utils.worker_utils import recurrent_config_parse
+from models.model_factory import ModelFactory
+from models.dnc.memory_usage import MemoryUsage
+from problems.problem_factory import ProblemFactory
+
+
+def allocation_latency(batch_size, num_writes, repeats):
+    """
+    Prints latency of the exact and the approximate allocation, along with
+    the error of the approximate allocation weights.
+    """
+    for memory_size in [256, 1024, 4096]:
+        exact = MemoryUsage()
+        write_gates = torch.ones(batch_size, num_writes, 1)
+        # Usage of an empty, half full and almost full memory.
+        for name, usage in [
+                ('empty', torch.rand(batch_size, memory_size) * 1e-3),
+                ('half', torch.rand(batch_size, memory_size)),
+                ('full', 1 - torch.rand(batch_size, memory_size) * 1e-2)]:
+            weights = exact.write_allocation_weights(usage, write_gates, num_writes)
+            t_exact = timeit.timeit(lambda: exact.write_allocation_weights(
+                usage, write_gates, num_writes), number=repeats) / repeats * 1000
+            print("N={} usage={} exact: {:.3f} ms".format(
+                memory_size, name, t_exact))
+
+            for num_allocation_slots in [16, 64]:
+                approx = MemoryUsage(num_allocation_slots=num_allocation_slots)
+                approx_weights = approx.write_allocation_weights(
+                    usage, write_gates, num_writes)
+                # L1 distance between the allocation weights, per write head.
+                error = (approx_weights - weights).abs().sum(-1).max().item()
+                t_approx = timeit.timeit(lambda: approx.write_allocation_weights(
+                    usage, write_gates, num_writes), number=repeats) / repeats * 1000
+                print("  K={}: {:.3f} ms (speedup {:.1f}), max L1 error {:.2e}".format(
+                    num_allocation_slots, t_approx, t_exact / t_approx, error))
+
+
+def train_dnc(config, num_allocation_slots, episodes, validation_batches):
+    """
+    Trains the DNC on the task (on CPU), with the optimizer and gradient
+    clipping set in the configuration. All the trainings see the same
+    batches and start from the same weights.
+
+    :param config: Name of the configuration file (dwm_baselines task).
+    :param num_allocation_slots: Number of slots considered during allocation (0: exact allocation).
+    :param episodes: Number of training episodes.
+    :param validation_batches: Number of batches of the validation problem.
+    :returns: Tuple (training loss, training accuracy, validation loss,
+        validation accuracy), training ones averaged over the last 100 episodes.
+    """
+    # Load the configuration (default ones first).
+    params = ParamInterface()
+    for config_file in reversed(recurrent_config_parse(config, [])):
+        with open(config_file, 'r') as stream:
+            params.add_custom_params(yaml.safe_load(stream))
+
+    AppState().set_dtype('float')
+    AppState().set_itype('int')
+    torch.manual_seed(0)
+    np.random.seed(0)
+
+    params['model'].add_custom_params(
+        {'num_allocation_slots': num_allocation_slots})
+    model = ModelFactory.build_model(params['model'])
+    params['training']['problem'].add_custom_params({'batch_seed': 1})
+    problem = ProblemFactory.build_problem(params['training']['problem'])
+    params['validation']['problem'].add_custom_params({'batch_seed': 2})
+    problem_validation = ProblemFactory.build_problem(
+        params['validation']['problem'])
+
+    optimizer_conf = dict(params['training']['optimizer'])
+    optimizer = getattr(torch.optim, optimizer_conf.pop('name'))(
+        model.parameters(), **optimizer_conf)
+    gradient_clipping = params['training']['gradient_clipping']
+
+    last_results = collections.deque(maxlen=100)
+    for episode in range(episodes):
+        data_tuple, aux_tuple = problem.generate_batch_for_episode(episode)
+        logits = model(data_tuple)
+        loss = problem.evaluate_loss(data_tuple, logits, aux_tuple)
+        optimizer.zero_grad()
+        loss.backward()
+        torch.nn.utils.clip_grad_value_(model.parameters(), gradient_clipping)
+        optimizer.step()
+        last_results.append((loss.item(), float(problem.calculate_accuracy(
+            data_tuple, logits, aux_tuple))))
+    loss, accuracy = np.mean(last_results, axis=0)
+
+    # Validation on fixed batches.
+    results = []
+    with torch.no_grad():
+        for episode in range(validation_batches):
+            data_tuple, aux_tuple = problem_validation.generate_batch_for_episode(
+                episode)
+            logits = model(data_tuple)
+            results.append((
+                problem_validation.evaluate_loss(
+                    data_tuple, logits, aux_tuple).item(),
+                float(problem_validation.calculate_accuracy(
+                    data_tuple, logits, aux_tuple))))
+    validation_loss, validation_accuracy = np.mean(results, axis=0)
+
+    return loss, accuracy, validation_loss, validation_accuracy
+
+
+if __name__ == "__main__":
+    # Compares the exact and the approximate (top-k) allocation.
+    allocation_latency(batch_size=32, num_writes=2, repeats=20)
+
+    # Training on the dwm_baselines tasks.
+    configs = ['configs/dwm_baselines/dnc/serial_recall.yaml',
+               'configs/dwm_baselines/dnc/reverse_recall.yaml']
+    episodes = 2000
+    validation_batches = 4
+
+    # Fresh process for every training.
+    pool_context = multiprocessing.get_context('spawn')
+
+    print("{:>24} {:>6} {:>10} {:>10} {:>10} {:>10}".format(
+        'task', 'K', 'loss', 'acc', 'val loss', 'val acc'))
+    for config in configs:
+        task = config.split('/')[-1][:-len('.yaml')]
+        for num_allocation_slots in [0, 4, 8]:
+            with pool_context.Pool(1) as pool:
+                results = pool.apply(
+                    train_dnc,
+                    (config, num_allocation_slots, episodes, validation_batches))
+            print("{:>24} {:>6} {:>10.4f} {:>10.4f} {:>10.4f} {:>10.4f}".format(
+                task, num_allocation_slots, *results))
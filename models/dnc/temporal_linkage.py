@@ -37,6 +37,25 @@ class TemporalLinkageState(_TemporalLinkageState):
     __slots__ = ()
 
 
+_SparseLink = collections.namedtuple(
+    'SparseLink', ('forward_indices', 'forward_values',
+                   'backward_indices', 'backward_values'))
+
+
+class SparseLink(_SparseLink):
+    """
+    Tuple storing the link graphs in the sparse mode. For every address it
+    keeps only the K strongest links of its row (forward) and of its column
+    (backward) of the link matrix, as pairs of tensors of shape
+    `[batch_size, num_writes, memory_size, K]`:
+
+    - forward: link[i, forward_indices[i, k]] = forward_values[i, k]
+    - backward: link[backward_indices[j, k], j] = backward_values[j, k]
+
+    """
+    __slots__ = ()
+
+
 class TemporalLinkage():
     """
     Keeps track of write order for forward and backward addressing. This is a
@@ -49,19 +68,29 @@ class TemporalLinkage():
     `directional_read_weights` computes addresses following the forward
     and backward directions in the link graphs.
 
+    In the sparse mode (num_links > 0) the link graphs are stored as
+    `SparseLink` tuples, keeping only the `num_links` strongest forward and
+    backward links of every address, so memory and compute grow linearly
+    with the number of addresses (instead of quadratically).
+
     """
 
-    def __init__(self, num_writes, name='temporal_linkage'):
+    def __init__(self, num_writes, num_links=0, name='temporal_linkage'):
         """
         Construct a TemporalLinkage module. Args:
 
         :param memory_size: The number of memory slots.
         :param num_writes: The number of write heads.
+        :param num_links: Number of links kept per address in the sparse mode (DEFAULT: 0, i.e. dense link matrices).
         :param name: Name of the module.
 
         """
         super(TemporalLinkage, self).__init__()
         self._num_writes = num_writes
+        self._num_links = num_links
+        # Masks zeroing the diagonals of link matrices, keyed by memory size
+        # (and type of tensor).
+        self._off_diagonal_masks = {}
 
     def init_state(self, memory_address_size, batch_size):
         """
@@ -73,15 +102,28 @@ class TemporalLinkage():
         """
         dtype = AppState().dtype
         self._memory_size = memory_address_size
+
+        precendence_weights = torch.ones(
+            (batch_size, self._num_writes, memory_address_size)).type(dtype) * 1e-6
+
+        if self._num_links > 0:
+            # Every address is linked with the first K addresses (with the
+            # same weights as in the dense mode).
+            num_links = min(self._num_links, memory_address_size)
+            indices = torch.arange(0, num_links).type(
+                AppState().LongTensor).view(1, 1, 1, num_links).expand(
+                batch_size, self._num_writes, memory_address_size,
+                num_links).contiguous()
+            values = torch.ones(indices.size()).type(dtype) * 1e-6
+            link = SparseLink(indices, values, indices.clone(), values.clone())
+            return TemporalLinkageState(link, precendence_weights)
+
         link = torch.ones(
             (batch_size,
              self._num_writes,
              memory_address_size,
              memory_address_size)).type(dtype) * 1e-6
 
-        precendence_weights = torch.ones(
-            (batch_size, self._num_writes, memory_address_size)).type(dtype) * 1e-6
-
         return TemporalLinkageState(link, precendence_weights)
 
     def calc_temporal_links(self, write_weights, prev_state):
@@ -101,8 +143,12 @@ class TemporalLinkage():
           link and precedence weights.
 
         """
-        link = self._link(prev_state.link, prev_state.precedence_weights,
-                          write_weights)
+        if self._num_links > 0:
+            link = self._sparse_link(
+                prev_state.link, prev_state.precedence_weights, write_weights)
+        else:
+            link = self._link(prev_state.link, prev_state.precedence_weights,
+                              write_weights)
         precedence_weights = self._precedence_weights(
             prev_state.precedence_weights, write_weights)
         return TemporalLinkageState(
@@ -127,6 +173,10 @@ class TemporalLinkage():
           :returns: tensor of shape `[batch_size, num_reads, num_writes, memory_size]`
 
         """
+        if isinstance(link, SparseLink):
+            return self._sparse_directional_read_weights(
+                link, prev_read_weights, forward)
+
         # We calculate the forward and backward directions for each pair of
         # read and write heads; hence we need to tile the read weights and do a
         # sort of "outer product" to get this.
@@ -161,7 +211,6 @@ class TemporalLinkage():
           containing the new link graphs for each write head.
 
         """
-        batch_size = prev_link.shape[0]
         write_weights_i = torch.unsqueeze(write_weights, 3)
         write_weights_j = torch.unsqueeze(write_weights, 2)
 
@@ -171,16 +220,171 @@ class TemporalLinkage():
         new_link = write_weights_i * prev_precedence_weights_j
         link = prev_link_scale * prev_link + new_link
         # Return the link with the diagonal set to zero, to remove self-looping
-        # edges.
-        # this is the messiest way to handle this. Need a better way to set equal to zero
-        # unfortunately the diag function in pytorch does not handle batches
-        for i in range(batch_size):
-            for j in range(self._num_writes):
-                diagonal = torch.diag(link[i, j, :, :])
-                link[i, j, :, :] = link[i, j, :, :] - torch.diag(diagonal)
+        # edges - the mask is broadcasted over all batches and write heads.
+        link = link * self._off_diagonal_mask(link.shape[-1])
 
         return link
 
+    def _off_diagonal_mask(self, memory_size):
+        """
+        Returns the (cached) mask with zeros on the diagonal and ones
+        elsewhere.
+
+        :param memory_size: The number of memory slots.
+        :returns: A tensor of shape `[memory_size, memory_size]`.
+
+        """
+        dtype = AppState().dtype
+        key = (memory_size, dtype)
+        if key not in self._off_diagonal_masks:
+            self._off_diagonal_masks[key] = 1 - \
+                torch.eye(memory_size).type(dtype)
+        return self._off_diagonal_masks[key]
+
+    def _sparse_link(self, prev_link, prev_precedence_weights, write_weights):
+        """
+        Calculates the new link graphs in the sparse mode (see _link).
+
+        The rows (forward) and columns (backward) of the link matrices are
+        updated separately: existing links are rescaled, new links to the K
+        addresses with the largest precedence (for rows) or write weights
+        (for columns) are added, and only the K strongest links are kept.
+        With K equal to the memory size the result is the same as in the
+        dense mode.
+
+          :param prev_link: `SparseLink` tuple representing the previous link graphs.
+          :param prev_precedence_weights: A tensor of shape `[batch_size, num_writes,
+              memory_size]` which is the previous "aggregated" write weights for
+              each write head.
+          :param write_weights: A tensor of shape `[batch_size, num_writes, memory_size]`
+              containing the new locations in memory written to.
+        Returns:
+          :returns: `SparseLink` tuple containing the new link graphs.
+
+        """
+        # New link L[i, j] = w[i] * p[j] - in the rows the address itself
+        # contributes the write weight, in the columns the precedence.
+        forward_indices, forward_values = self._update_sparse_links(
+            prev_link.forward_indices, prev_link.forward_values,
+            write_weights, write_weights, prev_precedence_weights)
+        backward_indices, backward_values = self._update_sparse_links(
+            prev_link.backward_indices, prev_link.backward_values,
+            write_weights, prev_precedence_weights, write_weights)
+
+        return SparseLink(forward_indices, forward_values,
+                          backward_indices, backward_values)
+
+    def _update_sparse_links(self, indices, values, write_weights, own, other):
+        """
+        Updates the links of all addresses (rows or columns of link matrices).
+
+          :param indices: A tensor of shape `[batch_size, num_writes, memory_size, K]`
+              containing the addresses linked with every address.
+          :param values: A tensor of shape `[batch_size, num_writes, memory_size, K]`
+              containing the weights of the links.
+          :param write_weights: A tensor of shape `[batch_size, num_writes, memory_size]`
+              containing the new locations in memory written to.
+          :param own: A tensor of shape `[batch_size, num_writes, memory_size]` containing
+              factors of the new links of every address.
+          :param other: A tensor of shape `[batch_size, num_writes, memory_size]` containing
+              factors of the new links of the linked addresses.
+        Returns:
+          :returns: Pair of tensors (indices, values) of the new links.
+
+        """
+        batch_size, num_writes, memory_size, num_links = indices.size()
+
+        # Rescale the existing links by (1 - w[i] - w[j]). The weights are
+        # gathered from [batch, writes, memory] (and not from its expanded
+        # view), so the gradient of gather is not of size memory_size^2.
+        linked_write_weights = torch.gather(
+            write_weights, 2,
+            indices.view(batch_size, num_writes, memory_size * num_links)).view(
+            batch_size, num_writes, memory_size, num_links)
+        values = (1 - write_weights.unsqueeze(3) - linked_write_weights) * values
+
+        # New links - to the K addresses with the largest other factors.
+        other_values, other_indices = torch.topk(other, num_links, dim=-1)
+        new_values = own.unsqueeze(3) * other_values.unsqueeze(2)
+        new_indices = other_indices.unsqueeze(2).expand(
+            batch_size, num_writes, memory_size, num_links)
+
+        # Add the new links to the existing ones [..., existing, new].
+        same = (indices.unsqueeze(4) == new_indices.unsqueeze(3))
+        values = values + \
+            torch.sum(same.type(values.type()) * new_values.unsqueeze(3), 4)
+
+        # Gather all candidates, with the self-looping edges set to zero.
+        cand_indices = torch.cat([indices, new_indices], 3)
+        cand_values = torch.cat([values, new_values], 3)
+        addresses = torch.arange(0, memory_size).type(
+            AppState().LongTensor).view(1, 1, memory_size, 1)
+        cand_values = cand_values.masked_fill(cand_indices == addresses, 0)
+
+        # The new links that were added to the existing ones must not be
+        # selected again.
+        duplicates = torch.cat([torch.zeros_like(same[..., 0]),
+                                torch.max(same, 3)[0]], 3)
+        cand_values = cand_values.masked_fill(duplicates, -1)
+
+        # Keep the K strongest links.
+        values, positions = torch.topk(cand_values, num_links, dim=-1)
+        indices = torch.gather(cand_indices, 3, positions)
+
+        return indices, values
+
+    def _sparse_directional_read_weights(self, link, prev_read_weights, forward):
+        """
+        Calculates the forward or the backward read weights in the sparse
+        mode (see directional_read_weights).
+
+          :param link: `SparseLink` tuple representing the link graphs L_t.
+          :param prev_read_weights: tensor of shape `[batch_size, num_reads, memory_size]` containing the previous read weights w_{t-1}^r.
+          :param forward: Boolean indicating whether to follow the "future" direction in the link graph (True) or the "past" direction (False).
+        Returns:
+          :returns: tensor of shape `[batch_size, num_reads, num_writes, memory_size]`
+
+        """
+        # Forward weights f[i] = sum_j L[i, j] w[j] follow the rows,
+        # backward weights b[j] = sum_i L[i, j] w[i] follow the columns.
+        if forward:
+            indices, values = link.forward_indices, link.forward_values
+        else:
+            indices, values = link.backward_indices, link.backward_values
+        batch_size, num_writes, memory_size, num_links = indices.size()
+        num_reads = prev_read_weights.size(1)
+
+        # Read weights of the linked addresses [batch, reads, writes, memory, K],
+        # gathered from [batch, reads, memory] with the flattened indices.
+        flat_indices = indices.view(
+            batch_size, 1, num_writes * memory_size * num_links).expand(
+            batch_size, num_reads, num_writes * memory_size * num_links)
+        linked_read_weights = torch.gather(
+            prev_read_weights, 2, flat_indices).view(
+            batch_size, num_reads, num_writes, memory_size, num_links)
+
+        # Order is [batch, reads, writes, memory]:
+        return torch.sum(values.unsqueeze(1) * linked_read_weights, 4)
+
+    def dense_link(self, link):
+        """
+        Returns the dense view of the link graphs (e.g. for visualization of
+        small memories). In the sparse mode the matrices are built from the
+        forward (row) links.
+
+          :param link: A tensor of shape `[batch_size, num_writes, memory_size, memory_size]` or `SparseLink` tuple.
+        Returns:
+          :returns: A tensor of shape `[batch_size, num_writes, memory_size, memory_size]`.
+
+        """
+        if not isinstance(link, SparseLink):
+            return link
+        batch_size, num_writes, memory_size, _ = link.forward_indices.size()
+        dense = torch.zeros(
+            (batch_size, num_writes, memory_size, memory_size)).type(
+            link.forward_values.type())
+        return dense.scatter_(3, link.forward_indices, link.forward_values)
+
     def _precedence_weights(self, prev_precedence_weights, write_weights):
         """
         Calculates the new precedence weights given the current write weights.
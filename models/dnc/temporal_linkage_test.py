@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import timeit
+import torch
+import torch.nn.functional as F
+from temporal_linkage import TemporalLinkage
+
+
+def loop_link(prev_link, prev_precedence_weights, write_weights):
+    # Reference - zeroes the diagonals matrix by matrix.
+    write_weights_i = torch.unsqueeze(write_weights, 3)
+    write_weights_j = torch.unsqueeze(write_weights, 2)
+    prev_precedence_weights_j = torch.unsqueeze(prev_precedence_weights, 2)
+    prev_link_scale = 1 - write_weights_i - write_weights_j
+    new_link = write_weights_i * prev_precedence_weights_j
+    link = prev_link_scale * prev_link + new_link
+    for i in range(link.shape[0]):
+        for j in range(link.shape[1]):
+            diagonal = torch.diag(link[i, j, :, :])
+            link[i, j, :, :] = link[i, j, :, :] - torch.diag(diagonal)
+    return link
+
+
+# Tests for TemporalLinkage._link
+num_writes = 2
+memory_size = 64
+repeats = 100
+
+for batch_size in [1, 8, 32, 64]:
+    linkage = TemporalLinkage(num_writes)
+    prev_link = torch.rand(batch_size, num_writes, memory_size, memory_size)
+    prev_precedence_weights = torch.rand(batch_size, num_writes, memory_size)
+    write_weights = F.softmax(
+        torch.randn(batch_size, num_writes, memory_size), dim=-1)
+
+    link = linkage._link(prev_link, prev_precedence_weights, write_weights)
+    reference = loop_link(prev_link, prev_precedence_weights, write_weights)
+    max_diff = (link - reference).abs().max().item()
+    assert max_diff == 0, "results differ by {}".format(max_diff)
+
+    t_loop = timeit.timeit(lambda: loop_link(
+        prev_link, prev_precedence_weights, write_weights), number=repeats) / repeats * 1000
+    t_masked = timeit.timeit(lambda: linkage._link(
+        prev_link, prev_precedence_weights, write_weights), number=repeats) / repeats * 1000
+    print("batch_size={}: loop {:.4f} ms, masked {:.4f} ms, speedup {:.1f}".format(
+        batch_size, t_loop, t_masked, t_loop / t_masked))
+
+# Tests for the sparse mode - keeping all the links gives the dense links.
+batch_size = 4
+memory_size = 16
+dense_linkage = TemporalLinkage(num_writes)
+sparse_linkage = TemporalLinkage(num_writes, num_links=memory_size)
+dense_state = dense_linkage.init_state(memory_size, batch_size)
+sparse_state = sparse_linkage.init_state(memory_size, batch_size)
+for _ in range(10):
+    write_weights = 0.9 * F.softmax(
+        torch.randn(batch_size, num_writes, memory_size), dim=-1)
+    dense_state = dense_linkage.calc_temporal_links(write_weights, dense_state)
+    sparse_state = sparse_linkage.calc_temporal_links(
+        write_weights, sparse_state)
+
+read_weights = F.softmax(torch.randn(batch_size, 3, memory_size), dim=-1)
+max_diff = (sparse_linkage.dense_link(sparse_state.link) -
+            dense_state.link).abs().max().item()
+assert max_diff < 1e-6, "sparse links differ by {}".format(max_diff)
+for forward in [True, False]:
+    dense_read = dense_linkage.directional_read_weights(
+        dense_state.link, read_weights, forward)
+    sparse_read = sparse_linkage.directional_read_weights(
+        sparse_state.link, read_weights, forward)
+    max_diff = (sparse_read - dense_read).abs().max().item()
+    assert max_diff < 1e-6, "sparse read weights (forward={}) differ by {}".format(
+        forward, max_diff)
+
+# Tests for the memory of the sparse mode - no tensor allocated in forward
+# or backward may be of size memory_size^2 (only O(memory_size * K)).
+batch_size = 2
+num_reads = 2
+memory_size = 2048
+num_links = 8
+sparse_linkage = TemporalLinkage(num_writes, num_links=num_links)
+sparse_state = sparse_linkage.init_state(memory_size, batch_size)
+write_weights = F.softmax(torch.randn(
+    batch_size, num_writes, memory_size), dim=-1).requires_grad_()
+read_weights = F.softmax(torch.randn(
+    batch_size, num_reads, memory_size), dim=-1).requires_grad_()
+with torch.profiler.profile(profile_memory=True) as profiler:
+    for _ in range(3):
+        sparse_state = sparse_linkage.calc_temporal_links(
+            0.9 * write_weights, sparse_state)
+    loss = sum(sparse_linkage.directional_read_weights(
+        sparse_state.link, read_weights, forward).sum()
+        for forward in [True, False])
+    loss.backward()
+max_allocation = max(event.cpu_memory_usage for event in profiler.events())
+# Bound of 16 x [batch_size, num_writes, num_reads, memory_size, K] floats.
+max_sparse_allocation = 16 * 4 * batch_size * \
+    num_writes * num_reads * memory_size * num_links
+assert max_allocation < max_sparse_allocation, \
+    "sparse mode allocated {} bytes (bound {} bytes)".format(
+        max_allocation, max_sparse_allocation)
+print("sparse mode max allocation: {} bytes (dense link: {} bytes)".format(
+    max_allocation, 4 * batch_size * num_writes * memory_size * memory_size))
@@ -102,7 +102,6 @@ class DWM(SequentialModel):
         if self.app_state.visualize:
             self.cell_state_history = []
 
-        output = None
         # TODO
         if len(inputs.size()) == 4:
             inputs = inputs[:, 0, :, :]
@@ -125,28 +124,17 @@ class DWM(SequentialModel):
         # Init state
         cell_state = self.DWMCell.init_state(memory_addresses_size, batch_size)
 
-        # loop over the different sequences
-        for j in range(seq_length):
-            output_cell, cell_state = self.DWMCell(
-                inputs[..., j, :], cell_state)
-
-            if output_cell is None:
-                continue
-
-            output_cell = output_cell[..., None, :]
-            if output is None:
-                output = output_cell
+        # This is for the time plot
+        def record_state_hook(cell_state):
+            self.cell_state_history.append(
+                (cell_state.memory_state.detach().numpy(),
+                 cell_state.interface_state.head_weight.detach().numpy(),
+                 cell_state.interface_state.snapshot_weight.detach().numpy()))
 
-            # Concatenate output
-            else:
-                output = torch.cat([output, output_cell], dim=-2)
-
-            # This is for the time plot
-            if self.app_state.visualize:
-                self.cell_state_history.append(
-                    (cell_state.memory_state.detach().numpy(),
-                     cell_state.interface_state.head_weight.detach().numpy(),
-                     cell_state.interface_state.snapshot_weight.detach().numpy()))
+        # loop over the different sequences
+        output, cell_state = self.run_recurrent(
+            self.DWMCell, inputs, cell_state,
+            record_state_hook if self.app_state.visualize else None)
 
         return output
 
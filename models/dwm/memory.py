@@ -19,6 +19,7 @@
 __author__ = "Younes Bouhadjar"
 
 import torch
+import torch.nn.functional as F
 from models.dwm.tensor_utils import sim, outer_prod
 
 
@@ -33,6 +34,10 @@ class Memory:
 
         self._memory = mem_t
 
+        # Memory normalized along content - computed once (when required) and
+        # shared by all heads, invalidated by every write.
+        self._normalized_memory = None
+
     def attention_read(self, wt):
         """
         Returns the data read from memory.
@@ -57,6 +62,8 @@ class Memory:
 
         # memory = memory + sum_{head h} weighted add(h)
         self._memory = self._memory + torch.sum(outer_prod(add, wt), dim=-3)
+        # Normalized memory is not valid anymore.
+        self._normalized_memory = None
 
     def erase_weighted(self, erase, wt):
         """
@@ -72,6 +79,8 @@ class Memory:
         # memory = memory * product_{head h} (1 - weighted erase(h))
         self._memory = self._memory * \
             torch.prod(1 - outer_prod(erase, wt), dim=-3)
+        # Normalized memory is not valid anymore.
+        self._normalized_memory = None
 
     def content_similarity(self, k):
         """
@@ -82,7 +91,9 @@ class Memory:
 
         """
 
-        return sim(k, self._memory, l2_normalize=True, aligned=False)
+        # Normalize keys, reuse the normalized memory.
+        return sim(F.normalize(k, dim=-1), self.normalized_content,
+                   aligned=False)
 
     @property
     def size(self):
@@ -95,6 +106,20 @@ class Memory:
 
         return self._memory.size()
 
+    @property
+    def normalized_content(self):
+        """
+        Returns the memory normalized along content (L2 norm), computing it
+        only once for a given memory state.
+
+        :return: the normalized memory [batch_size, memory_content_size, memory_addresses_size]
+
+        """
+        if self._normalized_memory is None:
+            self._normalized_memory = F.normalize(self._memory, dim=-2)
+
+        return self._normalized_memory
+
     @property
     def content(self):
         """
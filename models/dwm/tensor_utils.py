@@ -20,7 +20,6 @@ __author__ = "Younes Bouhadjar, T.S Jayram"
 
 import torch
 import torch.nn.functional as F
-import numpy as np
 from utils.app_state import AppState
 
 
@@ -109,13 +108,15 @@ def circular_conv(x, f):
     f_other = f.size()[:-1]
     assert f_other == x.size()[:-1], "hidden shapes should match"
 
-    y = x.clone()
     ind_left = f_last // 2
     ind_right = f_last - ind_left - 1
     # padding to wrap x with itself
     x = torch.cat([x[..., -ind_left:], x, x[..., :ind_right]], dim=-1)
 
-    # loop over indices in the hidden shape
-    for ix in np.ndindex(f_other):
-        y[ix] = F.conv1d(x[ix][None, None, :], f[ix][None, None, :])
-    return y
+    # sliding windows over the padded x, one per address:
+    # windows[..., i, :] = x[..., i:i + f_last]
+    windows = x.unfold(x.dim() - 1, f_last, 1)
+
+    # convolve all the (batch, head) pairs at once (just like conv1d, it is
+    # actually a cross-correlation)
+    return torch.matmul(windows, f[..., None]).squeeze(-1)
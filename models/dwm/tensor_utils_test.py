@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""tensor_utils_test.py: checks the batched circular_conv against the per-(batch, head) conv1d loop.
+
+Run from the main directory: python -m models.dwm.tensor_utils_test
+
+"""
+__author__ = "Younes Bouhadjar, T.S Jayram"
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from models.dwm import tensor_utils as dwm_tensor_utils
+from models.dnc import tensor_utils as dnc_tensor_utils
+
+
+def loop_circular_conv(x, f):
+    """
+    Reference implementation - performs conv1d for every (batch, head) pair.
+    """
+    f_last = f.size()[-1]
+    f_other = f.size()[:-1]
+    y = x.clone()
+    ind_left = f_last // 2
+    ind_right = f_last - ind_left - 1
+    x = torch.cat([x[..., -ind_left:], x, x[..., :ind_right]], dim=-1)
+    for ix in np.ndindex(f_other):
+        y[ix] = F.conv1d(x[ix][None, None, :], f[ix][None, None, :])
+    return y
+
+
+if __name__ == "__main__":
+    torch.manual_seed(0)
+    # (batch_size, num_heads, num_addresses, shift_size)
+    for batch_size, num_heads, num_addresses, shift_size in [
+            (1, 1, 3, 3), (2, 1, 10, 3), (4, 2, 10, 5), (16, 4, 32, 3), (3, 2, 7, 4), (5, 3, 8, 8)]:
+        x = F.softmax(torch.randn(batch_size, num_heads, num_addresses), dim=-1)
+        f = F.softmax(torch.randn(batch_size, num_heads, shift_size), dim=-1)
+
+        reference = loop_circular_conv(x, f)
+        for tensor_utils in [dwm_tensor_utils, dnc_tensor_utils]:
+            result = tensor_utils.circular_conv(x, f)
+            assert result.size() == reference.size()
+            max_diff = (result - reference).abs().max().item()
+            assert max_diff < 1e-6, "{}: results differ by {}".format(
+                tensor_utils.__name__, max_diff)
+
+        print("batch_size={} num_heads={} num_addresses={} shift_size={}: OK".format(
+            batch_size, num_heads, num_addresses, shift_size))
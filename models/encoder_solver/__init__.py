@@ -4,6 +4,7 @@ from .mae2s_model import MAE2S
 from .mae_cell import MAECellStateTuple, MAECell
 from .mae_interface import MAEInterfaceStateTuple, MAEInterface
 from .maes_model import MAES
+from .mode_segments import ModeSegment, scan_mode_segments
 from .mas_cell import MASCellStateTuple, MASCell
 from .mas_interface import MASInterfaceStateTuple, MASInterface
 
@@ -16,6 +17,8 @@ __all__ = [
     'MAEInterfaceStateTuple',
     'MAEInterface',
     'MAES',
+    'ModeSegment',
+    'scan_mode_segments',
     'MASCellStateTuple',
     'MASCell',
     'MASInterfaceStateTuple',
@@ -58,37 +58,88 @@ class EncoderSolverLSTM(SequentialModel):
         self.encoding_bit = params['encoding_bit']  # Def: 0
         self.solving_bit = params['solving_bit']  # Def: 1
 
+        # Check if segments of the sequence should be processed by single
+        # LSTM calls (when no per-step processing is required, DEFAULT: True).
+        params.add_default_params({'use_fused_lstm': True})
+        self.use_fused_lstm = params['use_fused_lstm']
+
         # Create the Encoder.
-        self.encoder = nn.LSTMCell(self.input_size, self.hidden_state_dim)
+        self.encoder = nn.LSTM(
+            self.input_size, self.hidden_state_dim, batch_first=True)
 
         # Create the Decoder/Solver.
-        self.solver = nn.LSTMCell(self.input_size, self.hidden_state_dim)
+        self.solver = nn.LSTM(
+            self.input_size, self.hidden_state_dim, batch_first=True)
 
         # Output linear layer.
         self.output = nn.Linear(self.hidden_state_dim, self.output_size)
 
         self.modes = Enum('Modes', ['Encode', 'Solve'])
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Loads parameters of the model, converting parameters of LSTM cells
+        used in the previous versions into parameters of (single layer) LSTMs.
+
+        :param state_dict: Dictionary containing the whole state (of the model).
+        :param prefix: Prefix of the keys of the model parameters.
+
+        """
+        for module in ['encoder', 'solver']:
+            for name in ['weight_ih', 'weight_hh', 'bias_ih', 'bias_hh']:
+                cell_key = prefix + '{}.{}'.format(module, name)
+                if cell_key in state_dict:
+                    state_dict[cell_key + '_l0'] = state_dict.pop(cell_key)
+
+        super(EncoderSolverLSTM, self)._load_from_state_dict(
+            state_dict, prefix, *args, **kwargs)
+
     def init_state(self, batch_size):
         """
         Returns 'zero' (initial) state.
 
         :param batch_size: Size of the batch in given iteraction/epoch.
-        :returns: Initial state tuple (hidden, memory cell).
+        :returns: Initial state tuple (hidden, memory cell), each of size [1 x BATCH_SIZE x HIDDEN_SIZE].
 
         """
         dtype = self.app_state.dtype
         # Initialize the hidden state.
-        h_init = torch.zeros(batch_size, self.hidden_state_dim,
+        h_init = torch.zeros(1, batch_size, self.hidden_state_dim,
                              requires_grad=False).type(dtype)
 
         # Initialize the memory cell state.
-        c_init = torch.zeros(batch_size, self.hidden_state_dim,
+        c_init = torch.zeros(1, batch_size, self.hidden_state_dim,
                              requires_grad=False).type(dtype)
 
         # Pack and return a tuple.
         return (h_init, c_init)
 
+    def scan_modes(self, inputs):
+        """
+        Scans the control bits (of the first sample) once and returns modes of
+        all items. The mode is set by the first marker and stays till the
+        opposite kind of marker.
+
+        :param inputs: Inputs [BATCH_SIZE x LENGTH_SIZE x INPUT_SIZE].
+        :returns: List of modes (None before the first marker) - one per item.
+
+        """
+        # Single transfer of the control bits.
+        control_bits = inputs[0, :, [self.encoding_bit, self.solving_bit]].detach().cpu().numpy() != 0
+
+        modes = []
+        mode = None
+        for encoding, solving in control_bits:
+            if solving and not encoding:
+                mode = self.modes.Solve
+            elif encoding and not solving:
+                mode = self.modes.Encode
+            elif encoding and solving:
+                print('Error: both encoding and decoding bit were true')
+                exit(-1)
+            modes.append(mode)
+        return modes
+
     def forward(self, data_tuple):
         """
         Forward function accepts a tuple consisting of:
@@ -108,33 +159,50 @@ class EncoderSolverLSTM(SequentialModel):
         # Initialize state variables.
         (h, c) = self.init_state(batch_size)
 
-        # Logits container.
-        logits = []
-
-        for x in inputs.chunk(inputs.size(1), dim=1):
-            # Squeeze x.
-            x = x.squeeze(1)
-
-            # switch between the encoder and decoder modes. It will stay in
-            # this mode till it hits the opposite kind of marker
-            if x[0, self.solving_bit] and not x[0, self.encoding_bit]:
-                mode = self.modes.Solve
-            elif x[0, self.encoding_bit] and not x[0, self.solving_bit]:
-                mode = self.modes.Encode
-            elif x[0, self.encoding_bit] and x[0, self.solving_bit]:
-                print('Error: both encoding and decoding bit were true')
-                exit(-1)
-
-            if mode == self.modes.Solve:
-                h, c = self.solver(x, (h, c))
-            elif mode == self.modes.Encode:
-                h, c = self.encoder(x, (h, c))
+        # Get modes of all items.
+        modes = self.scan_modes(inputs)
+
+        if self.use_fused_lstm and self.fused_sequence_allowed():
+            # Process every segment (items in the same mode) at once.
+            hidden_BxSxH_segments = []
+            start = 0
+            while start < len(modes):
+                end = start + 1
+                while end < len(modes) and modes[end] == modes[start]:
+                    end += 1
+
+                if modes[start] == self.modes.Solve:
+                    hidden_BxSxH, (h, c) = self.solver(
+                        inputs[:, start:end], (h, c))
+                elif modes[start] == self.modes.Encode:
+                    hidden_BxSxH, (h, c) = self.encoder(
+                        inputs[:, start:end], (h, c))
+                else:
+                    # No marker yet - the state does not change.
+                    hidden_BxSxH = h[0].unsqueeze(1).expand(
+                        batch_size, end - start, self.hidden_state_dim)
+                hidden_BxSxH_segments.append(hidden_BxSxH)
+                start = end
+
+            # Collect logits - whatever happens.
+            return self.output(torch.cat(hidden_BxSxH_segments, dim=1))
+
+        def step(x, state):
+            """
+            Processes a single item [BATCH_SIZE x INPUT_SIZE] of the sequence.
+            """
+            (t, h, c) = state
+
+            if modes[t] == self.modes.Solve:
+                _, (h, c) = self.solver(x.unsqueeze(1), (h, c))
+            elif modes[t] == self.modes.Encode:
+                _, (h, c) = self.encoder(x.unsqueeze(1), (h, c))
 
             # Collect logits - whatever happens :] (BUT THIS CAN BE EASILY
             # SOLVED - COLLECT LOGITS ONLY IN DECODER!!)
-            logit = self.output(h)
-            logits += [logit]
+            logit = self.output(h[0])
+            return logit, (t + 1, h, c)
 
-        # Stack logits along the temporal (sequence) axis.
-        logits = torch.stack(logits, 1)
+        # Process the sequence, collecting logits along the temporal axis.
+        logits, _ = self.run_recurrent(step, inputs, (0, h, c))
         return logits
@@ -108,12 +108,11 @@ class EncoderSolverNTM(SequentialModel):
         # Start as encoder.
         mode = self.modes.Encode
 
-        # Logits container.
-        logits = []
-
-        for x in inputs_BxSxI.chunk(inputs_BxSxI.size(1), dim=1):
-            # Squeeze x.
-            x = x.squeeze(1)
+        def step(x, state):
+            """
+            Processes a single item [BATCH_SIZE x INPUT_SIZE] of the sequence.
+            """
+            (mode, encoder_state, solver_state) = state
 
             # Switch to decoder mode when required.
             if x[0, self.solving_bit] and not x[0, self.encoding_bit]:
@@ -138,10 +137,11 @@ class EncoderSolverNTM(SequentialModel):
 
             # Collect logits from both encoder and solver - they will be masked
             # afterwards.
-            logits += [logit]
+            return logit, (mode, encoder_state, solver_state)
 
-        # Stack logits along the temporal (sequence) axis.
-        logits = torch.stack(logits, 1)
+        # Process the sequence, collecting logits along the temporal axis.
+        logits, _ = self.run_recurrent(
+            step, inputs_BxSxI, (mode, encoder_state, solver_state))
         return logits
 
 
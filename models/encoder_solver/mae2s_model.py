@@ -19,6 +19,7 @@
 __author__ = "Tomasz Kornuta"
 
 from enum import Enum
+import numpy as np
 import torch
 import logging
 logger = logging.getLogger('MAE2S-Model')
@@ -27,6 +28,7 @@ from problems.problem import DataTuple
 from models.sequential_model import SequentialModel
 from models.encoder_solver.mae_cell import MAECell
 from models.encoder_solver.mas_cell import MASCell
+from models.encoder_solver.mode_segments import scan_mode_segments
 
 
 class MAE2S(SequentialModel):
@@ -35,9 +37,9 @@ class MAE2S(SequentialModel):
 
     The model is variation of MAES, but with two solvers - for dual-task training of the encoder.
 
-    Warning: Class assumes, that the whole batch has the same length, i.e. batch of subsequences
-    becoming input to encoder is of the same length (ends at the same item).
-    The same goes to subsequences being input to decoder.
+    Samples of a batch might switch between the encoder and solvers at
+    different items - the model then runs all the required cells and masks
+    their outputs and states.
 
     """
 
@@ -147,71 +149,113 @@ class MAE2S(SequentialModel):
         solver1_state = None  # For now, it will be set during execution.
         solver2_state = None  # For now, it will be set during execution.
 
-        # Start as encoder.
-        mode = self.modes.Encode
-
-        # Logits container.
-        logits = []
-
-        for x in inputs_BxSxI.chunk(inputs_BxSxI.size(1), dim=1):
-            # Squeeze x.
-            x = x.squeeze(1)
-
-            # Switch between the encoder and solver modes.
-            # But first - verify the control bits.
-            if ((x[0, self.encoding_bit] and x[0, self.solving1_bit]) or
-                (x[0, self.encoding_bit] and x[0, self.solving2_bit]) or
-                    (x[0, self.solving1_bit] and x[0, self.solving2_bit])):
-                logger.error('Two control bits were on:\n {}'.format(x))
-                exit(-1)
-
-            # Check if we are stopping the encoder.
-            if mode == self.modes.Encode and (
-                    x[0, self.solving1_bit] or x[0, self.solving2_bit]):
-                #print("initializing solver states")
-                # Initialize states of both solvers.
-                if self.pass_cell_state:
-                    # Initialize solver state with final encoder state.
-                    solver1_state = self.solver1.init_state_with_encoder_state(
-                        encoder_state)
-                    solver2_state = self.solver2.init_state_with_encoder_state(
-                        encoder_state)
-                else:
-                    # Initialize solver state - with final state of memory and
-                    # final attention only.
-                    solver1_state = self.solver1.init_state(
-                        encoder_state.memory_state, encoder_state.interface_state.attention)
-                    solver2_state = self.solver2.init_state(
-                        encoder_state.memory_state, encoder_state.interface_state.attention)
-
-            # Now check which
-            if x[0, self.solving1_bit]:
-                #print("switching to solver1")
-                mode = self.modes.Solve1
-
-            elif x[0, self.solving2_bit]:
-                #print("switching to solver2")
-                mode = self.modes.Solve2
-
-            # Run encoder or solver - depending on the state.
-            if mode == self.modes.Encode:
-                logit, encoder_state = self.encoder(x, encoder_state)
-                # print("encoder")
-            elif mode == self.modes.Solve1:
-                logit, solver1_state = self.solver1(x, solver1_state)
-                # print("solver1")
-            elif mode == self.modes.Solve2:
-                # print("solver2")
-                logit, solver2_state = self.solver2(x, solver2_state)
+        # Scan the control bits once - to find the segments.
+        segments = self.scan_segments(inputs_BxSxI)
+
+        def init_solver_states(encoder_state):
+            """
+            Initializes states of both solvers on the basis of the final
+            encoder state.
+            """
+            if self.pass_cell_state:
+                # Initialize solver state with final encoder state.
+                return (self.solver1.init_state_with_encoder_state(encoder_state),
+                        self.solver2.init_state_with_encoder_state(encoder_state))
+            # Initialize solver state - with final state of memory and final
+            # attention only.
+            return (self.solver1.init_state(
+                        encoder_state.memory_state, encoder_state.interface_state.attention),
+                    self.solver2.init_state(
+                        encoder_state.memory_state, encoder_state.interface_state.attention))
+
+        def step(x, state):
+            """
+            Processes a single item [BATCH_SIZE x INPUT_SIZE] of the sequence.
+            """
+            (t, encoder_state, solver1_state, solver2_state) = state
+            (modes, mode_masks, start_mask) = segments[t]
+
+            # Check if we are stopping the encoder (for some samples).
+            if start_mask is True or (
+                    start_mask is not None and solver1_state is None):
+                solver1_state, solver2_state = init_solver_states(
+                    encoder_state)
+            elif start_mask is not None:
+                init_solver1_state, init_solver2_state = init_solver_states(
+                    encoder_state)
+                solver1_state = self.blend_states(
+                    start_mask, init_solver1_state, solver1_state)
+                solver2_state = self.blend_states(
+                    start_mask, init_solver2_state, solver2_state)
+
+            # Run encoder or solvers - depending on the modes.
+            cells = {self.modes.Encode: self.encoder,
+                     self.modes.Solve1: self.solver1,
+                     self.modes.Solve2: self.solver2}
+            cell_states = {self.modes.Encode: encoder_state,
+                           self.modes.Solve1: solver1_state,
+                           self.modes.Solve2: solver2_state}
+            if mode_masks is None:
+                # All samples in the same mode.
+                mode = modes[0]
+                logit, cell_states[mode] = cells[mode](x, cell_states[mode])
+            else:
+                # Run cells of all modes and mask the results.
+                logit = 0
+                for mode in modes:
+                    mode_logit, new_cell_state = cells[mode](
+                        x, cell_states[mode])
+                    logit = logit + mode_masks[mode] * mode_logit
+                    cell_states[mode] = self.blend_states(
+                        mode_masks[mode], new_cell_state, cell_states[mode])
 
             # Collect logits from both encoder and solver - they will be masked
             # afterwards.
-            logits += [logit]
+            return logit, (t + 1, cell_states[self.modes.Encode],
+                           cell_states[self.modes.Solve1],
+                           cell_states[self.modes.Solve2])
 
-        # Stack logits along the temporal (sequence) axis.
-        logits = torch.stack(logits, 1)
+        # Process the sequence, collecting logits along the temporal axis.
+        logits, _ = self.run_recurrent(
+            step, inputs_BxSxI, (0, encoder_state, solver1_state, solver2_state))
         return logits
 
+    def scan_segments(self, inputs_BxSxI):
+        """
+        Scans the control bits of all samples (at once) and splits the
+        sequence into segments processed in the same modes.
+
+        :param inputs_BxSxI: Inputs [BATCH_SIZE x LENGTH_SIZE x INPUT_SIZE].
+        :returns: List of ModeSegment objects - one per item.
+
+        """
+        # Single transfer of the control bits.
+        control_bits = inputs_BxSxI[:, :, [self.encoding_bit, self.solving1_bit,
+                                           self.solving2_bit]].detach().cpu().numpy() != 0
+        solving1_BxS = control_bits[:, :, 1]
+        solving2_BxS = control_bits[:, :, 2]
+
+        # Verify the control bits.
+        if (control_bits.sum(axis=2) > 1).any():
+            logger.error('Two control bits were on:\n {}'.format(inputs_BxSxI))
+            exit(-1)
+
+        # Solving bits switch to the given solver - the first of them
+        # initializes states of both solvers.
+        solving_BxS = solving1_BxS | solving2_BxS
+        starts_BxS = solving_BxS & (np.cumsum(solving_BxS, axis=1) == 1)
+
+        # Mode of the last solving bit (or encoding mode if there was none).
+        marker_modes_BxS = np.where(
+            solving1_BxS, self.modes.Solve1.value,
+            np.where(solving2_BxS, self.modes.Solve2.value, self.modes.Encode.value))
+        items_BxS = np.where(solving_BxS, np.arange(solving_BxS.shape[1]), 0)
+        last_items_BxS = np.maximum.accumulate(items_BxS, axis=1)
+        modes_BxS = np.take_along_axis(marker_modes_BxS, last_items_BxS, axis=1)
+        modes_BxS = np.where(np.cumsum(solving_BxS, axis=1) > 0,
+                             modes_BxS, self.modes.Encode.value)
+
+        return scan_mode_segments(modes_BxS, starts_BxS, self.modes)
 
 if __name__ == "__main__":
     # Set logging level.
@@ -19,6 +19,7 @@
 __author__ = "Tomasz Kornuta"
 
 from enum import Enum
+import numpy as np
 import torch
 import logging
 logger = logging.getLogger('MAES-Model')
@@ -28,15 +29,16 @@ from models.sequential_model import SequentialModel
 
 from models.encoder_solver.mae_cell import MAECell
 from models.encoder_solver.mas_cell import MASCell
+from models.encoder_solver.mode_segments import scan_mode_segments
 
 
 class MAES(SequentialModel):
     """
     Class implementing the Memory Augmented Encoder-Solver (MAES) model.
 
-    Warning: Class assumes, that the whole batch has the same length, i.e. batch of subsequences
-    becoming input to encoder is of the same length (ends at the same item).
-    The same goes to subsequences being input to decoder.
+    Samples of a batch might switch from encoding to solving at different
+    items - the model then runs both encoder and solver and masks their
+    outputs and states.
 
     """
 
@@ -143,47 +145,85 @@ class MAES(SequentialModel):
         encoder_state = self.encoder.init_state(init_memory_BxAxC)
         solver_state = None  # For now, it will be set during execution.
 
-        # Start as encoder.
-        mode = self.modes.Encode
-
-        # Logits container.
-        logits = []
-
-        for x in inputs_BxSxI.chunk(inputs_BxSxI.size(1), dim=1):
-            # Squeeze x.
-            x = x.squeeze(1)
-
-            # Switch between the encoder and solver modes.
-            if x[0, self.solving_bit] and not x[0, self.encoding_bit]:
-                mode = self.modes.Solve
-                if self.pass_cell_state:
-                    # Initialize solver state with final encoder state.
-                    solver_state = self.solver.init_state_with_encoder_state(
-                        encoder_state)
-                else:
-                    # Initialize solver state - with final state of memory and
-                    # final attention only.
-                    solver_state = self.solver.init_state(
-                        encoder_state.memory_state, encoder_state.interface_state.attention)
-
-            elif x[0, self.encoding_bit] and x[0, self.solving_bit]:
-                logger.error('Two control bits were on:\n {}'.format(x))
-                exit(-1)
-
-            # Run encoder or solver - depending on the state.
-            if mode == self.modes.Encode:
+        # Scan the control bits once - to find the segments.
+        segments = self.scan_segments(inputs_BxSxI)
+
+        def init_solver_state(encoder_state):
+            """
+            Initializes solver state on the basis of the final encoder state.
+            """
+            if self.pass_cell_state:
+                # Initialize solver state with final encoder state.
+                return self.solver.init_state_with_encoder_state(encoder_state)
+            # Initialize solver state - with final state of memory and final
+            # attention only.
+            return self.solver.init_state(
+                encoder_state.memory_state, encoder_state.interface_state.attention)
+
+        def step(x, state):
+            """
+            Processes a single item [BATCH_SIZE x INPUT_SIZE] of the sequence.
+            """
+            (t, encoder_state, solver_state) = state
+            (modes, mode_masks, start_mask) = segments[t]
+
+            # Switch samples from the encoder to the solver mode.
+            if start_mask is True or (
+                    start_mask is not None and solver_state is None):
+                solver_state = init_solver_state(encoder_state)
+            elif start_mask is not None:
+                solver_state = self.blend_states(
+                    start_mask, init_solver_state(encoder_state), solver_state)
+
+            # Run encoder or solver - depending on the mode.
+            if modes == [self.modes.Encode]:
                 logit, encoder_state = self.encoder(x, encoder_state)
-            elif mode == self.modes.Solve:
+            elif modes == [self.modes.Solve]:
                 logit, solver_state = self.solver(x, solver_state)
+            else:
+                # Samples in both modes - run both and mask the results.
+                encoder_logit, new_encoder_state = self.encoder(
+                    x, encoder_state)
+                solver_logit, new_solver_state = self.solver(x, solver_state)
+                encode_mask = mode_masks[self.modes.Encode]
+                solve_mask = mode_masks[self.modes.Solve]
+                logit = encode_mask * encoder_logit + solve_mask * solver_logit
+                encoder_state = self.blend_states(
+                    encode_mask, new_encoder_state, encoder_state)
+                solver_state = self.blend_states(
+                    solve_mask, new_solver_state, solver_state)
 
             # Collect logits from both encoder and solver - they will be masked
             # afterwards.
-            logits += [logit]
+            return logit, (t + 1, encoder_state, solver_state)
 
-        # Stack logits along the temporal (sequence) axis.
-        logits = torch.stack(logits, 1)
+        # Process the sequence, collecting logits along the temporal axis.
+        logits, _ = self.run_recurrent(
+            step, inputs_BxSxI, (0, encoder_state, solver_state))
         return logits
 
+    def scan_segments(self, inputs_BxSxI):
+        """
+        Scans the control bits of all samples (at once) and splits the
+        sequence into segments processed in the same modes.
+
+        :param inputs_BxSxI: Inputs [BATCH_SIZE x LENGTH_SIZE x INPUT_SIZE].
+        :returns: List of ModeSegment objects - one per item.
+
+        """
+        # Single transfer of the control bits.
+        control_bits = inputs_BxSxI[:, :, [self.encoding_bit, self.solving_bit]].detach().cpu().numpy() != 0
+        encoding_BxS = control_bits[:, :, 0]
+        solving_BxS = control_bits[:, :, 1]
+
+        if (encoding_BxS & solving_BxS).any():
+            logger.error('Two control bits were on:\n {}'.format(inputs_BxSxI))
+            exit(-1)
+
+        # Solving bit (re)initializes the solver and switches to the solver mode.
+        modes_BxS = np.where(np.cumsum(solving_BxS, axis=1) > 0,
+                             self.modes.Solve.value, self.modes.Encode.value)
+        return scan_mode_segments(modes_BxS, solving_BxS, self.modes)
 
 if __name__ == "__main__":
     # Set logging level.
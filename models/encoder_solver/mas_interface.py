@@ -119,13 +119,12 @@ class MASInterface(torch.nn.Module):
 
         # Remember zero-hard attention.
         self.zero_hard_attention_BxAx1 = zh_attention
-        # Remember final attention of encoder.
-        self.final_encoder_attention_BxAx1 = final_encoder_attention_BxAx1
 
-        # Return tuple.
+        # Return tuple - final attention of encoder is passed in the state
+        # (so it is e.g. detached along with the rest of the state).
         return MASInterfaceStateTuple(
             zh_attention,
-            self.final_encoder_attention_BxAx1,
+            final_encoder_attention_BxAx1,
             init_gating,
             init_shift)
 
@@ -141,7 +140,8 @@ class MASInterface(torch.nn.Module):
 
         """
        # Unpack cell state.
-        (prev_read_attention_BxAxH, _, _, _) = prev_interface_state_tuple
+        (prev_read_attention_BxAxH, final_encoder_attention_BxAx1,
+         _, _) = prev_interface_state_tuple
 
         # !! Execute single step !!
 
@@ -154,7 +154,8 @@ class MASInterface(torch.nn.Module):
 
         # Update the attention of a given read head.
         read_attention_BxAx1, interface_state_tuple = self.update_attention(
-            gate_Bx3, shift_BxS, gamma_Bx1, prev_memory_BxAxC, prev_read_attention_BxAxH)
+            gate_Bx3, shift_BxS, gamma_Bx1, prev_memory_BxAxC, prev_read_attention_BxAxH,
+            final_encoder_attention_BxAx1)
         #logger.debug("read_attention_BxAx1 {}:\n {}".format(read_attention_BxAx1.size(),  read_attention_BxAx1))
 
         # Read vector from memory [BATCH_SIZE x CONTENT_BITS].
@@ -193,7 +194,8 @@ class MASInterface(torch.nn.Module):
         return param_splits
 
     def update_attention(self, gate_Bx3, shift_BxS, gamma_Bx1,
-                         prev_memory_BxAxC, prev_attention_BxAx1):
+                         prev_memory_BxAxC, prev_attention_BxAx1,
+                         final_encoder_attention_BxAx1):
         """
         Updates the attention weights.
 
@@ -202,6 +204,7 @@ class MASInterface(torch.nn.Module):
         :param gamma_Bx1:
         :param prev_memory_BxAxC: tensor containing memory before update [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
         :param prev_attention_BxAx1: previous attention vector [BATCH_SIZE x MEMORY_ADDRESSES x 1]
+        :param final_encoder_attention_BxAx1: final attention of the encoder [BATCH_SIZE x MEMORY_ADDRESSES x 1]
         :returns: attention vector of size [BATCH_SIZE x ADDRESS_SIZE x 1]
 
         """
@@ -229,13 +232,13 @@ class MASInterface(torch.nn.Module):
         #logger.debug("location_attention_BxAx1 {}:\n {}".format(location_attention_BxAx1.size(),  location_attention_BxAx1))
 
         attention_after_gating_BxAx1 = gate0_Bx3x1 * location_attention_BxAx1 + \
-            gate1_Bx3x1 * self.final_encoder_attention_BxAx1 + \
+            gate1_Bx3x1 * final_encoder_attention_BxAx1 + \
             gate2_Bx3x1 * self.zero_hard_attention_BxAx1
 
         #logger.debug("attention_after_gating_BxAx1 {}:\n {}".format(attention_after_gating_BxAx1.size(),  attention_after_gating_BxAx1))
         int_state = MASInterfaceStateTuple(
             attention_after_gating_BxAx1,
-            self.final_encoder_attention_BxAx1,
+            final_encoder_attention_BxAx1,
             gate_Bx3x1,
             shift_BxSx1)
         return attention_after_gating_BxAx1, int_state
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""mode_segments.py: splits sequences processed by encoder-solver models into segments of items processed in the same modes."""
+__author__ = "Tomasz Kornuta"
+
+import collections
+import numpy as np
+import torch
+
+from utils.app_state import AppState
+
+# Helper collection type.
+_ModeSegment = collections.namedtuple(
+    'ModeSegment', ('modes', 'mode_masks', 'start_mask'))
+
+
+class ModeSegment(_ModeSegment):
+    """
+    Tuple describing how items of a segment are processed:
+
+        - modes: list of modes of samples (in the order of mode values),
+        - mode_masks: dictionary of masks [BATCH_SIZE x 1] of samples in given mode (None if all samples are in the same mode),
+        - start_mask: mask [BATCH_SIZE x 1] of samples (re)initializing solver(s) state (None if no sample, True if all samples do it).
+
+    """
+    __slots__ = ()
+
+
+def scan_mode_segments(modes_BxS, starts_BxS, mode_enum):
+    """
+    Scans modes of all samples once and returns description of every item of
+    the sequence, with items of a segment (consecutive items processed in the
+    same way) sharing the same ModeSegment object. This way the processing
+    loop does not have to read the control bits of the inputs at every step.
+
+    :param modes_BxS: Values of modes of samples at every item (numpy array) [BATCH_SIZE x SEQ_LENGTH].
+    :param starts_BxS: Flags indicating that sample (re)initializes solver state at a given item (numpy array) [BATCH_SIZE x SEQ_LENGTH].
+    :param mode_enum: Enum with modes.
+    :returns: List of ModeSegment objects - one per item.
+
+    """
+    dtype = AppState().dtype
+
+    def mask(flags_B):
+        return torch.from_numpy(flags_B.astype(np.uint8)).type(dtype).unsqueeze(1)
+
+    segments = []
+    prev_key = None
+    for modes_B, starts_B in zip(modes_BxS.T, starts_BxS.T):
+        key = (modes_B.tobytes(), starts_B.tobytes())
+        if key != prev_key:
+            # New segment begins.
+            prev_key = key
+            mode_values = np.unique(modes_B).tolist()
+            modes = [mode_enum(value) for value in mode_values]
+
+            # Masks are required only when samples are in different modes.
+            mode_masks = None
+            if len(modes) > 1:
+                mode_masks = {mode: mask(modes_B == mode.value)
+                              for mode in modes}
+
+            if not starts_B.any():
+                start_mask = None
+            elif starts_B.all():
+                start_mask = True
+            else:
+                start_mask = mask(starts_B)
+
+            segment = ModeSegment(modes, mode_masks, start_mask)
+        segments.append(segment)
+
+    return segments
@@ -37,47 +37,64 @@ class LSTM(SequentialModel):
         self.num_layers = params["num_layers"]
         assert self.num_layers > 0, "Number of LSTM layers should be > 0"
 
-        # Create the LSTM layers
-        self.lstm_layers = nn.ModuleList()
-        self.lstm_layers.append(nn.LSTMCell(
-            self.tm_in_dim, self.hidden_state_dim))
-        self.lstm_layers.extend(
-            [nn.LSTMCell(self.hidden_state_dim, self.hidden_state_dim)
-             for _ in range(1, self.num_layers)])
+        # Check if the whole sequence should be processed by a single LSTM
+        # call (when no per-step processing is required, DEFAULT: True).
+        params.add_default_params({'use_fused_lstm': True})
+        self.use_fused_lstm = params['use_fused_lstm']
+
+        # Create the (multi-layer) LSTM - used both for whole sequences and
+        # single steps.
+        self.lstm = nn.LSTM(self.tm_in_dim, self.hidden_state_dim,
+                            self.num_layers, batch_first=True)
 
         self.linear = nn.Linear(self.hidden_state_dim, self.output_units)
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Loads parameters of the model, converting parameters of LSTM cells
+        (lstm_layers.i.*) used in the previous versions into parameters of
+        the multi-layer LSTM (lstm.*_li).
+
+        :param state_dict: Dictionary containing the whole state (of the model).
+        :param prefix: Prefix of the keys of the model parameters.
+
+        """
+        for i in range(self.num_layers):
+            for name in ['weight_ih', 'weight_hh', 'bias_ih', 'bias_hh']:
+                cell_key = prefix + 'lstm_layers.{}.{}'.format(i, name)
+                if cell_key in state_dict:
+                    state_dict[prefix + 'lstm.{}_l{}'.format(name, i)] = \
+                        state_dict.pop(cell_key)
+
+        super(LSTM, self)._load_from_state_dict(
+            state_dict, prefix, *args, **kwargs)
+
     def forward(self, data_tuple):
         (x, targets) = data_tuple
         # Check if the class has been converted to cuda (through .cuda()
         # method)
         dtype = self.app_state.dtype
 
-        # Create the hidden state tensors
-        h = [
-            torch.zeros(
-                x.size(0),
-                self.hidden_state_dim,
-                requires_grad=False).type(dtype) for _ in range(
-                self.num_layers)]
-
-        # Create the internal state tensors
-        c = [
-            torch.zeros(
-                x.size(0),
-                self.hidden_state_dim,
-                requires_grad=False).type(dtype) for _ in range(
-                self.num_layers)]
-
-        outputs = []
-
-        for x_t in x.chunk(x.size(1), dim=1):
-            h[0], c[0] = self.lstm_layers[0](x_t.squeeze(1), (h[0], c[0]))
-            for i in range(1, self.num_layers):
-                h[i], c[i] = self.lstm_layers[i](h[i - 1], (h[i], c[i]))
-
-            out = self.linear(h[-1])
-            outputs += [out]
-
-        outputs = torch.stack(outputs, 1)
+        # Create the hidden and internal state tensors [NUM_LAYERS x
+        # BATCH_SIZE x HIDDEN_SIZE].
+        h = torch.zeros(self.num_layers, x.size(0), self.hidden_state_dim,
+                        requires_grad=False).type(dtype)
+        c = torch.zeros(self.num_layers, x.size(0), self.hidden_state_dim,
+                        requires_grad=False).type(dtype)
+
+        if self.use_fused_lstm and self.fused_sequence_allowed():
+            # Process the whole sequence at once.
+            hidden_BxSxH, _ = self.lstm(x, (h, c))
+            return self.linear(hidden_BxSxH)
+
+        def step(x_t, state):
+            """
+            Processes a single item [BATCH_SIZE x INPUT_SIZE] of the sequence.
+            """
+            hidden_Bx1xH, state = self.lstm(x_t.unsqueeze(1), state)
+
+            out = self.linear(hidden_Bx1xH.squeeze(1))
+            return out, state
+
+        outputs, _ = self.run_recurrent(step, x, (h, c))
         return outputs
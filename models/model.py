@@ -38,6 +38,10 @@ class Model(nn.Module):
 
     """
 
+    # Whether the model supports truncated backpropagation through time (see
+    # SequentialModel.set_truncated_bptt).
+    supports_truncated_bptt = False
+
     def __init__(self, params):
         """
         Initializes application state and sets plot if visualization flag is
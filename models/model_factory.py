@@ -36,6 +36,35 @@ class ModelFactory(object):
         Static method returning particular model, depending on the name
         provided in the list of parameters.
 
+        Additionally, if the optional 'compile_cells' parameter is set to
+        'script' (TorchScript) or 'compile' (torch.compile), turns on
+        compilation of recurrent cells of the (sequential) model.
+
+        :param params: Dictionary of parameters (in particular containing 'name' which is equivalend to model name)
+        :returns: Instance of a given model.
+
+        """
+        model = ModelFactory.create_model(params)
+
+        # Compile recurrent cells - if required (DEFAULT: '', i.e. turned off).
+        params.add_default_params({'compile_cells': ''})
+        compile_cells = params['compile_cells']
+        if compile_cells:
+            if not hasattr(model, 'compile_cells'):
+                logger.warning(
+                    "Model '{}' does not have recurrent cells to compile".format(params['name']))
+            else:
+                logger.info("Compiling recurrent cells of the model ({})".format(compile_cells))
+                model.compile_cells(compile_cells)
+
+        return model
+
+    @staticmethod
+    def create_model(params):
+        """
+        Static method creating particular model, depending on the name
+        provided in the list of parameters.
+
         :param params: Dictionary of parameters (in particular containing 'name' which is equivalend to model name)
         :returns: Instance of a given model.
 
@@ -1,6 +1,8 @@
 from .ntm_cell import NTMCellStateTuple, NTMCell
 from .ntm_interface import HeadStateTuple, InterfaceStateTuple, NTMInterface
+from .sparse_ntm_interface import SparseAttentionTuple, SparseNTMInterface
 from .ntm_model import NTM
 
 __all__ = ['NTMCellStateTuple', 'NTMCell', 'HeadStateTuple',
-           'InterfaceStateTuple', 'NTMInterface', 'NTM']
+           'InterfaceStateTuple', 'NTMInterface', 'SparseAttentionTuple',
+           'SparseNTMInterface', 'NTM']
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""checkpointing_benchmark.py: measures peak memory (RSS) and time of a training step of NTM and MAE2S for different lengths of checkpointed groups of steps.
+
+The MAE2S batch mixes encoding and solving segments (samples switch to the solvers at different items), so groups of steps span mode changes.
+
+Every measurement is performed in a separate process, so peak RSS is not affected by the previous ones.
+
+Run from the main directory: python -m models.ntm.checkpointing_benchmark
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import resource
+import time
+import multiprocessing
+import torch
+
+from utils.app_state import AppState
+from utils.param_interface import ParamInterface
+from models.ntm.ntm_model import NTM
+from models.encoder_solver.mae2s_model import MAE2S
+from problems.problem import DataTuple
+
+
+def mae2s_inputs(seq_length, batch_size):
+    """
+    Generates random inputs of MAE2S: data items with markers switching the
+    samples from encoding to the first solver and then to the second one (in
+    the first half of the batch at 1/3 and 2/3 of the sequence, in the second
+    half at 1/2 and 3/4 of it).
+
+    :returns: Inputs [BATCH_SIZE x SEQ_LENGTH x 12] (4 control bits + 8 data bits).
+    """
+    inputs = torch.zeros(batch_size, seq_length, 12)
+    inputs[:, :, 4:] = torch.bernoulli(0.5 * torch.ones(batch_size, seq_length, 8))
+    half = batch_size // 2
+    inputs[:half, seq_length // 3, 1] = 1
+    inputs[:half, 2 * seq_length // 3, 2] = 1
+    inputs[half:, seq_length // 2, 1] = 1
+    inputs[half:, 3 * seq_length // 4, 2] = 1
+    return inputs
+
+
+def training_step(model_name, checkpoint_length, seq_length, batch_size, repeats):
+    """
+    Performs training steps of the model (NTM or MAE2S) on a random batch.
+
+    :returns: Tuple (peak RSS [MB], average step time [s], sum of gradients).
+    """
+    AppState().set_dtype('float')
+    AppState().set_itype('int')
+    torch.manual_seed(0)
+
+    params = ParamInterface()
+    controller_params = {'name': 'rnn', 'hidden_state_size': 100,
+                         'num_layers': 1, 'non_linearity': 'sigmoid'}
+    if model_name == 'ntm':
+        params.add_custom_params({
+            'num_control_bits': 3,
+            'num_data_bits': 8,
+            'checkpoint_length': checkpoint_length,
+            'controller': controller_params,
+            'interface': {'num_read_heads': 1, 'shift_size': 3},
+            'memory': {'num_content_bits': 20, 'num_addresses': 128}})
+        model = NTM(params)
+        inputs = torch.bernoulli(0.5 * torch.ones(batch_size, seq_length, 11))
+    else:
+        params.add_custom_params({
+            'num_control_bits': 4,
+            'num_data_bits': 8,
+            'checkpoint_length': checkpoint_length,
+            'controller': controller_params,
+            'mae_interface': {'shift_size': 3},
+            'mas_interface': {'shift_size': 3},
+            'memory': {'num_content_bits': 20, 'num_addresses': 128}})
+        model = MAE2S(params)
+        inputs = mae2s_inputs(seq_length, batch_size)
+
+    targets = torch.bernoulli(0.5 * torch.ones(batch_size, seq_length, 8))
+    data_tuple = DataTuple(inputs, targets)
+    loss_function = torch.nn.BCEWithLogitsLoss()
+
+    start = time.time()
+    for _ in range(repeats):
+        model.zero_grad()
+        loss = loss_function(model(data_tuple), targets)
+        loss.backward()
+    step_time = (time.time() - start) / repeats
+
+    grad_sum = sum(p.grad.sum().item() for p in model.parameters())
+    # ru_maxrss is in kilobytes (on Linux).
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return peak_rss, step_time, grad_sum
+
+
+if __name__ == "__main__":
+    seq_length = 1000
+    batch_size = 64
+    repeats = 1
+
+    # Fresh process for every measurement.
+    pool_context = multiprocessing.get_context('spawn')
+
+    print("{:>6} {:>6} {:>14} {:>14} {:>14}".format(
+        'model', 'k', 'peak RSS [MB]', 'step time [s]', 'grad sum'))
+    for model_name in ['ntm', 'mae2s']:
+        for checkpoint_length in [0, 10, 50]:
+            with pool_context.Pool(1) as pool:
+                peak_rss, step_time, grad_sum = pool.apply(
+                    training_step,
+                    (model_name, checkpoint_length, seq_length, batch_size, repeats))
+            print("{:>6} {:>6} {:>14.1f} {:>14.3f} {:>14.6f}".format(
+                model_name, checkpoint_length, peak_rss, step_time, grad_sum))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""circular_convolution_benchmark.py: compares the batched circular convolution of NTM interface with the per-sample one.
+
+Run from the main directory: python -m models.ntm.circular_convolution_benchmark
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import timeit
+import torch
+import torch.nn.functional as F
+
+from utils.param_interface import ParamInterface
+from models.ntm.ntm_interface import NTMInterface
+
+
+def loop_circular_convolution(attention_BxAx1, shift_BxSx1, shift_size):
+    """
+    Reference implementation - performs conv1d for every batch-filter pair.
+    """
+    num_addr = attention_BxAx1.size(1)
+    ext_indices_tensor = torch.LongTensor(
+        [(shift + num_addr) % num_addr
+         for shift in range(-shift_size // 2 + 1, num_addr + shift_size // 2)])
+    ext_attention_BxEAx1 = torch.index_select(
+        attention_BxAx1, dim=1, index=ext_indices_tensor)
+    ext_att_trans_Bx1xEA = torch.transpose(ext_attention_BxEAx1, 1, 2)
+    shift_trans_Bx1xS = torch.transpose(shift_BxSx1, 1, 2)
+    tmp_attention_list = []
+    for b in range(attention_BxAx1.size(0)):
+        tmp_attention_list.append(F.conv1d(ext_att_trans_Bx1xEA.narrow(
+            0, b, 1), shift_trans_Bx1xS.narrow(0, b, 1)))
+    return torch.transpose(torch.cat(tmp_attention_list, dim=0), 1, 2)
+
+
+if __name__ == "__main__":
+    num_addr = 128
+    shift_size = 3
+    repeats = 200
+
+    params = ParamInterface()
+    params.add_custom_params({
+        'controller': {'hidden_state_size': 20},
+        'interface': {'num_read_heads': 1, 'shift_size': shift_size},
+        'memory': {'num_content_bits': 10}})
+    interface = NTMInterface(params)
+
+    print("{:>6} {:>12} {:>12} {:>8} {:>10}".format(
+        'batch', 'loop [ms]', 'batched [ms]', 'speedup', 'max diff'))
+    for batch_size in [1, 8, 32, 64, 128, 256]:
+        attention = F.softmax(torch.randn(batch_size, num_addr, 1), dim=1)
+        shift = F.softmax(torch.randn(batch_size, shift_size, 1), dim=1)
+
+        # Check whether both implementations give the same results.
+        reference = loop_circular_convolution(attention, shift, shift_size)
+        batched = interface.circular_convolution(attention, shift)
+        max_diff = (reference - batched).abs().max().item()
+
+        t_loop = timeit.timeit(lambda: loop_circular_convolution(
+            attention, shift, shift_size), number=repeats) / repeats * 1000
+        t_batched = timeit.timeit(lambda: interface.circular_convolution(
+            attention, shift), number=repeats) / repeats * 1000
+
+        print("{:>6} {:>12.4f} {:>12.4f} {:>8.1f} {:>10.2e}".format(
+            batch_size, t_loop, t_batched, t_loop / t_batched, max_diff))
@@ -23,6 +23,7 @@ import collections
 
 from models.controllers.controller_factory import ControllerFactory
 from models.ntm.ntm_interface import NTMInterface
+from models.ntm.sparse_ntm_interface import SparseNTMInterface
 
 # Helper collection type.
 _NTMCellStateTuple = collections.namedtuple(
@@ -88,7 +89,13 @@ class NTMCell(torch.nn.Module):
         # Build the controller.
         self.controller = ControllerFactory.build_model(controller_params)
         # Interface - entity responsible for accessing the memory.
-        self.interface = NTMInterface(params)
+        # Use the sparse (top-K) access if number of sparse addresses is set
+        # (DEFAULT: 0, i.e. dense access).
+        params['interface'].add_default_params({'num_sparse_addresses': 0})
+        if params['interface']['num_sparse_addresses'] > 0:
+            self.interface = SparseNTMInterface(params)
+        else:
+            self.interface = NTMInterface(params)
 
         # Layer that produces output on the basis of... hidden state?
         ext_hidden_size = self.controller_hidden_state_size + \
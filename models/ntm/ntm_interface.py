@@ -80,6 +80,10 @@ class NTMInterface(torch.nn.Module):
         self.interface_num_read_heads = params['interface']['num_read_heads']
         assert self.interface_num_read_heads >= 1, "NTM requires at least 1 read head (currently %r)" % self.interface_num_read_heads
 
+        # Cache of circular indices used in convolution, keyed by the number
+        # of addresses (and type of tensor).
+        self.circular_indices_cache = {}
+
         # Check if CBA should be used or not.
         self.use_content_based_addressing = params['interface'].get(
             'use_content_based_addressing', True)
@@ -111,11 +115,6 @@ class NTMInterface(torch.nn.Module):
                 'shift': self.interface_shift_size, 'gamma': 1}, "Read")
             assert num_read_params == self.read_param_locations[-1], "Last location must be equal to number of read params."
 
-       # Forward linear layers that generate parameters of read heads.
-        self.hidden2read_list = torch.nn.ModuleList()
-        for _ in range(self.interface_num_read_heads):
-            self.hidden2read_list.append(torch.nn.Linear(
-                self.ctrl_hidden_state_size, num_read_params))
 
         # -------------- WRITE HEAD -----------------#
         # Number/size of wrrite parameters:
@@ -150,9 +149,64 @@ class NTMInterface(torch.nn.Module):
             assert num_write_params == self.write_param_locations[
                 -1], "Last location must be equal to number of write params."
 
-       # Forward linear layer that generates parameters of write heads.
-        self.hidden2write_params = torch.nn.Linear(
-            self.ctrl_hidden_state_size, num_write_params)
+        # Check if parameters of all heads should be generated by a single
+        # (fused) layer, with attentions of all heads computed at once.
+        self.use_fused_heads = params['interface'].get(
+            'use_fused_heads', False)
+
+        if self.use_fused_heads:
+            # Forward linear layer that generates parameters of all read heads
+            # (one after another) followed by parameters of the write head.
+            self.hidden2params = torch.nn.Linear(
+                self.ctrl_hidden_state_size,
+                self.interface_num_read_heads * num_read_params + num_write_params)
+        else:
+            # Forward linear layers that generate parameters of read heads.
+            self.hidden2read_list = torch.nn.ModuleList()
+            for _ in range(self.interface_num_read_heads):
+                self.hidden2read_list.append(torch.nn.Linear(
+                    self.ctrl_hidden_state_size, num_read_params))
+
+            # Forward linear layer that generates parameters of write heads.
+            self.hidden2write_params = torch.nn.Linear(
+                self.ctrl_hidden_state_size, num_write_params)
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Loads parameters of the interface, converting them between the
+        per-head (hidden2read_list + hidden2write_params) and the fused
+        (hidden2params) layouts when required - so checkpoints saved with
+        either of them can be loaded.
+
+        :param state_dict: Dictionary containing the whole state (of the model).
+        :param prefix: Prefix of the keys of the interface parameters.
+
+        """
+        # Prefixes of the per-head layers - read heads followed by the write head.
+        head_prefixes = [prefix + 'hidden2read_list.{}.'.format(i)
+                         for i in range(self.interface_num_read_heads)]
+        head_prefixes.append(prefix + 'hidden2write_params.')
+        fused_prefix = prefix + 'hidden2params.'
+        # Number of outputs of the per-head layers.
+        head_sizes = [self.read_param_locations[-1]] * \
+            self.interface_num_read_heads + [self.write_param_locations[-1]]
+
+        for name in ['weight', 'bias']:
+            head_keys = [head_prefix + name for head_prefix in head_prefixes]
+            fused_key = fused_prefix + name
+            if self.use_fused_heads and all(
+                    key in state_dict for key in head_keys):
+                # Per-head -> fused: concatenate outputs of all heads.
+                state_dict[fused_key] = torch.cat(
+                    [state_dict.pop(key) for key in head_keys], dim=0)
+            elif not self.use_fused_heads and fused_key in state_dict:
+                # Fused -> per-head: split outputs into heads.
+                for key, param in zip(head_keys, torch.split(
+                        state_dict.pop(fused_key), head_sizes, dim=0)):
+                    state_dict[key] = param
+
+        super(NTMInterface, self)._load_from_state_dict(
+            state_dict, prefix, *args, **kwargs)
 
     def init_state(self, batch_size, num_memory_addresses):
         """
@@ -210,6 +264,11 @@ class NTMInterface(torch.nn.Module):
         :returns: List of read vectors [BATCH_SIZE x CONTENT_SIZE], updated memory and state tuple (object of LSTMStateTuple class).
 
         """
+        # Process all heads at once - if required.
+        if self.use_fused_heads:
+            return self.fused_heads_forward(
+                ctrl_hidden_state_BxH, prev_memory_BxAxC, prev_interface_state_tuple)
+
         # Unpack previous cell  state - just to make sure that everything is ok...
         #(prev_read_attentions_BxAx1_H,  prev_write_attention_BxAx1) = prev_interface_state_tuple
        # Unpack cell state.
@@ -219,6 +278,11 @@ class NTMInterface(torch.nn.Module):
 
         # !! Execute single step !!
 
+        # Normalize memory (along content) only once - it is shared by
+        # content-based addressing of all heads.
+        if self.use_content_based_addressing:
+            norm_memory_BxAxC = F.normalize(prev_memory_BxAxC, p=2, dim=2)
+
         # Read attentions
         read_attentions_BxAx1_H = []
         # List of read vectors - with two dimensions! [BATCH_SIZE x
@@ -239,7 +303,8 @@ class NTMInterface(torch.nn.Module):
                 # Update the attention of a given read head.
                 read_attention_BxAx1, read_state_tuple = self.update_attention(
                     query_vector_BxC, beta_Bx1, gate_Bx1, shift_BxS, gamma_Bx1,
-                    prev_memory_BxAxC, prev_read_attentions_BxAx1_H[i])
+                    prev_memory_BxAxC, prev_read_attentions_BxAx1_H[i],
+                    norm_memory_BxAxC=norm_memory_BxAxC)
             else:
                 # Split the parameters.
                 shift_BxS, gamma_Bx1 = self.split_params(
@@ -270,7 +335,8 @@ class NTMInterface(torch.nn.Module):
             # Update the attention of the write head.
             write_attention_BxAx1, write_state_tuple = self.update_attention(
                 query_vector_BxC, beta_Bx1, gate_Bx1, shift_BxS, gamma_Bx1,
-                prev_memory_BxAxC, prev_write_attention_BxAx1)
+                prev_memory_BxAxC, prev_write_attention_BxAx1,
+                norm_memory_BxAxC=norm_memory_BxAxC)
         else:
             # Split the parameters.
             shift_BxS, gamma_Bx1, erase_vector_BxC, add_vector_BxC = self.split_params(
@@ -300,6 +366,115 @@ class NTMInterface(torch.nn.Module):
         # Return read vector, new memory state and state tuple.
         return read_vectors_BxC_H, memory_BxAxC, interface_state_tuple
 
+    def fused_heads_forward(self, ctrl_hidden_state_BxH, prev_memory_BxAxC,
+                            prev_interface_state_tuple):
+        """
+        Controller forward function processing all heads at once (used when
+        use_fused_heads is set). Parameters of all heads are generated by a
+        single linear layer and attentions of all heads (read heads followed
+        by the write head) are computed as a single batch [BATCH_SIZE x HEADS
+        x ...], normalizing the memory only once.
+
+        :param ctrl_hidden_state_BxH: a Tensor with controller hidden state of size [BATCH_SIZE  x HIDDEN_SIZE]
+        :param prev_memory_BxAxC: Previous state of the memory [BATCH_SIZE x  MEMORY_ADDRESSES x CONTENT_BITS]
+        :param prev_interface_state_tuple: Tuple containing previous read and write attention vectors.
+        :returns: List of read vectors [BATCH_SIZE x CONTENT_SIZE], updated memory and state tuple (object of LSTMStateTuple class).
+
+        """
+        # Unpack cell state.
+        (prev_read_state_tuples, prev_write_state_tuple) = prev_interface_state_tuple
+
+        batch_size, num_addr, _ = prev_memory_BxAxC.size()
+        num_read_heads = self.interface_num_read_heads
+        # Read heads + write head.
+        num_heads = num_read_heads + 1
+        # Number of parameters of a read head - write head starts with the
+        # same (addressing) parameters, laid out in the same order.
+        num_read_params = self.read_param_locations[-1]
+
+        # Previous attentions of all heads [BATCH_SIZE x HEADS x ADDRESSES x 1].
+        prev_attentions_BxHxAx1 = torch.stack(
+            [state_tuple.attention for state_tuple in prev_read_state_tuples] +
+            [prev_write_state_tuple.attention], dim=1)
+
+        # Calculate parameters of all heads.
+        params_BxP = self.hidden2params(ctrl_hidden_state_BxH)
+        read_params_BxRxP = params_BxP[:, :num_read_heads * num_read_params].contiguous(
+        ).view(batch_size, num_read_heads, num_read_params)
+        write_params_BxP = params_BxP[:, num_read_heads * num_read_params:]
+
+        # Addressing parameters of all heads [BATCH_SIZE x HEADS x
+        # READ_PARAMS], with heads treated as additional samples.
+        addressing_params_BHxP = torch.cat(
+            [read_params_BxRxP, write_params_BxP[:, :num_read_params].unsqueeze(1)],
+            dim=1).view(batch_size * num_heads, num_read_params)
+        prev_attentions_BHxAx1 = prev_attentions_BxHxAx1.view(
+            batch_size * num_heads, num_addr, 1)
+
+        if self.use_content_based_addressing:
+            # Split the parameters.
+            query_vector_BHxC, beta_BHx1, gate_BHx1, shift_BHxS, gamma_BHx1 = self.split_params(
+                addressing_params_BHxP, self.read_param_locations)
+            # Content-based addressing of all heads at once.
+            content_attention_BxHxA = self.multihead_content_based_addressing(
+                F.sigmoid(query_vector_BHxC).view(batch_size, num_heads, -1),
+                F.softplus(beta_BHx1).view(batch_size, num_heads, 1) + 1,
+                prev_memory_BxAxC)
+            # Update the attentions of all heads.
+            attentions_BHxAx1, heads_state_tuple = self.update_attention(
+                None, None, gate_BHx1, shift_BHxS, gamma_BHx1, None,
+                prev_attentions_BHxAx1,
+                content_attention_BxAx1=content_attention_BxHxA.contiguous().view(
+                    batch_size * num_heads, num_addr, 1))
+        else:
+            # Split the parameters.
+            shift_BHxS, gamma_BHx1 = self.split_params(
+                addressing_params_BHxP, self.read_param_locations)
+            # Update the attentions of all heads.
+            attentions_BHxAx1, heads_state_tuple = self.update_attention(
+                None, None, None, shift_BHxS, gamma_BHx1, None,
+                prev_attentions_BHxAx1)
+
+        # Split state of heads into separate tuples.
+        heads_state_BxHx = [
+            state.view(batch_size, num_heads, *state.size()[1:])
+            for state in heads_state_tuple]
+        read_state_tuples = [
+            HeadStateTuple(*[state[:, i] for state in heads_state_BxHx])
+            for i in range(num_read_heads)]
+        write_state_tuple = HeadStateTuple(
+            *[state[:, num_read_heads] for state in heads_state_BxHx])
+
+        # Read vectors of all heads [BATCH_SIZE x READ_HEADS x CONTENT_BITS].
+        attentions_BxHxA = attentions_BHxAx1.view(
+            batch_size, num_heads, num_addr)
+        read_vectors_BxRxC = torch.matmul(
+            attentions_BxHxA[:, :num_read_heads], prev_memory_BxAxC)
+        # List of read vectors - with two dimensions! [BATCH_SIZE x
+        # CONTENT_SIZE]
+        read_vectors_BxC_H = [read_vectors_BxRxC[:, i]
+                              for i in range(num_read_heads)]
+
+        # Get erase and add vectors - the last write parameters.
+        erase_vector_BxC, add_vector_BxC = self.split_params(
+            write_params_BxP, self.write_param_locations)[-2:]
+        erase_vector_Bx1xC = F.sigmoid(erase_vector_BxC).unsqueeze(1)
+        add_vector_Bx1xC = F.sigmoid(add_vector_BxC).unsqueeze(1)
+
+        # Update the memory.
+        memory_BxAxC = self.update_memory(
+            write_state_tuple.attention,
+            erase_vector_Bx1xC,
+            add_vector_Bx1xC,
+            prev_memory_BxAxC)
+
+        # Pack current cell state.
+        interface_state_tuple = InterfaceStateTuple(
+            read_state_tuples, write_state_tuple)
+
+        # Return read vector, new memory state and state tuple.
+        return read_vectors_BxC_H, memory_BxAxC, interface_state_tuple
+
     def calculate_param_locations(self, param_sizes_dict, head_name):
         """
         Calculates locations of parameters, that will subsequently be used
@@ -336,7 +511,9 @@ class NTMInterface(torch.nn.Module):
             shift_BxS,
             gamma_Bx1,
             prev_memory_BxAxC,
-            prev_attention_BxAx1):
+            prev_attention_BxAx1,
+            content_attention_BxAx1=None,
+            norm_memory_BxAxC=None):
         """
         Updates the attention weights.
 
@@ -347,6 +524,8 @@ class NTMInterface(torch.nn.Module):
         :param gamma_Bx1:
         :param prev_memory_BxAxC: tensor containing memory before update [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
         :param prev_attention_BxAx1: previous attention vector [BATCH_SIZE x MEMORY_ADDRESSES x 1]
+        :param content_attention_BxAx1: already computed content-based attention [BATCH_SIZE x MEMORY_ADDRESSES x 1] - if set, query vector, beta and memory are not used (DEFAULT: None)
+        :param norm_memory_BxAxC: already normalized memory, shared by many heads (DEFAULT: None)
         :returns: attention vector of size [BATCH_SIZE x ADDRESS_SIZE x 1]
 
         """
@@ -357,17 +536,20 @@ class NTMInterface(torch.nn.Module):
         gamma_Bx1x1 = F.softplus(gamma_Bx1).unsqueeze(2) + 1
 
         if self.use_content_based_addressing:
-            # Add 3rd dimensions where required and apply non-linear transformations.
-            # Produce content-addressing params.
-            query_vector_Bx1xC = F.sigmoid(query_vector_BxC).unsqueeze(1)
-            # Beta: oneplus
-            beta_Bx1x1 = F.softplus(beta_Bx1).unsqueeze(2) + 1
             # Produce gating param.
             gate_Bx1x1 = F.sigmoid(gate_Bx1).unsqueeze(2)
 
-            # Content-based addressing.
-            content_attention_BxAx1 = self.content_based_addressing(
-                query_vector_Bx1xC, beta_Bx1x1, prev_memory_BxAxC)
+            if content_attention_BxAx1 is None:
+                # Add 3rd dimensions where required and apply non-linear transformations.
+                # Produce content-addressing params.
+                query_vector_Bx1xC = F.sigmoid(query_vector_BxC).unsqueeze(1)
+                # Beta: oneplus
+                beta_Bx1x1 = F.softplus(beta_Bx1).unsqueeze(2) + 1
+
+                # Content-based addressing.
+                content_attention_BxAx1 = self.content_based_addressing(
+                    query_vector_Bx1xC, beta_Bx1x1, prev_memory_BxAxC,
+                    norm_memory_BxAxC)
 
             # Gating mechanism - choose beetween new attention from CBA or
             # attention from previous iteration. [BATCH_SIZE x ADDRESSES x 1].
@@ -398,7 +580,8 @@ class NTMInterface(torch.nn.Module):
         return location_attention_BxAx1, head_tuple
 
     def content_based_addressing(
-            self, query_vector_Bx1xC, beta_Bx1x1, prev_memory_BxAxC):
+            self, query_vector_Bx1xC, beta_Bx1x1, prev_memory_BxAxC,
+            norm_memory_BxAxC=None):
         """
         Computes content-based addressing. Uses query vectors for calculation
         of similarity.
@@ -406,6 +589,7 @@ class NTMInterface(torch.nn.Module):
         :param query_vector_Bx1xC: NTM "key"  [BATCH_SIZE x 1 x CONTENT_BITS]
         :param beta_Bx1x1: key strength [BATCH_SIZE x 1 x 1]
         :param prev_memory_BxAxC: tensor containing memory before update [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+        :param norm_memory_BxAxC: already normalized memory - if set, prev_memory_BxAxC is not used (DEFAULT: None)
         :returns: attention of size [BATCH_SIZE x ADDRESS_SIZE x 1]
 
         """
@@ -413,8 +597,9 @@ class NTMInterface(torch.nn.Module):
         norm_query_vector_Bx1xC = F.normalize(query_vector_Bx1xC, p=2, dim=2)
         #logger.debug("norm_query_vector_Bx1xC {}:\n {}".format(norm_query_vector_Bx1xC.size(),  norm_query_vector_Bx1xC))
 
-        # Normalize memory - along content.
-        norm_memory_BxAxC = F.normalize(prev_memory_BxAxC, p=2, dim=2)
+        # Normalize memory - along content (if not done yet).
+        if norm_memory_BxAxC is None:
+            norm_memory_BxAxC = F.normalize(prev_memory_BxAxC, p=2, dim=2)
         #logger.debug("norm_memory_BxAxC {}:\n {}".format(norm_memory_BxAxC.size(),  norm_memory_BxAxC))
 
         # Calculate cosine similarity [BATCH_SIZE x MEMORY_ADDRESSES x 1].
@@ -433,6 +618,30 @@ class NTMInterface(torch.nn.Module):
         #logger.debug("attention_BxAx1 {}:\n {}".format(attention_BxAx1.size(),  attention_BxAx1))
         return attention_BxAx1
 
+    def multihead_content_based_addressing(
+            self, query_vectors_BxHxC, betas_BxHx1, prev_memory_BxAxC):
+        """
+        Computes content-based addressing for many heads at once - memory is
+        normalized only once and shared by all heads.
+
+        :param query_vectors_BxHxC: NTM "keys"  [BATCH_SIZE x HEADS x CONTENT_BITS]
+        :param betas_BxHx1: key strengths [BATCH_SIZE x HEADS x 1]
+        :param prev_memory_BxAxC: tensor containing memory before update [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+        :returns: attentions of size [BATCH_SIZE x HEADS x ADDRESS_SIZE]
+
+        """
+        # Normalize queries and memory - along content.
+        norm_query_vectors_BxHxC = F.normalize(query_vectors_BxHxC, p=2, dim=2)
+        norm_memory_BxAxC = F.normalize(prev_memory_BxAxC, p=2, dim=2)
+
+        # Calculate cosine similarity [BATCH_SIZE x HEADS x MEMORY_ADDRESSES].
+        similarity_BxHxA = torch.matmul(
+            norm_query_vectors_BxHxC, torch.transpose(norm_memory_BxAxC, 1, 2))
+
+        # Strengthen and calculate attention along the "slot dimension".
+        attention_BxHxA = F.softmax(similarity_BxHxA * betas_BxHx1, dim=2)
+        return attention_BxHxA
+
     def location_based_addressing(
             self, attention_BxAx1, shift_BxSx1, gamma_Bx1x1):
         """
@@ -455,66 +664,62 @@ class NTMInterface(torch.nn.Module):
 
         return sharpened_attention_BxAx1
 
+    def circular_indices(self, num_addr):
+        """
+        Returns the extended list of indices indicating what elements of the
+        (circular) attention will be where, i.e. [A-S//2, ..., A-1, 0, ...,
+        A-1, 0, ..., S//2-1]. Indices are cached, as they depend only on the
+        number of addresses (and shift size).
+
+        :param num_addr: number of addresses in memory
+        :returns: LongTensor of size [ADDRESS_SIZE + SHIFT_SIZE - 1]
+
+        """
+        # Check whether inputs are already on GPU or not.
+        dtype = AppState().LongTensor
+
+        key = (num_addr, dtype)
+        if key not in self.circular_indices_cache:
+            shift_size = self.interface_shift_size
+            indices = np.arange(-shift_size // 2 + 1,
+                                num_addr + shift_size // 2) % num_addr
+            self.circular_indices_cache[key] = torch.from_numpy(
+                indices).type(dtype)
+        return self.circular_indices_cache[key]
+
     def circular_convolution(self, attention_BxAx1, shift_BxSx1):
         """
         Performs circular convolution, i.e. shitfts the attention accodring to
         given shift vector (convolution mask).
 
+        Convolution is performed for all batch-filter pairs at once: the
+        extended attention is split into sliding windows of SHIFT_SIZE
+        elements (one per address) and multiplied by the shift kernels.
+
         :param attention_BxAx1: Current attention [BATCH_SIZE x ADDRESS_SIZE x 1]
         :param shift_BxSx1: soft shift maks (convolutional kernel) [BATCH_SIZE x SHIFT_SIZE x 1]
         :returns: attention vector of size [BATCH_SIZE x ADDRESS_SIZE x 1]
 
         """
-        def circular_index(idx, num_addr):
-            """
-            Calculates the index, taking into consideration the number of
-            addresses in memory.
-
-            :param idx: index (single element)
-            :param num_addr: number of addresses in memory
-
-            """
-            if idx < 0:
-                return num_addr + idx
-            elif idx >= num_addr:
-                return idx - num_addr
-            else:
-                return idx
-
-        # Check whether inputs are already on GPU or not.
-        #dtype = torch.cuda.LongTensor if attention_BxAx1.is_cuda else torch.LongTensor
-        dtype = AppState().LongTensor
-
-        # Get number of memory addresses and batch size.
-        batch_size = attention_BxAx1.size(0)
+        # Get number of memory addresses.
         num_addr = attention_BxAx1.size(1)
         shift_size = self.interface_shift_size
 
-        #logger.debug("shift_BxSx1 {}: {}".format(shift_BxSx1,  shift_BxSx1.size()))
-        # Create an extended list of indices indicating what elements of the
-        # sequence will be where.
-        ext_indices_tensor = torch.Tensor(
-            [circular_index(shift, num_addr)
-             for shift in range(
-                 -shift_size // 2 + 1, num_addr + shift_size // 2)]).type(dtype)
-        #logger.debug("ext_indices {}:\n {}".format(ext_indices_tensor.size(),  ext_indices_tensor))
+        # Get the extended list of indices.
+        ext_indices_tensor = self.circular_indices(num_addr)
 
         # Use indices for creation of an extended attention vector.
-        ext_attention_BxEAx1 = torch.index_select(
-            attention_BxAx1, dim=1, index=ext_indices_tensor)
-        #logger.debug("ext_attention_BxEAx1 {}:\n {}".format(ext_attention_BxEAx1.size(),  ext_attention_BxEAx1))
-
-        # Transpose inputs to convolution.
-        ext_att_trans_Bx1xEA = torch.transpose(ext_attention_BxEAx1, 1, 2)
-        shift_trans_Bx1xS = torch.transpose(shift_BxSx1, 1, 2)
-        # Perform  convolution for every batch-filter pair.
-        tmp_attention_list = []
-        for b in range(batch_size):
-            tmp_attention_list.append(F.conv1d(ext_att_trans_Bx1xEA.narrow(
-                0, b, 1), shift_trans_Bx1xS.narrow(0, b, 1)))
-        # Concatenate list into a single tensor.
-        shifted_attention_BxAx1 = torch.transpose(
-            torch.cat(tmp_attention_list, dim=0), 1, 2)
+        ext_attention_BxEA = torch.index_select(
+            attention_BxAx1, dim=1, index=ext_indices_tensor).squeeze(2)
+        #logger.debug("ext_attention_BxEA {}:\n {}".format(ext_attention_BxEA.size(),  ext_attention_BxEA))
+
+        # Sliding windows - window a contains elements a, ..., a+S-1 of the
+        # extended attention.
+        windows_BxAxS = ext_attention_BxEA.unfold(1, shift_size, 1)
+
+        # Perform convolution (just like conv1d, a cross-correlation) for all
+        # batch-filter pairs.
+        shifted_attention_BxAx1 = torch.bmm(windows_BxAxS, shift_BxSx1)
         #logger.debug("shifted_attention_BxAx1 {}:\n {}".format(shifted_attention_BxAx1.size(),  shifted_attention_BxAx1))
 
         return shifted_attention_BxAx1
@@ -97,30 +97,18 @@ class NTM(SequentialModel):
         # Initialize 'zero' state.
         cell_state = self.ntm_cell.init_state(init_memory_BxAxC)
 
-        # List of output logits [BATCH_SIZE x OUTPUT_SIZE] of length SEQ_LENGTH
-        output_logits_BxO_S = []
-
         # Check if we want to collect cell history for the visualization
         # purposes.
+        record_state = None
         if self.app_state.visualize:
             self.cell_state_history = []
             self.cell_state_initial = cell_state
+            record_state = self.cell_state_history.append
 
-        # Divide sequence into chunks of size [BATCH_SIZE x INPUT_SIZE] and
-        # process them one by one.
-        for input_t_Bx1xI in inputs_BxSxI.chunk(inputs_BxSxI.size(1), dim=1):
-            # Process one chunk.
-            output_BxO, cell_state = self.ntm_cell(
-                input_t_Bx1xI.squeeze(1), cell_state)
-            # Append to list of logits.
-            output_logits_BxO_S += [output_BxO]
-
-            # Collect cell history - for the visualization purposes.
-            if self.app_state.visualize:
-                self.cell_state_history.append(cell_state)
-
-        # Stack logits along time axis (1).
-        output_logits_BxSxO = torch.stack(output_logits_BxO_S, 1)
+        # Process the items of sequence [BATCH_SIZE x INPUT_SIZE] one by one,
+        # collecting logits [BATCH_SIZE x SEQ_LENGTH x OUTPUT_SIZE].
+        output_logits_BxSxO, cell_state = self.run_recurrent(
+            self.ntm_cell, inputs_BxSxI, cell_state, record_state)
 
         return output_logits_BxSxO
 
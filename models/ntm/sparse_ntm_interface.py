@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""sparse_ntm_interface.py: pytorch module implementing sparse (top-K) access of NTM interface to external memory."""
+__author__ = "Tomasz Kornuta"
+
+
+import torch
+import torch.nn.functional as F
+import collections
+import logging
+logger = logging.getLogger('Sparse-NTM-Interface')
+
+from utils.app_state import AppState
+from models.ntm.ntm_interface import HeadStateTuple, InterfaceStateTuple, NTMInterface
+
+
+# Helper collection type.
+_SparseAttentionTuple = collections.namedtuple(
+    'SparseAttentionTuple', ('indices', 'weights'))
+
+
+class SparseAttentionTuple(_SparseAttentionTuple):
+    """
+    Tuple storing sparse attention: indices of the attended addresses
+    [BATCH_SIZE x K] and their weights [BATCH_SIZE x K] (all other addresses
+    have weight 0).
+    """
+    __slots__ = ()
+
+
+class SparseNTMInterface(NTMInterface):
+    """
+    Class realizing sparse interface between controller and memory, in the
+    style of Sparse Access Memory (Rae et al., 2016).
+
+    Every head keeps only the top-K addresses of its attention, so reads and
+    writes touch only K rows of the memory, and the memory is updated in
+    place. Thus the part of the step that is differentiated (and stored for
+    backward) scales with K instead of the number of addresses. The only
+    operation that visits all addresses is selection of the content-based
+    candidates, which is done without gradient, as a single scan of memory
+    shared by all heads.
+
+    Attentions stored in head states are SparseAttentionTuples. As the memory
+    is modified in place, its past states are not preserved - so the sparse
+    mode cannot be used with gradient checkpointing (or for visualization of
+    memory).
+    """
+
+    def __init__(self, params):
+        """
+        Constructor.
+
+        :param params: Dictionary of parameters.
+
+        """
+        # Call constructor of base class.
+        super(SparseNTMInterface, self).__init__(params)
+
+        # Number of addresses attended by a single head.
+        self.num_sparse_addresses = params['interface']['num_sparse_addresses']
+        assert self.num_sparse_addresses > 0, 'Number of sparse addresses must be > 0'
+
+        # Recomputation of groups of steps would apply the in-place memory
+        # updates twice.
+        if params.get('checkpoint_length', 0) > 0:
+            raise ValueError(
+                'Sparse memory access cannot be used along with gradient checkpointing (checkpoint_length > 0)')
+
+        if AppState().visualize:
+            logger.warning(
+                'Memory is updated in place in sparse access mode - recorded memory states will contain the final memory')
+
+    def init_state(self, batch_size, num_memory_addresses):
+        """
+        Returns 'zero' (initial) state tuple.
+
+        :param batch_size: Size of the batch in given iteraction/epoch.
+        :param num_memory_addresses: Number of memory addresses.
+        :returns: Initial state tuple - object of InterfaceStateTuple class.
+
+        """
+        dtype = AppState().dtype
+        num_sparse = min(self.num_sparse_addresses, num_memory_addresses)
+
+        # Initialize attention: to address 0, i.e. addresses 0, ..., K-1 with
+        # weights [1, 0, ..., 0].
+        init_indices_BxK = torch.arange(0, num_sparse).type(
+            AppState().LongTensor).unsqueeze(0).repeat(batch_size, 1)
+        init_weights_BxK = torch.zeros(batch_size, num_sparse).type(dtype)
+        init_weights_BxK[:, 0] = 1
+        zh_attention = SparseAttentionTuple(init_indices_BxK, init_weights_BxK)
+
+        # Initialize gating: to previous attention (i.e. zero-hard).
+        init_gating = torch.ones(batch_size, 1, 1).type(dtype)
+
+        # Initialize shift - to zero.
+        init_shift = torch.zeros(
+            batch_size, self.interface_shift_size, 1).type(dtype)
+        init_shift[:, 1, 0] = 1
+
+        # Read head states - one for each read head.
+        read_state_tuples = [
+            HeadStateTuple(zh_attention, zh_attention, init_gating, init_shift)
+            for _ in range(self.interface_num_read_heads)]
+
+        # Single write head tuple.
+        write_state_tuple = HeadStateTuple(
+            zh_attention, zh_attention, init_gating, init_shift)
+
+        # Return tuple.
+        return InterfaceStateTuple(read_state_tuples, write_state_tuple)
+
+    def forward(self, ctrl_hidden_state_BxH, prev_memory_BxAxC,
+                prev_interface_state_tuple):
+        """
+        Controller forward function.
+
+        :param ctrl_hidden_state_BxH: a Tensor with controller hidden state of size [BATCH_SIZE  x HIDDEN_SIZE]
+        :param prev_memory_BxAxC: Previous state of the memory [BATCH_SIZE x  MEMORY_ADDRESSES x CONTENT_BITS] - updated in place!
+        :param prev_interface_state_tuple: Tuple containing previous read and write attention vectors.
+        :returns: List of read vectors [BATCH_SIZE x CONTENT_SIZE], updated memory and state tuple (object of LSTMStateTuple class).
+
+        """
+        # Unpack cell state.
+        (prev_read_state_tuples, prev_write_state_tuple) = prev_interface_state_tuple
+        prev_attentions_H = [state_tuple.attention for state_tuple in prev_read_state_tuples] + \
+            [prev_write_state_tuple.attention]
+
+        # Calculate parameters of all heads (read heads followed by the write
+        # head).
+        num_read_heads = self.interface_num_read_heads
+        if self.use_fused_heads:
+            params_BxP = self.hidden2params(ctrl_hidden_state_BxH)
+            num_read_params = self.read_param_locations[-1]
+            params_BxP_H = self.split_params(
+                params_BxP, [i * num_read_params for i in range(num_read_heads + 1)] + [params_BxP.size(1)])
+        else:
+            params_BxP_H = [layer(ctrl_hidden_state_BxH)
+                            for layer in self.hidden2read_list]
+            params_BxP_H.append(self.hidden2write_params(ctrl_hidden_state_BxH))
+
+        # Split the parameters.
+        split_params_H = [self.split_params(params_BxP, self.read_param_locations)
+                          for params_BxP in params_BxP_H[:-1]]
+        split_params_H.append(self.split_params(
+            params_BxP_H[-1], self.write_param_locations))
+
+        if self.use_content_based_addressing:
+            # Find content-based candidates of all heads at once.
+            query_vectors_BxHxC = F.sigmoid(torch.stack(
+                [split_params[0] for split_params in split_params_H], dim=1))
+            candidates_BxHxK = self.content_candidates(
+                query_vectors_BxHxC, prev_memory_BxAxC, prev_attentions_H[0].indices.size(1))
+
+        head_state_tuples = []
+        for i, split_params in enumerate(split_params_H):
+            if self.use_content_based_addressing:
+                query_vector_BxC, beta_Bx1, gate_Bx1, shift_BxS, gamma_Bx1 = split_params[:5]
+                # Content-based addressing restricted to the candidates.
+                content_attention = self.sparse_content_based_addressing(
+                    query_vectors_BxHxC[:, i],
+                    F.softplus(beta_Bx1) + 1,
+                    candidates_BxHxK[:, i],
+                    prev_memory_BxAxC)
+                gate_Bx1 = F.sigmoid(gate_Bx1)
+            else:
+                shift_BxS, gamma_Bx1 = split_params[:2]
+                # Location-based addressing ONLY!
+                content_attention = SparseAttentionTuple(
+                    prev_attentions_H[i].indices,
+                    torch.zeros_like(prev_attentions_H[i].weights))
+                gate_Bx1 = torch.zeros_like(gamma_Bx1)
+
+            # Shift and sharpen the gated attention.
+            shift_BxS = F.softmax(shift_BxS, dim=1)
+            attention = self.sparse_location_based_addressing(
+                content_attention, prev_attentions_H[i], gate_Bx1,
+                shift_BxS, F.softplus(gamma_Bx1) + 1,
+                prev_memory_BxAxC.size(1))
+
+            head_state_tuples.append(HeadStateTuple(
+                attention, content_attention,
+                gate_Bx1.unsqueeze(2), shift_BxS.unsqueeze(2)))
+
+        # Read vectors - from memory before the update.
+        read_vectors_BxC_H = [
+            self.read_from_memory(state_tuple.attention, prev_memory_BxAxC)
+            for state_tuple in head_state_tuples[:-1]]
+
+        # Get erase and add vectors - the last write parameters.
+        erase_vector_BxC, add_vector_BxC = split_params_H[-1][-2:]
+        write_state_tuple = head_state_tuples[-1]
+
+        # Update the memory (in place).
+        memory_BxAxC = self.update_memory(
+            write_state_tuple.attention,
+            F.sigmoid(erase_vector_BxC).unsqueeze(1),
+            F.sigmoid(add_vector_BxC).unsqueeze(1),
+            prev_memory_BxAxC)
+
+        # Pack current cell state.
+        interface_state_tuple = InterfaceStateTuple(
+            head_state_tuples[:-1], write_state_tuple)
+
+        # Return read vector, new memory state and state tuple.
+        return read_vectors_BxC_H, memory_BxAxC, interface_state_tuple
+
+    def gather_rows(self, memory_BxAxC, indices_BxK):
+        """
+        Returns rows of memory pointed by indices.
+
+        :param memory_BxAxC: tensor containing memory [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+        :param indices_BxK: indices of addresses [BATCH_SIZE x K]
+        :returns: Tuple (rows [BATCH_SIZE x K x CONTENT_BITS], batch indices [BATCH_SIZE x K]).
+
+        """
+        batch_indices_BxK = torch.arange(0, indices_BxK.size(0)).type(
+            AppState().LongTensor).unsqueeze(1).expand_as(indices_BxK)
+        return memory_BxAxC[batch_indices_BxK, indices_BxK], batch_indices_BxK
+
+    def content_candidates(self, query_vectors_BxHxC, memory_BxAxC, num_sparse):
+        """
+        Finds addresses most similar to the queries of all heads. Similarity is
+        computed without gradient, so only the selected rows take part in the
+        (differentiable) content-based addressing.
+
+        :param query_vectors_BxHxC: NTM "keys" [BATCH_SIZE x HEADS x CONTENT_BITS]
+        :param memory_BxAxC: tensor containing memory [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+        :param num_sparse: Number of candidates (K).
+        :returns: indices of the candidates [BATCH_SIZE x HEADS x K]
+
+        """
+        with torch.no_grad():
+            # Cosine similarity [BATCH_SIZE x HEADS x MEMORY_ADDRESSES] -
+            # divided by norms of rows instead of normalizing (copying) the
+            # whole memory.
+            similarity_BxHxA = torch.matmul(
+                F.normalize(query_vectors_BxHxC, p=2, dim=2),
+                torch.transpose(memory_BxAxC, 1, 2))
+            similarity_BxHxA /= memory_BxAxC.norm(
+                p=2, dim=2).clamp(min=1e-12).unsqueeze(1)
+            _, candidates_BxHxK = torch.topk(similarity_BxHxA, num_sparse, dim=2)
+        return candidates_BxHxK
+
+    def sparse_content_based_addressing(
+            self, query_vector_BxC, beta_Bx1, candidates_BxK, memory_BxAxC):
+        """
+        Computes content-based addressing over the candidate addresses.
+
+        :param query_vector_BxC: NTM "key" [BATCH_SIZE x CONTENT_BITS]
+        :param beta_Bx1: key strength [BATCH_SIZE x 1]
+        :param candidates_BxK: indices of the candidate addresses [BATCH_SIZE x K]
+        :param memory_BxAxC: tensor containing memory before update [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+        :returns: sparse attention (SparseAttentionTuple)
+
+        """
+        rows_BxKxC, _ = self.gather_rows(memory_BxAxC, candidates_BxK)
+        # Cosine similarity [BATCH_SIZE x K].
+        similarity_BxK = torch.matmul(
+            F.normalize(rows_BxKxC, p=2, dim=2),
+            F.normalize(query_vector_BxC, p=2, dim=1).unsqueeze(2)).squeeze(2)
+        # Softmax along the candidates.
+        weights_BxK = F.softmax(similarity_BxK * beta_Bx1, dim=1)
+        return SparseAttentionTuple(candidates_BxK, weights_BxK)
+
+    def sparse_location_based_addressing(
+            self, content_attention, prev_attention, gate_Bx1, shift_BxS,
+            gamma_Bx1, num_addr):
+        """
+        Computes gating, shifting and sharpening of sparse attentions. The
+        (at most 2K x SHIFT_SIZE) entries touched by the shifted gated
+        attention are coalesced, sharpened and the top-K of them are kept.
+
+        :param content_attention: content-based attention (SparseAttentionTuple)
+        :param prev_attention: previous attention (SparseAttentionTuple)
+        :param gate_Bx1: interpolation gate [BATCH_SIZE x 1]
+        :param shift_BxS: soft shift mask [BATCH_SIZE x SHIFT_SIZE]
+        :param gamma_Bx1: sharpening factor [BATCH_SIZE x 1]
+        :param num_addr: number of addresses in memory
+        :returns: sparse attention (SparseAttentionTuple)
+
+        """
+        num_sparse = prev_attention.indices.size(1)
+        shift_size = self.interface_shift_size
+
+        # 1. Gating - concatenate entries of both attentions [BATCH_SIZE x 2K].
+        indices_BxG = torch.cat(
+            [content_attention.indices, prev_attention.indices], dim=1)
+        weights_BxG = torch.cat(
+            [gate_Bx1 * content_attention.weights,
+             (1 - gate_Bx1) * prev_attention.weights], dim=1)
+
+        # 2. Circular convolution - the same as in circular_convolution(), an
+        # entry of address a contributes to address a - s + S//2 with weight
+        # shift[s] [BATCH_SIZE x 2K x SHIFT_SIZE].
+        offsets_S = torch.arange(0, shift_size).type(
+            AppState().LongTensor) - shift_size // 2
+        indices_BxN = torch.remainder(
+            indices_BxG.unsqueeze(2) - offsets_S, num_addr).view(indices_BxG.size(0), -1)
+        weights_BxN = (weights_BxG.unsqueeze(2) *
+                       shift_BxS.unsqueeze(1)).view(indices_BxG.size(0), -1)
+
+        # Coalesce entries pointing to the same address: every entry gets the
+        # sum of its group, and only the first entry of a group is kept.
+        same_BxNxN = (indices_BxN.unsqueeze(2) ==
+                      indices_BxN.unsqueeze(1)).type(weights_BxN.type())
+        weights_BxN = torch.bmm(same_BxNxN, weights_BxN.unsqueeze(2)).squeeze(2)
+        earlier_NxN = torch.tril(torch.ones_like(same_BxNxN[0]), diagonal=-1)
+        first_BxN = ((same_BxNxN * earlier_NxN).sum(dim=2) == 0).type(
+            weights_BxN.type())
+
+        # 3. Sharpening - of the unique entries only.
+        pow_weights_BxN = torch.pow(weights_BxN + 1e-12, gamma_Bx1) * first_BxN
+
+        # Keep top-K entries and normalize them.
+        top_weights_BxK, positions_BxK = torch.topk(
+            pow_weights_BxN, num_sparse, dim=1)
+        return SparseAttentionTuple(
+            torch.gather(indices_BxN, 1, positions_BxK),
+            F.normalize(top_weights_BxK, p=1, dim=1))
+
+    def read_from_memory(self, attention, memory_BxAxC):
+        """
+        Returns 2D tensor of size [BATCH_SIZE x CONTENT_BITS] storing vector
+        read from memory given the sparse attention.
+
+        :param attention: Current attention (SparseAttentionTuple)
+        :param memory_BxAxC: tensor containing memory [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+        :returns: vector read from the memory [BATCH_SIZE x CONTENT_BITS]
+
+        """
+        rows_BxKxC, _ = self.gather_rows(memory_BxAxC, attention.indices)
+        return torch.bmm(attention.weights.unsqueeze(1), rows_BxKxC).squeeze(1)
+
+    def update_memory(self, write_attention,
+                      erase_vector_Bx1xC, add_vector_Bx1xC, prev_memory_BxAxC):
+        """
+        Updates (in place) the K rows of memory pointed by the write attention.
+
+        :param write_attention: Current write attention (SparseAttentionTuple)
+        :param erase_vector_Bx1xC: Erase vector [BATCH_SIZE x  1 x CONTENT_BITS]
+        :param add_vector_Bx1xC: Add vector [BATCH_SIZE x 1 x CONTENT_BITS]
+        :param prev_memory_BxAxC: tensor containing previous state of the memory [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+        :returns: updated memory (the same tensor) [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+
+        """
+        rows_BxKxC, batch_indices_BxK = self.gather_rows(
+            prev_memory_BxAxC, write_attention.indices)
+        weights_BxKx1 = write_attention.weights.unsqueeze(2)
+        # Difference between the new and old content of the rows: the same as
+        # memory * (1 - w * e) + w * a.
+        delta_BxKxC = weights_BxKx1 * \
+            (add_vector_Bx1xC - rows_BxKxC * erase_vector_Bx1xC)
+        # Accumulate, as the same address might appear many times (with weight 0).
+        prev_memory_BxAxC.index_put_(
+            (batch_indices_BxK, write_attention.indices), delta_BxKxC,
+            accumulate=True)
+
+        return prev_memory_BxAxC
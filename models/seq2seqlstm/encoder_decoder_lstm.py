@@ -56,68 +56,140 @@ class EncoderDecoderLSTM(SequentialModel):
         self.encoding_bit = params['encoding_bit']  # Def: 0
         self.decoding_bit = params['decoding_bit']  # Def: 1
 
+        # Check if encoding segments of the sequence should be processed by
+        # single LSTM calls (when no per-step processing is required, DEFAULT: True).
+        params.add_default_params({'use_fused_lstm': True})
+        self.use_fused_lstm = params['use_fused_lstm']
+
         # Create the Encoder.
-        self.encoder = nn.LSTMCell(
-            self.input_size_encoder, self.hidden_state_dim)
+        self.encoder = nn.LSTM(
+            self.input_size_encoder, self.hidden_state_dim, batch_first=True)
 
         # Create the Decoder/Solver.
-        self.decoder = nn.LSTMCell(
-            self.input_size_decoder, self.hidden_state_dim)
+        self.decoder = nn.LSTM(
+            self.input_size_decoder, self.hidden_state_dim, batch_first=True)
 
         # Output linear layer.
         self.output = nn.Linear(self.hidden_state_dim, self.output_size)
 
         self.modes = Enum('Modes', ['Encode', 'Decode'])
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Loads parameters of the model, converting parameters of LSTM cells
+        used in the previous versions into parameters of (single layer) LSTMs.
+
+        :param state_dict: Dictionary containing the whole state (of the model).
+        :param prefix: Prefix of the keys of the model parameters.
+
+        """
+        for module in ['encoder', 'decoder']:
+            for name in ['weight_ih', 'weight_hh', 'bias_ih', 'bias_hh']:
+                cell_key = prefix + '{}.{}'.format(module, name)
+                if cell_key in state_dict:
+                    state_dict[cell_key + '_l0'] = state_dict.pop(cell_key)
+
+        super(EncoderDecoderLSTM, self)._load_from_state_dict(
+            state_dict, prefix, *args, **kwargs)
+
     def init_state(self, batch_size):
 
         dtype = self.app_state.dtype
 
-        # Initialize the hidden state.
-        h_init = torch.zeros(batch_size, self.hidden_state_dim,
+        # Initialize the hidden state [1 x BATCH_SIZE x HIDDEN_SIZE].
+        h_init = torch.zeros(1, batch_size, self.hidden_state_dim,
                              requires_grad=False).type(dtype)
 
-        # Initialize the memory cell state.
-        c_init = torch.zeros(batch_size, self.hidden_state_dim,
+        # Initialize the memory cell state [1 x BATCH_SIZE x HIDDEN_SIZE].
+        c_init = torch.zeros(1, batch_size, self.hidden_state_dim,
                              requires_grad=False).type(dtype)
 
         # Pack and return a tuple.
         return (h_init, c_init)
 
-    def forward(self, data_tuple):
-
-        # Unpack tuple.
-        (inputs, targets) = data_tuple
-        batch_size = inputs.size(0)
-
-        # Initialize state variables.
-        (h, c) = self.init_state(batch_size)
+    def scan_modes(self, inputs):
+        """
+        Scans the control bits (of the first sample) once and returns modes of
+        all items. The mode is set by the first marker and stays till the
+        opposite kind of marker.
 
-        # Logits container.
-        logits = []
+        :param inputs: Inputs [BATCH_SIZE x LENGTH_SIZE x INPUT_SIZE].
+        :returns: List of modes (None before the first marker) - one per item.
 
-        for x in inputs.chunk(inputs.size(1), dim=1):
-            # Squeeze x.
-            x = x.squeeze(1)
+        """
+        # Single transfer of the control bits.
+        control_bits = inputs[0, :, [self.encoding_bit, self.decoding_bit]].detach().cpu().numpy() != 0
 
-            # switch between the encoder and decoder modes. It will stay in
-            # this mode till it hits the opposite kind of marker
-            if x[0, self.decoding_bit] and not x[0, self.encoding_bit]:
+        modes = []
+        mode = None
+        for encoding, decoding in control_bits:
+            if decoding and not encoding:
                 mode = self.modes.Decode
-            elif x[0, self.encoding_bit] and not x[0, self.decoding_bit]:
+            elif encoding and not decoding:
                 mode = self.modes.Encode
-            elif x[0, self.encoding_bit] and x[0, self.decoding_bit]:
+            elif encoding and decoding:
                 print('Error: both encoding and decoding bit were true')
                 exit(-1)
+            modes.append(mode)
+        return modes
+
+    def forward(self, data_tuple):
 
-            logit = self.output(h)
-            logits += [logit]
+        # Unpack tuple.
+        (inputs, targets) = data_tuple
+        batch_size = inputs.size(0)
 
-            if mode == self.modes.Decode:
-                h, c = self.decoder(logit, (h, c))
-            elif mode == self.modes.Encode:
-                h, c = self.encoder(x, (h, c))
+        # Initialize state variables.
+        (h, c) = self.init_state(batch_size)
 
-        # Stack logits along the temporal (sequence) axis.
-        logits = torch.stack(logits, 1)
+        # Get modes of all items.
+        modes = self.scan_modes(inputs)
+
+        if self.use_fused_lstm and self.fused_sequence_allowed():
+            # Process every encoding segment (items in the same mode) at once,
+            # the decoder (fed with its own logits) item by item.
+            logits_segments = []
+            start = 0
+            while start < len(modes):
+                end = start + 1
+                while end < len(modes) and modes[end] == modes[start]:
+                    end += 1
+
+                if modes[start] == self.modes.Encode:
+                    # Logits are calculated from hidden states before the steps.
+                    prev_hidden_BxH = h[0]
+                    hidden_BxSxH, (h, c) = self.encoder(
+                        inputs[:, start:end], (h, c))
+                    logits_segments.append(self.output(torch.cat(
+                        (prev_hidden_BxH.unsqueeze(1), hidden_BxSxH[:, :-1]), dim=1)))
+                elif modes[start] == self.modes.Decode:
+                    for _ in range(start, end):
+                        logit = self.output(h[0])
+                        _, (h, c) = self.decoder(logit.unsqueeze(1), (h, c))
+                        logits_segments.append(logit.unsqueeze(1))
+                else:
+                    # No marker yet - the state does not change.
+                    logits_segments.append(self.output(h[0]).unsqueeze(1).expand(
+                        batch_size, end - start, self.output_size))
+                start = end
+
+            return torch.cat(logits_segments, dim=1)
+
+        def step(x, state):
+            """
+            Processes a single item [BATCH_SIZE x INPUT_SIZE] of the sequence.
+            """
+            (t, h, c) = state
+
+            logit = self.output(h[0])
+
+            if modes[t] == self.modes.Decode:
+                _, (h, c) = self.decoder(logit.unsqueeze(1), (h, c))
+            elif modes[t] == self.modes.Encode:
+                _, (h, c) = self.encoder(x.unsqueeze(1), (h, c))
+
+            return logit, (t + 1, h, c)
+
+        # Process the sequence, collecting logits along the temporal axis.
+        logits, _ = self.run_recurrent(step, inputs, (0, h, c))
         return logits
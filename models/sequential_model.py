@@ -21,6 +21,7 @@ __author__ = "Tomasz Kornuta"
 import numpy as np
 import logging
 import torch
+from torch.utils.checkpoint import checkpoint
 
 from models.model import Model
 from problems.problem import DataTuple
@@ -34,6 +35,10 @@ class SequentialModel(Model):
 
     """
 
+    # Whether the model processes sequences with run_recurrent, i.e. supports
+    # truncated backpropagation through time.
+    supports_truncated_bptt = True
+
     def __init__(self, params):
         """
         Initializes application state and sets plot if visualization flag is
@@ -44,6 +49,330 @@ class SequentialModel(Model):
         """
         super(SequentialModel, self).__init__(params)
 
+        # Gradient checkpointing - number of steps forming a single group,
+        # recomputed during backward pass (DEFAULT: 0, i.e. turned off).
+        if 'checkpoint_length' not in params:
+            params.add_default_params({'checkpoint_length': 0})
+        self.checkpoint_length = params['checkpoint_length']
+
+        # Truncated backpropagation through time - turned off by default.
+        self.truncation_length = 0
+        self.truncation_callback = None
+
+        # Compilation of cells - turned off by default (see compile_cells).
+        self.cell_compilation = None
+        # Compiled cells, keyed by ids of cells - a plain dictionary, so the
+        # compiled wrappers are not registered as submodules.
+        self.compiled_cells = {}
+
+    def set_truncated_bptt(self, truncation_length, callback=None):
+        """
+        Turns on (or off) truncated backpropagation through time. When turned
+        on, run_recurrent splits the sequence into windows of
+        truncation_length items. After processing a window it calls the
+        callback with the window outputs (so it can e.g. calculate the loss,
+        backpropagate and update the parameters) and detaches the state, so
+        the gradients won't flow to the previous windows.
+
+        :param truncation_length: Number of items in window (0 turns truncation off).
+        :param callback: Function (start, outputs_BxKxO) called after every window, where start is the index of the first item of window and K its length (DEFAULT: None).
+
+        """
+        self.truncation_length = truncation_length
+        self.truncation_callback = callback
+
+    def compile_cells(self, mode):
+        """
+        Turns on compilation of recurrent cells (modules passed as step to
+        run_recurrent). Cells are compiled at their first use; when the
+        compilation or the first call of compiled cell fails, the cell is
+        executed in the eager mode. Eager mode is used also when states are
+        recorded (e.g. for visualization).
+
+        :param mode: Compilation mode: 'script' (TorchScript) or 'compile' (torch.compile).
+
+        """
+        if mode not in ['script', 'compile']:
+            raise ValueError(
+                "Unknown cell compilation mode '{}' (allowed: 'script', 'compile')".format(mode))
+        self.cell_compilation = mode
+        self.compiled_cells = {}
+
+    def compiled_step(self, step, record_state=None):
+        """
+        Returns compiled version of the step (if compilation is turned on and
+        step is a cell, i.e. a module).
+
+        :param step: Function or module processing a single item.
+        :param record_state: Hook recording states - if set, the step is not compiled (DEFAULT: None).
+        :returns: Compiled cell or the step itself.
+
+        """
+        if self.cell_compilation is None or record_state is not None or \
+                self.app_state.visualize or not isinstance(step, torch.nn.Module):
+            return step
+
+        key = id(step)
+        if key not in self.compiled_cells:
+            self.compiled_cells[key] = self.compile_cell(step)
+        return self.compiled_cells[key]
+
+    def compile_cell(self, cell):
+        """
+        Compiles the cell, falling back to the cell (eager mode) on failure.
+
+        :param cell: Module processing a single item.
+        :returns: Function (input_BxI, state) -> (output_BxO, state).
+
+        """
+        logger = logging.getLogger('ModelBase')
+        try:
+            if self.cell_compilation == 'compile':
+                compiled_cell = torch.compile(cell)
+            else:
+                compiled_cell = torch.jit.script(cell)
+        except Exception as e:
+            logger.warning("Cannot compile {} ({}: {}), using eager mode".format(
+                type(cell).__name__, type(e).__name__, e))
+            return cell
+
+        # Compilers might fail at the first call (e.g. torch.compile).
+        verified = [False]
+
+        def step(inputs_BxI, state):
+            if verified[0]:
+                return compiled_cell(inputs_BxI, state)
+            try:
+                result = compiled_cell(inputs_BxI, state)
+            except Exception as e:
+                logger.warning("Cannot run compiled {} ({}: {}), using eager mode".format(
+                    type(cell).__name__, type(e).__name__, e))
+                self.compiled_cells[id(cell)] = cell
+                return cell(inputs_BxI, state)
+            verified[0] = True
+            return result
+
+        return step
+
+    def fused_sequence_allowed(self):
+        """
+        Checks whether the whole sequence might be processed by a single
+        (fused) call, i.e. whether no per-step processing (visualization,
+        truncated backpropagation through time or gradient checkpointing) is
+        required.
+
+        :returns: True if fused sequence processing is allowed.
+
+        """
+        if self.app_state.visualize:
+            return False
+        # Truncation and checkpointing are used only when gradients are computed.
+        return not torch.is_grad_enabled() or (
+            self.truncation_length == 0 and self.checkpoint_length == 0)
+
+    @staticmethod
+    def flatten_state(state):
+        """
+        Flattens (possibly nested) state into a list of tensors.
+
+        :param state: Tensor or (named)tuple/list of states - other objects are treated as constants.
+        :returns: Tuple (list of tensors, function rebuilding the state - with the same structure - from list of tensors).
+
+        """
+        tensors = []
+
+        def flatten(state):
+            # Returns function building the state from iterator over tensors.
+            if torch.is_tensor(state):
+                tensors.append(state)
+                return lambda tensor_iter: next(tensor_iter)
+            if isinstance(state, (tuple, list)):
+                builders = [flatten(item) for item in state]
+                if hasattr(state, '_fields'):
+                    # Named tuple.
+                    return lambda tensor_iter: type(state)(
+                        *[build(tensor_iter) for build in builders])
+                return lambda tensor_iter: type(state)(
+                    build(tensor_iter) for build in builders)
+            return lambda tensor_iter: state
+
+        build = flatten(state)
+        return tensors, lambda tensors: build(iter(tensors))
+
+    @staticmethod
+    def detach_state(state):
+        """
+        Detaches (possibly nested) state from the computational graph.
+
+        :param state: Tensor or (named)tuple/list of states - other objects are returned as they are.
+        :returns: Detached state, with the same structure.
+
+        """
+        tensors, rebuild = SequentialModel.flatten_state(state)
+        return rebuild([tensor.detach() for tensor in tensors])
+
+    @staticmethod
+    def blend_states(mask_Bx1, state, other_state):
+        """
+        Blends two (possibly nested) states of the same structure sample-wise,
+        i.e. takes samples of the first state where mask is 1 and samples of
+        the other state where it is 0.
+
+        :param mask_Bx1: Mask of samples [BATCH_SIZE x 1].
+        :param state: State (tensors with batch as the first dimension).
+        :param other_state: Other state.
+        :returns: Blended state, with the same structure.
+
+        """
+        tensors, rebuild = SequentialModel.flatten_state(state)
+        other_tensors, _ = SequentialModel.flatten_state(other_state)
+
+        blended_tensors = []
+        for tensor, other_tensor in zip(tensors, other_tensors):
+            mask = mask_Bx1.view(-1, *([1] * (tensor.dim() - 1)))
+            blended_tensors.append(
+                mask * tensor + (1 - mask) * other_tensor)
+        return rebuild(blended_tensors)
+
+    def run_checkpointed(self, step, inputs_BxNxI, state, record_state=None):
+        """
+        Runs a recurrent step function over a group of items as a single
+        checkpoint, i.e. without storing the intermediate activations - the
+        forward pass of the group is recomputed during the backward pass.
+
+        :param step: Function (input_BxI, state) -> (output_BxO, state) processing a single item.
+        :param inputs_BxNxI: Group of items [BATCH_SIZE x GROUP_LENGTH x INPUT_SIZE].
+        :param state: Initial state (passed to step as it is).
+        :param record_state: Optional hook called with the state after every step (DEFAULT: None).
+        :returns: Tuple (outputs [BATCH_SIZE x GROUP_LENGTH x OUTPUT_SIZE], final state).
+
+        """
+        state_tensors, rebuild_state = self.flatten_state(state)
+        # Structure of the final state - (re)set during every pass.
+        final_state = {}
+        # States are recorded only once, not during recomputation.
+        recorded = [False]
+
+        def run_group(inputs_BxNxI, *state_tensors):
+            state = rebuild_state(state_tensors)
+            outputs_BxO_N = []
+            for n in range(inputs_BxNxI.size(1)):
+                output_BxO, state = step(inputs_BxNxI[:, n], state)
+                outputs_BxO_N.append(output_BxO)
+                if record_state is not None and not recorded[0]:
+                    record_state(state)
+            recorded[0] = True
+
+            final_state_tensors, final_state['rebuild'] = self.flatten_state(
+                state)
+            return (torch.stack(outputs_BxO_N, 1),) + tuple(final_state_tensors)
+
+        # Non-reentrant variant: gradients flow to the parameters even when no
+        # input requires gradient, and the recomputed graph can be traversed
+        # by backward of a state shared by several groups.
+        results = checkpoint(
+            run_group, inputs_BxNxI, *state_tensors, use_reentrant=False)
+        return results[0], final_state['rebuild'](results[1:])
+
+    def run_recurrent(self, step, inputs_BxSxI, state, record_state=None):
+        """
+        Runs a recurrent step function over all items of the input sequence
+        and collects its outputs into a tensor [BATCH_SIZE x SEQ_LENGTH x
+        OUTPUT_SIZE], in time linear in the sequence length.
+
+        When gradients are computed, the outputs are stacked once, at the end
+        (writing them into a preallocated tensor would make autograd copy the
+        whole tensor in backward of every step). Otherwise (e.g. during
+        validation) the outputs are written directly into a buffer allocated
+        once, at the first step.
+
+        When truncated backpropagation through time is turned on (and
+        gradients are computed), the outputs are stacked at the end of every
+        window, passed to the truncation callback and detached - together
+        with the state.
+
+        When gradient checkpointing is turned on (and gradients are
+        computed), the items are processed in groups of checkpoint_length
+        items, with activations of the groups recomputed during the backward
+        pass (groups do not cross the borders of truncation windows).
+
+        When compilation of cells is turned on (see compile_cells) and step
+        is a cell, the compiled cell is used (unless states are recorded).
+
+        :param step: Function (input_BxI, state) -> (output_BxO, state) processing a single item.
+        :param inputs_BxSxI: Input sequence [BATCH_SIZE x SEQ_LENGTH x INPUT_SIZE].
+        :param state: Initial state (passed to step as it is).
+        :param record_state: Optional hook called with the state after every step, e.g. collecting history for visualization (DEFAULT: None).
+        :returns: Tuple (outputs [BATCH_SIZE x SEQ_LENGTH x OUTPUT_SIZE], final state).
+
+        """
+        # Use compiled cell - if required.
+        step = self.compiled_step(step, record_state)
+
+        seq_length = inputs_BxSxI.size(1)
+        stack_outputs = torch.is_grad_enabled()
+        # Truncate and checkpoint only when gradients are computed.
+        truncate = stack_outputs and self.truncation_length > 0
+        use_checkpoints = stack_outputs and self.checkpoint_length > 0
+
+        # List of outputs [BATCH_SIZE x OUTPUT_SIZE] or the output buffer.
+        outputs_BxO_S = []
+        outputs_BxSxO = None
+        # List of (detached) outputs of windows [BATCH_SIZE x WINDOW x OUTPUT_SIZE].
+        outputs_BxKxO_W = []
+
+        t = 0
+        while t < seq_length:
+            if use_checkpoints:
+                # Process a group of items.
+                group_length = min(self.checkpoint_length, seq_length - t)
+                if truncate:
+                    group_length = min(
+                        group_length,
+                        self.truncation_length - t % self.truncation_length)
+                outputs_BxNxO, state = self.run_checkpointed(
+                    step, inputs_BxSxI[:, t:t + group_length], state,
+                    record_state)
+                outputs_BxO_S.extend(torch.unbind(outputs_BxNxO, 1))
+                t += group_length
+            else:
+                # Process one item.
+                output_BxO, state = step(inputs_BxSxI[:, t], state)
+
+                if stack_outputs:
+                    outputs_BxO_S.append(output_BxO)
+                else:
+                    # Allocate the buffer when the output size is known.
+                    if outputs_BxSxO is None:
+                        outputs_BxSxO = output_BxO.new(
+                            output_BxO.size(0), seq_length, output_BxO.size(1))
+                    outputs_BxSxO[:, t] = output_BxO
+
+                # Record state - if required.
+                if record_state is not None:
+                    record_state(state)
+                t += 1
+
+            # End of window - if truncation is used.
+            if truncate and (t % self.truncation_length == 0 or
+                             t == seq_length):
+                outputs_BxKxO = torch.stack(outputs_BxO_S, 1)
+                outputs_BxO_S = []
+                # Let the callback e.g. backpropagate through the window.
+                if self.truncation_callback is not None:
+                    self.truncation_callback(
+                        t - outputs_BxKxO.size(1), outputs_BxKxO)
+                # Cut the graph.
+                outputs_BxKxO_W.append(outputs_BxKxO.detach())
+                state = self.detach_state(state)
+
+        if truncate:
+            outputs_BxSxO = torch.cat(outputs_BxKxO_W, 1)
+        elif stack_outputs:
+            outputs_BxSxO = torch.stack(outputs_BxO_S, 1)
+
+        return outputs_BxSxO, state
+
     def plot(self, data_tuple, predictions, sample_number=0):
         """
         Creates a default interactive visualization, with a slider enabling to
@@ -62,6 +62,8 @@ class SimpleEncoderDecoder(SequentialModel):
     """
     Sequence to Sequence model based on EncoderRNN & DecoderRNN.
     """
+    # Sequences are not processed with run_recurrent.
+    supports_truncated_bptt = False
 
     def __init__(self, params):
         """
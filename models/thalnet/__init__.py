@@ -1,5 +1,5 @@
 from .thalnet_cell import ThalNetCell
 from .thalnet_model import ThalNetModel
-from .thalnet_module import ThalnetModule
+from .thalnet_module import ThalnetModule, ThalnetModuleGroup
 
-__all__ = ['ThalNetCell', 'ThalNetModel', 'ThalnetModule']
+__all__ = ['ThalNetCell', 'ThalNetModel', 'ThalnetModule', 'ThalnetModuleGroup']
@@ -20,7 +20,8 @@ __author__ = "Younes Bouhadjar"
 
 import torch
 from torch import nn
-from models.thalnet.thalnet_module import ThalnetModule
+from models.controllers.ffgru_controller import FFGRUStateTuple
+from models.thalnet.thalnet_module import ThalnetModule, ThalnetModuleGroup
 
 
 class ThalNetCell(nn.Module):
@@ -34,7 +35,8 @@ class ThalNetCell(nn.Module):
                  output_size,
                  context_input_size,
                  center_size_per_module,
-                 num_modules):
+                 num_modules,
+                 use_batched_modules=False):
         """
         Constrcutor of ThalNetCell class.
 
@@ -43,6 +45,7 @@ class ThalNetCell(nn.Module):
         :param context_input_size: context input size
         :param center_size_per_module:  center size per module
         :param num_modules: number of modules
+        :param use_batched_modules: run all modules but the last one (producing the output) as a single batched module (DEFAULT: False)
 
         """
         # Call base class inits here.
@@ -55,28 +58,94 @@ class ThalNetCell(nn.Module):
         self.center_size_per_module = center_size_per_module
         self.num_modules = num_modules
 
-        # init module-center cell
-        self.modules_thalnet = nn.ModuleList()
+        # Modules without outputs can be batched only if there are any.
+        self.use_batched_modules = use_batched_modules and num_modules > 1
 
-        self.modules_thalnet.append(
-            ThalnetModule(
+        if self.use_batched_modules:
+            # init group of modules without outputs - the first one gets the inputs.
+            self.module_group = ThalnetModuleGroup(
+                num_modules=self.num_modules - 1,
                 center_size=self.center_size,
                 context_size=self.context_input_size,
                 center_size_per_module=self.center_size_per_module,
-                input_size=self.input_size,
-                output_size=0))
+                input_size=self.input_size)
 
-        self.modules_thalnet.extend(
-            [
+            # init module producing the output.
+            self.output_module = ThalnetModule(
+                center_size=self.center_size,
+                context_size=self.context_input_size,
+                center_size_per_module=self.center_size_per_module,
+                input_size=0,
+                output_size=self.output_size)
+        else:
+            # init module-center cell
+            self.modules_thalnet = nn.ModuleList()
+            self.modules_thalnet.append(
                 ThalnetModule(
                     center_size=self.center_size,
                     context_size=self.context_input_size,
                     center_size_per_module=self.center_size_per_module,
-                    input_size=0,
-                    output_size=self.output_size if i == self.num_modules -
-                    1 else 0) for i in range(
-                    1,
-                    self.num_modules)])
+                    input_size=self.input_size,
+                    output_size=0))
+
+            self.modules_thalnet.extend(
+                [
+                    ThalnetModule(
+                        center_size=self.center_size,
+                        context_size=self.context_input_size,
+                        center_size_per_module=self.center_size_per_module,
+                        input_size=0,
+                        output_size=self.output_size if i == self.num_modules -
+                        1 else 0) for i in range(
+                        1,
+                        self.num_modules)])
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Loads parameters of the cell, converting them between the per-module
+        (modules_thalnet) and the batched (module_group + output_module)
+        layouts when required - so checkpoints saved with either of them can
+        be loaded.
+
+        :param state_dict: Dictionary containing the whole state (of the model).
+        :param prefix: Prefix of the keys of the cell parameters.
+
+        """
+        module_prefixes = [prefix + 'modules_thalnet.{}.'.format(i)
+                           for i in range(self.num_modules)]
+        group_prefix = prefix + 'module_group.'
+        output_prefix = prefix + 'output_module.'
+
+        def pop_with_prefix(key_prefix):
+            return {key[len(key_prefix):]: state_dict.pop(key)
+                    for key in list(state_dict.keys()) if key.startswith(key_prefix)}
+
+        if self.num_modules < 2:
+            pass
+        elif self.use_batched_modules and any(
+                key.startswith(module_prefixes[0]) for key in state_dict):
+            # Per-module -> batched: stack parameters of modules without
+            # outputs, rename the output module.
+            module_states = [pop_with_prefix(module_prefix)
+                             for module_prefix in module_prefixes]
+            group_state = ThalnetModuleGroup.stack_module_states(
+                module_states[:-1], self.input_size)
+            for name, param in group_state.items():
+                state_dict[group_prefix + name] = param
+            for name, param in module_states[-1].items():
+                state_dict[output_prefix + name] = param
+        elif not self.use_batched_modules and group_prefix + 'ff_bias' in state_dict:
+            # Batched -> per-module.
+            group_state = pop_with_prefix(group_prefix)
+            module_states = ThalnetModuleGroup.unstack_module_states(
+                group_state, self.input_size)
+            module_states.append(pop_with_prefix(output_prefix))
+            for module_prefix, module_state in zip(module_prefixes, module_states):
+                for name, param in module_state.items():
+                    state_dict[module_prefix + name] = param
+
+        super(ThalNetCell, self)._load_from_state_dict(
+            state_dict, prefix, *args, **kwargs)
 
     def init_state(self, batch_size):
         """
@@ -88,6 +157,10 @@ class ThalNetCell(nn.Module):
         """
 
         # module and center state initialisation
+        if self.use_batched_modules:
+            return self.module_group.init_state(batch_size) + \
+                [self.output_module.init_state(batch_size)]
+
         states = [self.modules_thalnet[i].init_state(
             batch_size) for i in range(self.num_modules)]
 
@@ -111,6 +184,21 @@ class ThalNetCell(nn.Module):
         # Concatenate all the centers
         prev_center_states = torch.cat(prev_center_states, dim=1)
 
+        if self.use_batched_modules:
+            # run the modules without outputs at once, stacking their states.
+            hidden_states = self.module_group(
+                inputs, prev_center_states,
+                torch.stack([state.hidden_state for state in prev_controller_states[:-1]], dim=0))
+            states = [(hidden_state, FFGRUStateTuple(hidden_state))
+                      for hidden_state in torch.unbind(hidden_states, dim=0)]
+
+            # run the module producing the output.
+            output, center_feature, module_state = self.output_module(
+                None, prev_center_states, prev_controller_states[-1])
+            states.append((center_feature, module_state))
+
+            return output, states
+
         states = []
         # run the different modules, they share all the same center
         for module, prev_controller_state in zip(
@@ -52,6 +52,9 @@ class ThalNetModel(SequentialModel):
         self.center_size_per_module = params['center_size_per_module']
         self.num_modules = params['num_modules']
         self.output_center_size = self.output_size + self.center_size_per_module
+        # Optional: run modules as a single batched module (DEFAULT: False).
+        params.add_default_params({'use_batched_modules': False})
+        self.use_batched_modules = params['use_batched_modules']
 
         # This is for the time plot
         self.cell_state_history = None
@@ -62,7 +65,8 @@ class ThalNetModel(SequentialModel):
             self.output_size,
             self.context_input_size,
             self.center_size_per_module,
-            self.num_modules)
+            self.num_modules,
+            self.use_batched_modules)
 
     def forward(self, data_tuple):  # x : batch_size, seq_len, input_size
         """
@@ -78,34 +82,25 @@ class ThalNetModel(SequentialModel):
         if self.app_state.visualize:
             self.cell_state_history = []
 
-        output = None
         batch_size = inputs.size(0)
-        seq_length = inputs.size(-2)
+
+        # This is for the time plot
+        def record_state_hook(cell_state):
+            self.cell_state_history.append(
+                [cell_state[i][0].detach().numpy()
+                 for i in range(self.num_modules)] +
+                [cell_state[i][1].hidden_state.detach().numpy()
+                 for i in range(self.num_modules)])
+
+        # Sequence items are along dimension -2 (inputs might contain
+        # channels [batch_size, num_channels, sequence_length, input_size]).
+        inputs = inputs.transpose(1, inputs.dim() - 2)
 
         # init state
         cell_state = self.ThalnetCell.init_state(batch_size)
-        for j in range(seq_length):
-            output_cell, cell_state = self.ThalnetCell(
-                inputs[..., j, :], cell_state)
-
-            if output_cell is None:
-                continue
-
-            output_cell = output_cell[..., None, :]
-            if output is None:
-                output = output_cell
-
-            # concatenate output
-            else:
-                output = torch.cat([output, output_cell], dim=-2)
-
-            # This is for the time plot
-            if self.app_state.visualize:
-                self.cell_state_history.append(
-                    [cell_state[i][0].detach().numpy()
-                     for i in range(self.num_modules)] +
-                    [cell_state[i][1].hidden_state.detach().numpy()
-                     for i in range(self.num_modules)])
+        output, cell_state = self.run_recurrent(
+            self.ThalnetCell, inputs, cell_state,
+            record_state_hook if self.app_state.visualize else None)
 
         return output
 
@@ -24,6 +24,7 @@ from torch import nn
 from utils.app_state import AppState
 
 from models.controllers.controller_factory import ControllerFactory
+from models.controllers.ffgru_controller import FFGRUStateTuple
 
 
 class ThalnetModule(nn.Module):
@@ -121,3 +122,165 @@ class ThalnetModule(nn.Module):
             None, module_state)
 
         return output, center_feature_output, tuple_ctrl_state
+
+
+
+class ThalnetModuleGroup(nn.Module):
+    """
+    Implements a group of Thalnet modules without outputs (i.e. producing only
+    center features) executed as a single, batched module.
+
+    Parameters of all modules are stacked along the first (module) dimension,
+    so a step consists of a few batched matrix multiplications instead of a
+    loop over modules. Only the first module of the group receives the inputs.
+    """
+
+    # Names of the stacked parameters along with names of the corresponding
+    # parameters of ThalnetModule.
+    stacked_params = [('context_weight_g', 'fc_context.weight_g'),
+                      ('context_weight_v', 'fc_context.weight_v'),
+                      ('context_bias', 'fc_context.bias'),
+                      ('ff_weight', 'controller.ff.weight'),
+                      ('ff_bias', 'controller.ff.bias'),
+                      ('gru_weight_ih', 'controller.gru.weight_ih'),
+                      ('gru_weight_hh', 'controller.gru.weight_hh'),
+                      ('gru_bias_ih', 'controller.gru.bias_ih'),
+                      ('gru_bias_hh', 'controller.gru.bias_hh')]
+
+    def __init__(self,
+                 num_modules,
+                 center_size,
+                 context_size,
+                 center_size_per_module,
+                 input_size):
+        super(ThalnetModuleGroup, self).__init__()
+
+        self.num_modules = num_modules
+        self.center_size = center_size
+        self.context_size = context_size
+        self.center_size_per_module = center_size_per_module
+        self.input_size = input_size
+
+        # Create separate modules (initialized in the usual way) and stack
+        # their parameters.
+        modules = [ThalnetModule(
+            center_size=center_size,
+            context_size=context_size,
+            center_size_per_module=center_size_per_module,
+            input_size=input_size if i == 0 else 0,
+            output_size=0) for i in range(num_modules)]
+        stacked_state = self.stack_module_states(
+            [module.state_dict() for module in modules], input_size)
+        for name, param in stacked_state.items():
+            self.register_parameter(name, nn.Parameter(param.clone()))
+
+    @staticmethod
+    def stack_module_states(module_states, input_size):
+        """
+        Stacks parameters of separate ThalnetModules.
+
+        :param module_states: List of state dictionaries of modules.
+        :param input_size: Size of inputs of the first module.
+        :returns: Dictionary of stacked parameters.
+
+        """
+        stacked_state = {}
+        for name, module_name in ThalnetModuleGroup.stacked_params:
+            params = [state[module_name] for state in module_states]
+            if name == 'ff_weight' and input_size:
+                # The first module gets inputs concatenated with the context.
+                stacked_state['ff_input_weight'] = params[0][:, :input_size]
+                params[0] = params[0][:, input_size:]
+            stacked_state[name] = torch.stack(params, dim=0)
+        return stacked_state
+
+    @staticmethod
+    def unstack_module_states(stacked_state, input_size):
+        """
+        Splits stacked parameters into parameters of separate ThalnetModules.
+
+        :param stacked_state: Dictionary of stacked parameters.
+        :param input_size: Size of inputs of the first module.
+        :returns: List of state dictionaries of modules.
+
+        """
+        num_modules = stacked_state['ff_bias'].size(0)
+        module_states = [{} for _ in range(num_modules)]
+        for name, module_name in ThalnetModuleGroup.stacked_params:
+            for state, param in zip(module_states, stacked_state[name]):
+                state[module_name] = param
+        if input_size:
+            module_states[0]['controller.ff.weight'] = torch.cat(
+                (stacked_state['ff_input_weight'],
+                 module_states[0]['controller.ff.weight']), dim=1)
+        return module_states
+
+    def init_state(self, batch_size):
+        """
+        Initialize states of all modules in the group.
+
+        :param batch_size: batch size
+        :return: list of (center_state_per_module, tuple_controller_states)
+
+        """
+        dtype = AppState().dtype
+
+        states = []
+        for _ in range(self.num_modules):
+            # module state initialisation
+            tuple_controller_states = FFGRUStateTuple(torch.zeros(
+                (batch_size, self.center_size_per_module)).type(dtype))
+            # center state initialisation
+            center_state_per_module = torch.randn(
+                (batch_size, self.center_size_per_module)).type(dtype)
+            states.append((center_state_per_module, tuple_controller_states))
+
+        return states
+
+    def forward(self, inputs, prev_center_state, prev_hidden_states):
+        """
+        Runs all modules of the group at once.
+
+        :param inputs: inputs [batch_size, input_size] (used by the first module only)
+        :param prev_center_state: previous center state [batch_size, center_size]
+        :param prev_hidden_states: previous hidden states of module controllers [num_modules, batch_size, center_size_per_module]
+        :return: hidden states (being also center features) [num_modules, batch_size, center_size_per_module]
+        """
+        # Context inputs of all modules [num_modules, batch_size, context_size]
+        # - computed with a single matrix multiplication. Weight normalization
+        # (along rows) is applied to the outputs, so normalized weights are
+        # not materialized.
+        context_scale = self.context_weight_g.squeeze(2) / \
+            self.context_weight_v.norm(p=2, dim=2)
+        context_input = torch.mm(
+            prev_center_state,
+            self.context_weight_v.view(-1, self.center_size).t()).view(
+            -1, self.num_modules, self.context_size).transpose(0, 1) * \
+            context_scale.unsqueeze(1) + self.context_bias.unsqueeze(1)
+
+        # FF layers of controllers [num_modules, batch_size, center_size_per_module].
+        ff_output = torch.bmm(context_input, self.ff_weight.transpose(1, 2)) + \
+            self.ff_bias.unsqueeze(1)
+        if self.input_size:
+            if len(inputs.size()) == 3:
+                # inputs_size : [batch_size, num_channel, input_size]
+                # select channel
+                inputs = inputs[:, 0, :]
+            ff_output = torch.cat(
+                (ff_output[:1] + torch.matmul(inputs, self.ff_input_weight.t()),
+                 ff_output[1:]), dim=0)
+
+        # GRU cells (just like nn.GRUCell).
+        gates_i = torch.bmm(ff_output, self.gru_weight_ih.transpose(1, 2)) + \
+            self.gru_bias_ih.unsqueeze(1)
+        gates_h = torch.bmm(prev_hidden_states, self.gru_weight_hh.transpose(1, 2)) + \
+            self.gru_bias_hh.unsqueeze(1)
+        i_r, i_z, i_n = gates_i.chunk(3, dim=2)
+        h_r, h_z, h_n = gates_h.chunk(3, dim=2)
+        reset_gate = torch.sigmoid(i_r + h_r)
+        update_gate = torch.sigmoid(i_z + h_z)
+        new_gate = torch.tanh(i_n + reset_gate * h_n)
+        hidden_states = (1 - update_gate) * new_gate + \
+            update_gate * prev_hidden_states
+
+        return hidden_states
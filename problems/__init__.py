@@ -5,4 +5,5 @@ from .utils import *
 from .video_to_class import *
 
 from .problem import DataTuple, MaskAuxTuple, LabelAuxTuple, Problem
+from .batch_prefetcher import BatchPrefetcher, BatchPool
 from .problem_factory import ProblemFactory
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""batch_prefetcher.py: contains wrappers generating batches of a problem in the background"""
+__author__ = "Tomasz Kornuta"
+
+import multiprocessing.connection
+import queue
+import threading
+import traceback
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+
+class BatchPrefetcher(object):
+    """
+    Wrapper around a problem that generates the next batches in a background
+    thread, while the model is processing the current one.
+
+    Offers the same ``return_generator()`` and
+    ``curriculum_learning_update_params()`` interface as the problem itself,
+    so the workers can use both interchangeably.
+
+    Every batch is tagged with the "generation" of the problem parameters it
+    was generated with. Whenever curriculum learning changes any of those
+    parameters (e.g. ``max_sequence_length``), the generation is increased and
+    all batches waiting in the queue are dropped and generated anew. Hence the
+    returned batches always follow the current parameters of the problem,
+    exactly as when the batches are generated synchronously. Batches are
+    generated with ``problem.generate_batch_for_episode()``, so the
+    regenerated ones keep their episode numbers.
+
+    """
+
+    def __init__(self, problem, depth):
+        """
+        Initializes the prefetcher. The background thread is started lazily,
+        when the first batch is requested.
+
+        :param problem: Problem whose batches will be prefetched.
+        :param depth: Maximal number of batches generated in advance (queue depth).
+
+        """
+        assert depth > 0, "Prefetch queue depth must be positive (currently %r)" % depth
+
+        # Store pointer to problem.
+        self.problem = problem
+        self.depth = depth
+
+        # Batches waiting in the queue, the one being generated and the one
+        # being used must not share buffers.
+        problem.reserve_batch_buffers(depth + 2)
+
+        # Queue of (generation, batch) pairs.
+        self._queue = queue.Queue(maxsize=depth)
+        # Lock guarding the problem parameters during generation and updates.
+        self._lock = threading.Lock()
+        # Generation of the problem parameters.
+        self._generation = 0
+        # Number of the episode of the next batch to be generated.
+        self._next_episode = 0
+        # Number of the episode following the last returned batch.
+        self._episode = 0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _generation_params(self):
+        """
+        Returns snapshot of the public "scalar" attributes of the problem,
+        i.e. the ones that curriculum learning might change between episodes.
+
+        """
+        return {key: value for key, value in vars(self.problem).items()
+                if isinstance(value, (bool, int, float, str))
+                and not key.startswith('_')}
+
+    def _worker(self):
+        """
+        Body of the background thread - generates batches and puts them into
+        the queue until stopped.
+
+        """
+        while not self._stop_event.is_set():
+            try:
+                with self._lock:
+                    generation = self._generation
+                    episode = self._next_episode
+                    self._next_episode += 1
+                    batch = self.problem.generate_batch_for_episode(episode)
+            except Exception as e:
+                # Pass the exception to the consumer.
+                batch = e
+
+            # Wait for a free slot, checking periodically whether we should
+            # stop.
+            while True:
+                try:
+                    self._queue.put((generation, batch), timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._stop_event.is_set():
+                        return
+
+            # Finish after an exception.
+            if isinstance(batch, Exception):
+                return
+
+    def start(self):
+        """
+        Starts the background thread (if not started yet).
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread and drops all prefetched batches.
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        # Empty the queue so the thread won't wait for a free slot.
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._thread.join()
+        self._thread = None
+        # Drop the remaining batches.
+        self._queue = queue.Queue(maxsize=self.depth)
+
+    def return_generator(self, episode=0):
+        """
+        Returns a generator yielding batches prefetched in the background.
+
+        :param episode: Number of the first episode (DEFAULT: 0).
+        :returns: A tuple: (data_tuple, aux_tuple), as returned by problem.generate_batch().
+
+        """
+        self.stop()
+        self._episode = episode
+        self._next_episode = episode
+        self.start()
+        try:
+            while True:
+                generation, batch = self._queue.get()
+                # Forward exceptions raised in the background thread.
+                if isinstance(batch, Exception):
+                    raise batch
+                # Drop batches generated with outdated parameters.
+                if generation != self._generation:
+                    continue
+                self._episode += 1
+                yield batch
+        finally:
+            self.stop()
+
+    def curriculum_learning_update_params(self, episode):
+        """
+        Updates problem parameters according to curriculum learning. If any of
+        the parameters has changed, the prefetched batches are invalidated.
+
+        :param episode: Number of the current episode.
+        :returns: Boolean informing whether curriculum learning is finished (or wasn't active at all).
+
+        """
+        with self._lock:
+            params_before = self._generation_params()
+            curric_done = self.problem.curriculum_learning_update_params(
+                episode)
+            if self._generation_params() != params_before:
+                self._invalidate()
+        return curric_done
+
+    def _invalidate(self):
+        """
+        Invalidates the prefetched batches.
+        """
+        self._generation += 1
+        # Regenerate batches following the last returned one.
+        self._next_episode = self._episode
+
+
+def _pool_worker(problem, worker_id, seed, task_queue, result_queue):
+    """
+    Body of a batch generation process of the ``BatchPool``.
+
+    Receives (generation, episode, params) tasks, updates the problem
+    parameters, generates the batch and sends it back. The tensors are moved
+    to shared memory by the queue, so only their handles are pickled.
+
+    :param problem: Copy of the problem (inherited by the process).
+    :param worker_id: Number of the worker.
+    :param seed: Seed common to all workers.
+    :param task_queue: Queue of tasks (None finishes the process).
+    :param result_queue: Queue of (generation, episode, batch) results.
+
+    """
+    # Use a single core per worker.
+    torch.set_num_threads(1)
+    # Worker-local random stream.
+    np.random.seed([seed, worker_id])
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        generation, episode, params = task
+        try:
+            # Follow the (e.g. curriculum learning) changes of parameters.
+            vars(problem).update(params)
+            batch = problem.generate_batch_for_episode(episode)
+        except Exception:
+            # Pass the exception (with traceback) to the consumer.
+            batch = RuntimeError(traceback.format_exc())
+        result_queue.put((generation, episode, batch))
+
+
+class BatchPool(BatchPrefetcher):
+    """
+    Prefetcher generating batches in a pool of worker processes, so the
+    generation can use all the spare cores.
+
+    Every worker has its own copy of the problem and its own random stream.
+    For problems with batch_seed set, every batch depends only on its episode,
+    so the returned batches do not depend on the number of workers.
+    Batches are returned in the order of episodes.
+
+    """
+
+    def __init__(self, problem, depth, num_workers):
+        """
+        Initializes the pool. The worker processes are started lazily, when
+        the first batch is requested.
+
+        :param problem: Problem whose batches will be prefetched.
+        :param depth: Maximal number of batches generated in advance.
+        :param num_workers: Number of worker processes.
+
+        """
+        super(BatchPool, self).__init__(problem, depth)
+        assert num_workers > 0, "Number of workers must be positive (currently %r)" % num_workers
+        self.num_workers = num_workers
+
+        self._processes = []
+        self._task_queue = None
+        self._result_queue = None
+        # Number of tasks sent to the workers and not received yet.
+        self._pending = 0
+        # Received batches, waiting for their episode.
+        self._results = {}
+
+    def start(self):
+        """
+        Starts the worker processes (if not started yet).
+        """
+        if self._processes:
+            return
+        self._task_queue = mp.Queue()
+        self._result_queue = mp.Queue()
+        self._pending = 0
+        self._results = {}
+
+        # Draw the common seed from the global random state, so it follows
+        # the seed_numpy of training/testing.
+        seed = np.random.randint(0, 2**31)
+        for worker_id in range(self.num_workers):
+            process = mp.Process(
+                target=_pool_worker,
+                args=(self.problem, worker_id, seed,
+                      self._task_queue, self._result_queue),
+                daemon=True)
+            process.start()
+            self._processes.append(process)
+
+    def stop(self):
+        """
+        Stops the worker processes and drops all prefetched batches.
+        """
+        if not self._processes:
+            return
+        for _ in self._processes:
+            self._task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._task_queue = None
+        self._result_queue = None
+        self._pending = 0
+        self._results = {}
+
+    def _request_batches(self):
+        """
+        Sends new tasks to the workers, up to the queue depth.
+        """
+        params = self._generation_params()
+        # Received (but not returned yet) batches also count.
+        while self._pending + len(self._results) < self.depth:
+            self._task_queue.put(
+                (self._generation, self._next_episode, params))
+            self._next_episode += 1
+            self._pending += 1
+
+    def _get_result(self, poll_interval=1.0):
+        """
+        Waits for the next result sent by the workers. Raises an exception if
+        any worker died meanwhile (e.g. killed by the OOM killer, or crashed)
+        - exceptions raised in the workers are forwarded as results instead.
+
+        :param poll_interval: Interval of checking the workers [s] (DEFAULT: 1.0).
+        :returns: Tuple (generation, episode, batch or exception).
+
+        """
+        while True:
+            try:
+                return self._result_queue.get(timeout=poll_interval)
+            except queue.Empty:
+                self._check_workers()
+            except (OSError, EOFError):
+                # Tensors sent by a worker that died meanwhile cannot be
+                # received - wait until its death is reported.
+                sentinels = multiprocessing.connection.wait(
+                    [process.sentinel for process in self._processes],
+                    timeout=poll_interval)
+                for process in self._processes:
+                    if process.sentinel in sentinels:
+                        process.join(timeout=poll_interval)
+                self._check_workers()
+                raise
+
+    def _check_workers(self):
+        """
+        Raises an exception if any of the worker processes is not running.
+        """
+        for worker_id, process in enumerate(self._processes):
+            if not process.is_alive():
+                raise RuntimeError(
+                    "BatchPool worker {} (pid {}) died unexpectedly with exit code {}".format(
+                        worker_id, process.pid, process.exitcode))
+
+    def return_generator(self, episode=0):
+        """
+        Returns a generator yielding batches generated by the worker
+        processes, in the order of episodes.
+
+        :param episode: Number of the first episode (DEFAULT: 0).
+        :returns: A tuple: (data_tuple, aux_tuple), as returned by problem.generate_batch().
+
+        """
+        self.stop()
+        self._episode = episode
+        self._next_episode = episode
+        self.start()
+        try:
+            while True:
+                # Wait for the batch of the current episode.
+                while self._episode not in self._results:
+                    self._request_batches()
+                    generation, result_episode, batch = self._get_result()
+                    self._pending -= 1
+                    # Forward exceptions raised in the workers.
+                    if isinstance(batch, Exception):
+                        raise batch
+                    # Drop batches generated with outdated parameters.
+                    if generation == self._generation:
+                        self._results[result_episode] = batch
+                batch = self._results.pop(self._episode)
+                self._episode += 1
+                yield batch
+        finally:
+            self.stop()
+
+    def _invalidate(self):
+        """
+        Invalidates the prefetched batches.
+        """
+        super(BatchPool, self)._invalidate()
+        self._results = {}
@@ -85,6 +85,16 @@ class CLEVR(ImageTextToClassProblem):
         self.clevr_humans = params['clevr_humans']
         self.embedding_type = params['embedding_type']
         self.random_embedding_dim = params['random_embedding_dim']
+        # Read feature maps from a memory-mapped .npy file (DEFAULT: False).
+        params.add_default_params({'mmap_feature_maps': False})
+        self.mmap_feature_maps = params['mmap_feature_maps']
+
+        # Parameters of the data loader (DEFAULT: no worker processes).
+        params.add_default_params({'num_workers': 0, 'prefetch_factor': 2,
+                                   'persistent_workers': True})
+        self.num_workers = params['num_workers']
+        self.prefetch_factor = params['prefetch_factor']
+        self.persistent_workers = params['persistent_workers']
 
         # instantiate CLEVRDataset class
         self.clevr_dataset = CLEVRDataset(
@@ -92,7 +102,8 @@ class CLEVR(ImageTextToClassProblem):
             self.clevr_dir,
             self.clevr_humans,
             self.embedding_type,
-            self.random_embedding_dim)
+            self.random_embedding_dim,
+            self.mmap_feature_maps)
 
         # to compute the accuracy per family
         self.family_list = [
@@ -126,6 +137,36 @@ class CLEVR(ImageTextToClassProblem):
             'equal_integer': 'compare_integer',
             'query_material': 'query_attribute'}
 
+        # Create the (long-lived) data loader. Samples are reshuffled only at
+        # the epoch boundaries, when the iterator is recreated.
+        self.clevr_loader = self.create_loader()
+        self.epoch = 0
+        self.clevr_iterator = None
+
+    def create_loader(self):
+        """
+        Creates the data loader iterating over self.clevr_dataset in random
+        order. Worker processes (if any) are kept alive between the epochs when
+        persistent_workers is set.
+
+        :return: DataLoader object.
+
+        """
+        loader_kwargs = {}
+        if self.num_workers > 0:
+            loader_kwargs['prefetch_factor'] = self.prefetch_factor
+            loader_kwargs['persistent_workers'] = self.persistent_workers
+
+        return DataLoader(
+            self.clevr_dataset,
+            batch_size=self.batch_size,
+            collate_fn=self.clevr_dataset.collate_data,
+            sampler=RandomSampler(self.clevr_dataset),
+            num_workers=self.num_workers,
+            # All batches must be full (as long as the set is big enough).
+            drop_last=len(self.clevr_dataset) >= self.batch_size,
+            **loader_kwargs)
+
     def get_acc_per_family(self, data_tuple, aux_tuple, logits):
         """
         Compute the accuracy per family for the current batch. Also accumulates
@@ -206,7 +247,9 @@ class CLEVR(ImageTextToClassProblem):
 
     def generate_batch(self):
         """
-        Generates a batch from self.clevr_dataset.
+        Generates a batch from self.clevr_dataset, taking the next batch of the
+        current epoch (a new epoch is started when the current one is
+        exhausted).
 
         WARNING: WE PASS THE QUESTIONS LENGTH INTO THE DATATUPLE!
 
@@ -215,15 +258,19 @@ class CLEVR(ImageTextToClassProblem):
 
         """
 
-        clevr_loader = DataLoader(
-            self.clevr_dataset,
-            batch_size=self.batch_size,
-            collate_fn=self.clevr_dataset.collate_data,
-            sampler=RandomSampler(
-                self.clevr_dataset))
+        # Start the first epoch lazily.
+        if self.clevr_iterator is None:
+            self.clevr_iterator = iter(self.clevr_loader)
+
+        try:
+            batch = next(self.clevr_iterator)
+        except StopIteration:
+            # End of epoch - start a new one (with a new permutation).
+            self.epoch += 1
+            self.clevr_iterator = iter(self.clevr_loader)
+            batch = next(self.clevr_iterator)
 
-        images, questions, questions_len, answers, s_questions, indexes, imgfiles, question_types = next(
-            iter(clevr_loader))
+        images, questions, questions_len, answers, s_questions, indexes, imgfiles, question_types = batch
 
         # create data_tuple
         image_text_tuple = ImageTextTuple(images, questions)
@@ -348,7 +395,8 @@ if __name__ == "__main__":
         'set': 'train',
         'clevr_humans': False,
         'embedding_type': 'random',
-        'random_embedding_dim': 300})
+        'random_embedding_dim': 300,
+        'num_workers': 4})
 
     # create problem
     problem = CLEVR(params)
@@ -50,6 +50,8 @@ clevr_dataset.py: This file contains 1 class:
 __author__ = "Vincent Albouy, Vincent Marois"
 
 import h5py
+import itertools
+import numpy as np
 import torch
 import pickle
 
@@ -64,6 +66,32 @@ import logging
 logger = logging.getLogger('CLEVR')
 
 
+def convert_feature_maps_to_npy(hdf5_filename, npy_filename, block_size=1000):
+    """
+    Converts the .hdf5 file containing the feature maps into a .npy file, which
+    can be memory-mapped (so reads of the feature maps become views of the
+    page cache instead of reads through the hdf5 library).
+
+    :param hdf5_filename: Name of the .hdf5 file (with feature maps stored in the 'data' dataset).
+    :param npy_filename: Name of the created .npy file.
+    :param block_size: Number of images copied at once.
+
+    """
+    with h5py.File(hdf5_filename, 'r') as h:
+        dset = h['data']
+        # write to a temporary file first, so an interrupted conversion does
+        # not leave an incomplete file.
+        tmp_filename = npy_filename + '.tmp'
+        out = np.lib.format.open_memmap(
+            tmp_filename, mode='w+', dtype=dset.dtype, shape=dset.shape)
+        for start in range(0, dset.shape[0], block_size):
+            out[start:start + block_size] = dset[start:start + block_size]
+        out.flush()
+        del out
+    os.replace(tmp_filename, npy_filename)
+    logger.warning('File {} successfully created.'.format(npy_filename))
+
+
 class CLEVRDataset(Dataset):
     """
     Inherits from the Dataset class to represent the CLEVR dataset. Will be used by the Clevr class to generate
@@ -76,13 +104,13 @@ class CLEVRDataset(Dataset):
     """
 
     def __init__(self, set, clevr_dir, clevr_humans,
-                 embedding_type='random', random_embedding_dim=300):
+                 embedding_type='random', random_embedding_dim=300, mmap_feature_maps=False):
         """
         Instantiate a ClevrDataset object:
 
             - Mainly check if the files containing the extracted features & tokenized questions already exist. If not,
             it generates them for the specified sub-set.
-            - self.img contains then the extracted feature maps
+            - self.img contains then the extracted feature maps (the file is opened lazily, by every process using it)
             - self.data contains the tokenized questions, the associated image filenames, the answers & the question string
 
         The questions are then embedded based on the specified embedding. This embedding is random by default, but
@@ -99,6 +127,9 @@ class CLEVRDataset(Dataset):
 
         :param random_embedding_dim: In the case of random embedding, this is the embedding dimension to use.
 
+        :param mmap_feature_maps: Boolean to indicate whether to read the feature maps from a memory-mapped .npy file
+        (converted once from the .hdf5 file) instead of the .hdf5 file.
+
         """
         # call base constructor
         super(CLEVRDataset).__init__()
@@ -109,6 +140,7 @@ class CLEVRDataset(Dataset):
         self.clevr_humans = clevr_humans
         self.embedding_type = embedding_type
         self.random_embedding_dim = random_embedding_dim
+        self.mmap_feature_maps = mmap_feature_maps
 
         # Get access to app state.
         self.app_state = AppState()
@@ -140,9 +172,22 @@ class CLEVRDataset(Dataset):
                 feature_maps_filename))
             self.generate_feature_maps_file(feature_maps_filename)
 
-        # actually load the file
-        self.h = h5py.File(feature_maps_filename, 'r')
-        self.img = self.h['data']
+        # convert the file to a memory-mapped .npy file (only once)
+        if self.mmap_feature_maps:
+            npy_filename = feature_maps_filename[:-len('.hdf5')] + '.npy'
+            if not os.path.isfile(npy_filename):
+                logger.warning('File {} not found on disk, converting {} into it.'.format(
+                    npy_filename, feature_maps_filename))
+                convert_feature_maps_to_npy(feature_maps_filename, npy_filename)
+            feature_maps_filename = npy_filename
+
+        # the file is actually opened lazily, separately by every process
+        # using the dataset (e.g. by DataLoader workers), as handles cannot
+        # be shared between processes.
+        self.feature_maps_filename = feature_maps_filename
+        self.h = None
+        self._img = None
+        self._img_pid = None
 
         # checking if the file containing the tokenized questions (& answers,
         # image filename) exists or not
@@ -193,8 +238,8 @@ class CLEVRDataset(Dataset):
                 self.data, self.word_dic, self.answer_dic = self.generate_questions_dics(
                     self.set, word_dic=None, answer_dic=None)
 
-        # At this point, the objects self.img & self.data contains the feature
-        # maps & questions
+        # At this point, the objects self.feature_maps_filename & self.data
+        # point to the feature maps & contain the questions
 
         # creates the objects for the specified embeddings
         if self.embedding_type == 'random':
@@ -234,7 +279,26 @@ class CLEVRDataset(Dataset):
             self.language.build_pretrained_vocab(
                 self.questions, vectors=self.embedding_type)
 
-        # Done! The actual question embedding is handled in __getitem__.
+        # store the questions as indices of words (in the vocabulary of the
+        # used embedding), concatenated into a single array
+        if self.embedding_type == 'random':
+            self.embedding_dim = self.random_embedding_dim
+            tokenized_questions = [q['tokenized_question'] for q in self.data]
+            questions_lengths = [len(question) for question in tokenized_questions]
+            self.question_indices = np.fromiter(
+                itertools.chain.from_iterable(tokenized_questions),
+                dtype=np.int32, count=sum(questions_lengths))
+        else:
+            self.embedding_dim = self.language.vocab.vectors.size(1)
+            indices, questions_lengths = self.language.sentences_to_indices(
+                self.questions)
+            self.question_indices = indices.numpy().astype(np.int32)
+
+        self.question_offsets = np.concatenate(
+            ([0], np.cumsum(questions_lengths))).astype(np.int64)
+
+        # Done! The actual question embedding is handled in collate_data(),
+        # for the whole batch at once.
 
     def __len__(self):
         """
@@ -242,11 +306,81 @@ class CLEVRDataset(Dataset):
         """
         return len(self.data)
 
+    def open_feature_maps(self):
+        """
+        Opens the file containing the feature maps in the current process.
+        """
+        if self.mmap_feature_maps:
+            self.h = None
+            self._img = np.load(self.feature_maps_filename, mmap_mode='r')
+        else:
+            self.h = h5py.File(self.feature_maps_filename, 'r')
+            self._img = self.h['data']
+        self._img_pid = os.getpid()
+
+    @property
+    def img(self):
+        """
+        Returns the feature maps (h5py dataset or memory-mapped array),
+        opening the file if it was not opened yet by the current process.
+        """
+        if self._img_pid != os.getpid():
+            self.open_feature_maps()
+        return self._img
+
+    def __getstate__(self):
+        """
+        Returns the state of the dataset to be pickled (e.g. when it is sent to
+        DataLoader workers), without the file handles.
+        """
+        state = self.__dict__.copy()
+        state['h'] = None
+        state['_img'] = None
+        state['_img_pid'] = None
+        return state
+
     def close(self):
         """
         Close hdf5 file.
         """
-        self.h.close()
+        if self.h is not None and self._img_pid == os.getpid():
+            self.h.close()
+        self.h = None
+        self._img = None
+        self._img_pid = None
+
+    def load_feature_maps(self, ids):
+        """
+        Reads the feature maps of a batch of images at once. The ids are
+        sorted and deduplicated, so the file is read sequentially. In the case
+        of the .hdf5 file, ids falling into the same chunk (block of
+        consecutive images) are read with a single slice.
+
+        :param ids: List of indices of the images.
+
+        :return: numpy array of feature maps [len(ids) x 1024 x 14 x 14] (in the order of ids).
+
+        """
+        img = self.img
+        unique_ids, inverse = np.unique(np.asarray(ids, dtype=np.int64), return_inverse=True)
+
+        if self.mmap_feature_maps:
+            # single (sorted) gather from the memory-mapped file.
+            features = img[unique_ids]
+
+        else:
+            # read the chunk-aligned blocks covering the ids.
+            chunk_size = img.chunks[0] if img.chunks is not None else 1
+            features = np.empty((len(unique_ids),) + img.shape[1:], dtype=img.dtype)
+            blocks = unique_ids // chunk_size
+            block_starts = np.flatnonzero(np.diff(blocks, prepend=-1))
+            block_ends = np.append(block_starts[1:], len(unique_ids))
+            for start, end in zip(block_starts, block_ends):
+                first, last = unique_ids[start], unique_ids[end - 1]
+                block = img[first:last + 1]
+                features[start:end] = block[unique_ids[start:end] - first]
+
+        return features[inverse]
 
     def generate_questions_dics(self, set, word_dic=None, answer_dic=None):
         """
@@ -395,8 +529,8 @@ class CLEVRDataset(Dataset):
 
         :param index: index of the sample to return.
 
-        :return: img: extracted feature maps from the raw image
-                 tokenized_question: tensor of word indexes
+        :return: id: index of the image (in self.img) containing the extracted feature maps from the raw image
+                 question: array of indices of words (in the vocabulary of the embedding)
                  len(question): question length
                  answer: index of the answer in the answers dictionary
                  string_question: original question string
@@ -406,28 +540,44 @@ class CLEVRDataset(Dataset):
         """
         # load tokenized_question, answer, string_question, image_filename from
         # self.data
-        question, answer, string_question, imgfile, question_type = self.data[index].values(
+        _, answer, string_question, imgfile, question_type = self.data[index].values(
         )
 
         # create the image index to retrieve the feature maps in self.img
         id = int(imgfile.rsplit('_', 1)[1][:-4])
 
-        img = torch.from_numpy(self.img[id]).type(self.app_state.dtype)
+        # get the indices of words of the question (view of the array).
+        # The feature maps are read & the questions embedded in
+        # collate_data(), for the whole batch at once.
+        start, end = self.question_offsets[index], self.question_offsets[index + 1]
+        question = self.question_indices[start:end]
+        question_length = len(question)
 
-        # embed question
-        if self.embedding_type == 'random':
-            # embed question:
-            question = self.embed_layer(
-                torch.LongTensor(question)).type(self.app_state.dtype)
+        # return everything
+        return id, question, question_length, answer, string_question, index, imgfile, question_type
 
-        else:
-            # embed question
-            question = self.language.embed_sentence(string_question)
+    def embed_questions(self, indices_BxL, mask_BxL):
+        """
+        Embeds a batch of (padded) questions with a single lookup.
 
-        question_length = question.shape[0]
+        :param indices_BxL: LongTensor with indices of words [BATCH_SIZE x MAX_QUESTION_LENGTH].
+        :param mask_BxL: Mask of words (1s) and padding (0s) [BATCH_SIZE x MAX_QUESTION_LENGTH].
 
-        # return everything
-        return img, question, question_length, answer, string_question, index, imgfile, question_type
+        :return: Tensor of embedded questions (zeros at padded positions) [BATCH_SIZE x MAX_QUESTION_LENGTH x EMBEDDING_DIM].
+
+        """
+        # the embeddings are not trained (and tensors requiring grad cannot be
+        # passed between worker processes).
+        with torch.no_grad():
+            if self.embedding_type == 'random':
+                questions = self.embed_layer(indices_BxL)
+            else:
+                questions = torch.nn.functional.embedding(
+                    indices_BxL, self.language.vocab.vectors)
+
+            questions = questions * mask_BxL.unsqueeze(-1).type(questions.dtype)
+
+        return questions.type(self.app_state.dtype)
 
     def collate_data(self, batch):
         """
@@ -440,34 +590,20 @@ class CLEVRDataset(Dataset):
 
         """
         # create list placeholders
-        images, lengths, answers, s_questions, indexes, imgfiles, question_types = [
+        image_ids, lengths, answers, s_questions, indexes, imgfiles, question_types = [
         ], [], [], [], [], [], []
+        tokenized_questions = []
         batch_size = len(batch)
 
-        # get max question length, create tensor of shape [batch_size x maxQuestionLength] & sort questions by
-        # decreasing length
-        max_len = max(map(lambda x: len(x[1]), batch))
-        sort_by_len = sorted(batch, key=lambda x: len(x[1]), reverse=True)
-
-        # create tensor containing the embedded questions
-        if self.embedding_type == 'random':
-            questions = torch.zeros(
-                batch_size,
-                max_len,
-                self.random_embedding_dim).type(
-                self.app_state.dtype)
-
-        else:
-            # get embedding dimension from the embedding type
-            embedding_dim = int(self.embedding_type[-4:-1])
-            questions = torch.zeros(
-                batch_size, max_len, embedding_dim).type(self.app_state.dtype)
+        # sort questions by decreasing length
+        sort_by_len = sorted(batch, key=lambda x: x[2], reverse=True)
 
         # fill in the placeholders
-        for i, b in enumerate(sort_by_len):
-            image, question, length, answer, string_question, index, imgfile, question_type = b
+        for b in sort_by_len:
+            image_id, question, length, answer, string_question, index, imgfile, question_type = b
 
-            images.append(image)
+            tokenized_questions.append(question)
+            image_ids.append(image_id)
             lengths.append(length)
             answers.append(answer)
             s_questions.append(string_question)
@@ -475,10 +611,22 @@ class CLEVRDataset(Dataset):
             imgfiles.append(imgfile)
             question_types.append(question_type)
 
-            questions[i, :length, :] = question
+        # create tensor of word indices of shape [batch_size x maxQuestionLength],
+        # padded with 0s, and the mask of words
+        max_len = lengths[0]
+        mask_BxL = np.arange(max_len)[np.newaxis, :] < np.array(lengths)[:, np.newaxis]
+        indices_BxL = np.zeros((batch_size, max_len), dtype=np.int64)
+        indices_BxL[mask_BxL] = np.concatenate(tokenized_questions)
+
+        # embed all questions at once
+        questions = self.embed_questions(
+            torch.from_numpy(indices_BxL), torch.from_numpy(mask_BxL.astype(np.uint8)))
+
+        # read the feature maps of all images at once
+        images = torch.from_numpy(self.load_feature_maps(image_ids))
 
         # return all
-        return torch.stack(images).type(
+        return images.type(
             self.app_state.dtype), questions, lengths, torch.tensor(answers).type(
             self.app_state.LongTensor), s_questions, indexes, imgfiles, question_types
 
@@ -18,12 +18,11 @@
 """mnist.py: contains code of loading MNIST dataset using torchvision"""
 __author__ = "Younes Bouhadjar"
 
-import torch
-from torchvision import datasets, transforms
-from torch.utils.data.sampler import SubsetRandomSampler
+from torchvision import datasets
 import torch.nn.functional as F
 
 from problems.problem import DataTuple, LabelAuxTuple
+from problems.utils.in_memory_dataset import load_images_and_labels, to_float_images, RandomBatchSampler
 from problems.image_to_class.image_to_class_problem import ImageToClassProblem
 
 
@@ -54,22 +53,26 @@ class MNIST(ImageToClassProblem):
         # up scaling the image to 224, 224 if True
         self.up_scaling = params['up_scaling']
 
-        # Define transforms
-        train_transform = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor(
-        )]) if self.up_scaling else transforms.Compose([transforms.ToTensor()])
-
-        # load the datasets
+        # load the dataset (without transforms, as whole images are processed
+        # in batches)
         self.train_datasets = datasets.MNIST(
             self.datasets_folder,
             train=self.use_train_data,
-            download=True,
-            transform=train_transform)
+            download=True)
+
+        # copy all images into a single tensor [NUM_SAMPLES x 1 x 28 x 28]
+        self.images, self.labels = load_images_and_labels(self.train_datasets)
+
+        # padding is deterministic, so it is applied once (unless the images
+        # are upscaled first)
+        if not self.up_scaling:
+            self.images = F.pad(self.images, self.padding, 'constant', 0)
 
         # set split data (for training and validation data)
-        num_train = len(self.train_datasets)
+        num_train = len(self.images)
         indices = list(range(num_train))
         idx = indices[self.start_index: self.stop_index]
-        self.sampler = SubsetRandomSampler(idx)
+        self.sampler = RandomBatchSampler(idx, self.batch_size)
 
         # Class names.
         self.mnist_class_names = 'Zero One Two Three Four Five Six Seven Eight Nine'.split(
@@ -77,25 +80,22 @@ class MNIST(ImageToClassProblem):
 
     def generate_batch(self):
 
-        # data loader
-        train_loader = torch.utils.data.DataLoader(
-            self.train_datasets,
-            batch_size=self.batch_size,
-            sampler=self.sampler)
-        # create an iterator
-        train_loader = iter(train_loader)
-
-        # train_loader a generator: (data, label)
-        (data, label) = next(train_loader)
+        # sample indices of the batch and gather the images
+        batch_indices = self.sampler.next_indices()
+        data = to_float_images(self.images[batch_indices])
+        label = self.labels[batch_indices]
 
-        # padding data
-        data_padded = F.pad(data, self.padding, 'constant', 0)
+        if self.up_scaling:
+            # upscale whole batch to 224 x 224, then pad it
+            data = F.interpolate(data, size=(224, 224), mode='bilinear',
+                                 align_corners=False)
+            data = F.pad(data, self.padding, 'constant', 0)
 
         # Generate labels for aux tuple
         class_names = [self.mnist_class_names[i] for i in label]
 
         # Return DataTuple(!) and an empty (aux) tuple.
-        return DataTuple(data_padded, label), LabelAuxTuple(class_names)
+        return DataTuple(data, label), LabelAuxTuple(class_names)
 
 
 if __name__ == "__main__":
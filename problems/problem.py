@@ -101,19 +101,45 @@ class Problem(metaclass=ABCMeta):
 
         """
 
-    def return_generator(self):
+    def generate_batch_for_episode(self, episode):
+        """
+        Generates the batch for a given episode. By default the episode is
+        ignored and it simply calls generate_batch(). Problems able to
+        generate a batch for an arbitrary episode should overwrite this
+        method.
+
+        :param episode: Number of the episode.
+        :returns: Tuple: (data_tuple, aux_tuple), as returned by generate_batch().
+
+        """
+        return self.generate_batch()
+
+    def reserve_batch_buffers(self, count):
+        """
+        Informs the problem how many consecutive batches might be used at the
+        same time (e.g. when batches are prefetched). Problems reusing
+        buffers between batches should overwrite this method.
+
+        :param count: Number of batches that might be used at the same time.
+
+        """
+        pass
+
+    def return_generator(self, episode=0):
         """
         Returns a generator yielding a batch  of size [BATCH_SIZE,
         2*SEQ_LENGTH+2, CONTROL_BITS+DATA_BITS]. Additional elements of
         sequence are  start and stop control markers, stored in additional
         bits.
 
+        :param episode: Number of the first episode (DEFAULT: 0).
         : returns: A tuple: input with shape [BATCH_SIZE, 2*SEQ_LENGTH+2, CONTROL_BITS+DATA_BITS], output
 
         """
         # Create "generator".
         while True:
-            yield self.generate_batch()
+            yield self.generate_batch_for_episode(episode)
+            episode += 1
 
     def evaluate_loss(self, data_tuple, logits, _):
         """
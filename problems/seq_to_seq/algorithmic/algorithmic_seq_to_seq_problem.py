@@ -37,8 +37,9 @@ class AlgSeqAuxTuple(_AlgSeqAuxTuple):
     Tuple used by storing batches of data by algorithmic sequential problems.
     Contains three elements:
 
-    - mask that might be used for evaluation of the loss function
-    - length of sequence
+    - mask that might be used for evaluation of the loss function (marks the \
+    outputs of every sample, so samples of different lengths can be padded)
+    - length of sequence (maximal one in batch)
     - number of subsequences
 
     """
@@ -52,8 +53,17 @@ class AlgorithmicSeqToSeqProblem(SeqToSeqProblem):
     Provides some basic functionality usefull in all problems of such
     type
 
+    The (optional) batch_seed problem parameter makes every batch a pure
+    function of (batch_seed, episode). It is independent of the
+    training/testing seed_numpy, which seeds the global numpy random state
+    (used when batch_seed is not set).
+
     """
 
+    # Whether generate_batch() draws the lengths with sample_sequence_lengths()
+    # and handles per_sample_lengths (i.e. pads and masks the samples).
+    supports_per_sample_lengths = False
+
     def __init__(self, params):
         """
         Initializes problem object. Calls base constructor. Sets
@@ -88,6 +98,43 @@ class AlgorithmicSeqToSeqProblem(SeqToSeqProblem):
         # Set initial dtype.
         self.dtype = torch.FloatTensor
 
+        # Seed making every batch a pure function of (batch_seed, episode)
+        # (DEFAULT: -1, i.e. batches are drawn from the global numpy random
+        # state, seeded with the seed_numpy of training/testing).
+        if 'batch_seed' not in params:
+            params.add_default_params({'batch_seed': -1})
+        self.batch_seed = params['batch_seed']
+
+        # Random number generator used for generation of batches.
+        self.rng = np.random
+
+        # Flag indicating whether every sample in batch should have its own
+        # length - shorter samples are padded and masked out (DEFAULT: False,
+        # i.e. all samples share one length).
+        if 'per_sample_lengths' not in params:
+            params.add_default_params({'per_sample_lengths': False})
+        self.per_sample_lengths = params['per_sample_lengths']
+        if self.per_sample_lengths:
+            assert self.supports_per_sample_lengths, \
+                "Problem {} does not support per_sample_lengths".format(
+                    type(self).__name__)
+            assert self.use_mask, "Samples of different lengths require use_mask to be set"
+
+        # Number of buckets the range of lengths is split into - all samples
+        # in batch are drawn from a single bucket, what limits padding
+        # (DEFAULT: 1, i.e. the whole range).
+        if 'num_length_buckets' not in params:
+            params.add_default_params({'num_length_buckets': 1})
+        self.num_length_buckets = params['num_length_buckets']
+
+        # Preallocated buffers for inputs, targets and masks, reused between
+        # batches - list of (inputs, targets, mask) tuples of flat tensors.
+        self._buffers = []
+        # Number of buffers used in turns (DEFAULT: 1, i.e. a batch remains
+        # valid until generation of the next one).
+        self._num_buffers = 1
+        self._buffer_index = 0
+
     def calculate_accuracy(self, data_tuple, logits, aux_tuple):
         """ Calculate accuracy equal to mean difference between outputs and targets.
         WARNING: Applies mask (from aux_tuple) to both logits and targets!
@@ -128,6 +175,176 @@ class AlgorithmicSeqToSeqProblem(SeqToSeqProblem):
 
         return data_tuple, aux_tuple
 
+    def generate_batch_for_episode(self, episode):
+        """
+        Generates the batch for a given episode. If batch_seed is set, the
+        batch is a pure function of (batch_seed, episode), so batches can be
+        generated in any order, in parallel, or regenerated on demand.
+        Otherwise falls back to the global numpy random state.
+
+        :param episode: Number of the episode.
+        :returns: Tuple: (data_tuple, aux_tuple), as returned by generate_batch().
+
+        """
+        if self.batch_seed < 0:
+            return self.generate_batch()
+
+        # Create random state "keyed" by seed and episode.
+        self.rng = np.random.RandomState([self.batch_seed, episode])
+        try:
+            return self.generate_batch()
+        finally:
+            self.rng = np.random
+
+    def sample_sequence_lengths(self):
+        """
+        Draws lengths of sequences for all samples in batch.
+
+        If per_sample_lengths is not set, all samples share a single length
+        drawn from [min_sequence_length, max_sequence_length].
+
+        Otherwise the range is split into num_length_buckets contiguous
+        buckets. First a "pivot" length is drawn from the whole range, then
+        lengths of all samples are drawn from the bucket containing it. Hence
+        the buckets are chosen proportionally to their sizes and the length
+        of every sample is still uniformly distributed over the whole range,
+        while the lengths in batch are similar.
+
+        :returns: Array of lengths [BATCH_SIZE].
+
+        """
+        if not self.per_sample_lengths:
+            seq_length = self.rng.randint(
+                self.min_sequence_length, self.max_sequence_length + 1)
+            return np.full(self.batch_size, seq_length, dtype=np.int64)
+
+        min_length = self.min_sequence_length
+        max_length = self.max_sequence_length
+        num_lengths = max_length - min_length + 1
+        num_buckets = min(self.num_length_buckets, num_lengths)
+        if num_buckets > 1:
+            # Bucket b contains the lengths min_length + k, for which
+            # k * num_buckets // num_lengths == b.
+            pivot = self.rng.randint(0, num_lengths)
+            bucket = pivot * num_buckets // num_lengths
+            min_length = self.min_sequence_length + \
+                -(-bucket * num_lengths // num_buckets)
+            max_length = self.min_sequence_length + \
+                -(-(bucket + 1) * num_lengths // num_buckets) - 1
+
+        return self.rng.randint(
+            min_length, max_length + 1, size=self.batch_size)
+
+    def sequence_mask(self, seq_lengths, seq_length):
+        """
+        Returns mask of the items of sequences of different lengths.
+
+        :param seq_lengths: Array of lengths [BATCH_SIZE].
+        :param seq_length: Length of the (padded) sequences.
+        :returns: Boolean array [BATCH_SIZE, SEQ_LENGTH], set for the items within the lengths.
+
+        """
+        return np.arange(seq_length)[np.newaxis, :] < seq_lengths[:, np.newaxis]
+
+    def reserve_batch_buffers(self, count):
+        """
+        Makes sure that a batch remains valid until generation of count
+        following batches.
+
+        :param count: Number of batches that might be used at the same time.
+
+        """
+        if count > self._num_buffers:
+            self._num_buffers = count
+
+    def acquire_buffers(self, seq_length):
+        """
+        Returns the next set of preallocated buffers, as zeroed, contiguous
+        views of size:
+
+        - inputs [BATCH_SIZE, SEQ_LENGTH, CONTROL_BITS+DATA_BITS],
+        - targets [BATCH_SIZE, SEQ_LENGTH, DATA_BITS] (only data bits!),
+        - mask [BATCH_SIZE, SEQ_LENGTH].
+
+        Buffers are reallocated only when the batch is longer than all the
+        previous ones, so after reaching max_sequence_length generation of
+        batches does not allocate new tensors.
+
+        :param seq_length: Length of the sequences (number of items).
+        :returns: Tuple (inputs, targets, mask) of tensors.
+
+        """
+        num_bits = self.control_bits + self.data_bits
+        num_items = self.batch_size * seq_length
+
+        # Get buffers in turns.
+        if len(self._buffers) < self._num_buffers:
+            self._buffers.extend(
+                [None] * (self._num_buffers - len(self._buffers)))
+        index = self._buffer_index
+        self._buffer_index = (index + 1) % self._num_buffers
+
+        # (Re)allocate buffers if too short.
+        if self._buffers[index] is None or self._buffers[index][2].numel() < num_items:
+            self._buffers[index] = (
+                torch.zeros(num_items * num_bits).type(self.dtype),
+                torch.zeros(num_items * self.data_bits).type(self.dtype),
+                torch.zeros(num_items).type(torch.ByteTensor))
+        inputs, targets, mask = self._buffers[index]
+
+        # Create views and zero them.
+        inputs = inputs[:num_items * num_bits].view(
+            self.batch_size, seq_length, num_bits).zero_()
+        targets = targets[:num_items * self.data_bits].view(
+            self.batch_size, seq_length, self.data_bits).zero_()
+        mask = mask[:num_items].view(self.batch_size, seq_length).zero_()
+
+        return inputs, targets, mask
+
+    def write_marker(self, inputs, pos, ctrl):
+        """
+        Writes a marker (i.e. item with given control bits and data bits set to
+        zero) into (numpy view of) inputs.
+
+        :param inputs: Inputs [BATCH_SIZE, SEQ_LENGTH, CONTROL_BITS+DATA_BITS].
+        :param pos: Position of the marker in sequence.
+        :param ctrl: List of control bits.
+        :returns: Position of the next item.
+
+        """
+        inputs[:, pos, 0:len(ctrl)] = ctrl
+        return pos + 1
+
+    def write_data(self, inputs, pos, seq):
+        """
+        Writes a subsequence of data bits (with control bits set to zero) into
+        (numpy view of) inputs.
+
+        :param inputs: Inputs [BATCH_SIZE, SEQ_LENGTH, CONTROL_BITS+DATA_BITS].
+        :param pos: Position of the first item in sequence.
+        :param seq: Subsequence [BATCH_SIZE, N, DATA_BITS].
+        :returns: Position of the next item.
+
+        """
+        inputs[:, pos:pos + seq.shape[1], self.control_bits:] = seq
+        return pos + seq.shape[1]
+
+    def write_dummies(self, targets, mask, pos, seq):
+        """
+        Writes a subsequence of dummies (i.e. items with all bits set to zero),
+        by setting their targets and mask in (numpy views of) targets and mask.
+
+        :param targets: Targets [BATCH_SIZE, SEQ_LENGTH, DATA_BITS].
+        :param mask: Mask [BATCH_SIZE, SEQ_LENGTH].
+        :param pos: Position of the first dummy in sequence.
+        :param seq: Subsequence of targets [BATCH_SIZE, N, DATA_BITS].
+        :returns: Position of the next item.
+
+        """
+        targets[:, pos:pos + seq.shape[1], :] = seq
+        mask[:, pos:pos + seq.shape[1]] = 1
+        return pos + seq.shape[1]
+
     # def set_max_length(self, max_length):
     #    """ Sets maximum sequence lenth (property).
     #
@@ -18,7 +18,6 @@
 """interruption_swap_recall.py: contains code of interruption swap recall data generation"""
 __author__ = "Younes Bouhadjar"
 
-import torch
 import numpy as np
 from problems.problem import DataTuple
 from problems.seq_to_seq.algorithmic.algorithmic_seq_to_seq_problem import AlgorithmicSeqToSeqProblem, AlgSeqAuxTuple
@@ -98,102 +97,77 @@ class InterruptionSwapRecall(AlgorithmicSeqToSeqProblem):
 
         """
         # define control channel markers
-        pos = [0, 0, 0, 0]
-        ctrl_data = [0, 0, 0, 0]
+        ctrl_start_a = [1, 0, 0, 0]
+        ctrl_start_b = [0, 1, 0, 0]
         ctrl_dummy = [0, 0, 1, 0]
         ctrl_inter = [0, 0, 0, 1]
 
-        # assign markers
-        markers = ctrl_data, ctrl_dummy, pos
-
         # number of sub_sequences
-        nb_sub_seq_a = np.random.randint(
+        nb_sub_seq_a = self.rng.randint(
             self.num_subseq_min, self.num_subseq_max + 1)
         # might be different in future implementation
         nb_sub_seq_b = nb_sub_seq_a
 
         # set the sequence length of each marker
-        seq_lengths_a = np.random.randint(
+        seq_lengths_a = self.rng.randint(
             low=self.min_sequence_length,
             high=self.max_sequence_length + 1,
             size=nb_sub_seq_a)
-        seq_lengths_b = np.random.randint(
+        seq_lengths_b = self.rng.randint(
             low=self.min_sequence_length,
             high=self.max_sequence_length + 1,
             size=nb_sub_seq_b)
 
         #  generate subsequences for x and y
         x = [
-            np.random.binomial(
+            self.rng.binomial(
                 1,
                 self.bias,
                 (self.batch_size,
                  n,
                  self.data_bits)) for n in seq_lengths_a]
         y = [
-            np.random.binomial(
+            self.rng.binomial(
                 1,
                 self.bias,
                 (self.batch_size,
                  n,
                  self.data_bits)) for n in seq_lengths_b]
 
-        # create the target
-        target = np.concatenate(y + x, axis=1)
-
-        # add marker at the begging of x and dummies of same length,  also a
-        # marker at the begging of dummies is added
-        xx = [self.augment(seq, markers, ctrl_start=[
-                           1, 0, 0, 0], add_marker_data=True) for seq in x]
-        # add dummies to y of same length,  also a marker at the begging of dummies is added
-        # TODO: ctrl_start is not needed here, this is replaced by ctrl_xy
-        yy = [self.augment(seq, markers, ctrl_start=[0, 1, 0, 0],
-                           add_marker_data=False) for seq in y]
+        # Get buffers - sequence consists of markers, xs, ys and dummies of ys
+        # (with their markers), marker separating dummies of ys and xs and
+        # dummies of xs.
+        length = 2 * sum(seq_lengths_a) + 2 * sum(seq_lengths_b) + \
+            nb_sub_seq_a + 2 * nb_sub_seq_b + 1
+        inputs, targets, mask = self.acquire_buffers(length)
+        # Fill them through numpy views.
+        np_inputs = inputs.numpy()
+        np_targets = targets.numpy()
+        np_mask = mask.numpy()
+
+        # data which contains all xs and all ys plus dummies of ys
+        pos = 0
+        for xi, yi in zip(x, y):
+            pos = self.write_marker(np_inputs, pos, ctrl_start_a)
+            pos = self.write_data(np_inputs, pos, xi)
+            pos = self.write_marker(np_inputs, pos, ctrl_start_b)
+            # y is rotated
+            pos = self.write_data(
+                np_inputs, pos, self.rotate(yi, self.rotation, yi.shape[1]))
+            pos = self.write_marker(np_inputs, pos, ctrl_dummy)
+            pos = self.write_dummies(np_targets, np_mask, pos, yi)
 
         # this is a marker to separate dummies of x and y at the end of the
         # sequence
-        inter_seq = self.add_ctrl(
-            np.zeros((self.batch_size, 1, self.data_bits)), ctrl_inter, pos)
-        ctrl_xy = np.zeros_like(ctrl_data)
-        ctrl_xy[1] = 1
-        # this is a marker between sub sequence x and y
-        inter_xy = self.add_ctrl(
-            np.zeros((self.batch_size, 1, self.data_bits)), ctrl_xy, pos)
-
-        # data which contains all xs and all rotated ys plus dummies of ys
-        data_1 = [
-            arr for a, b in zip(xx, yy)
-            for arr in a[: -1] + [inter_xy] +
-            [self.rotate(b[0],
-                         self.rotation, b[0].shape[1])] + [b[1]]]
+        pos = self.write_marker(np_inputs, pos, ctrl_inter)
 
         # dummies of xs
-        data_2 = [a[-1][:, 1:, :] for a in xx]
-
-        # concatenate all parts of the inputs
-        inputs = np.concatenate(data_1 + [inter_seq] + data_2, axis=1)
-
-        # PyTorch variables
-        inputs = torch.from_numpy(inputs).type(self.dtype)
-        target = torch.from_numpy(target).type(self.dtype)
-
-        # create the mask
-        mask_all = inputs[:, :, 0:self.control_bits] == 1
-        mask = mask_all[..., 0]
-        for i in range(self.control_bits):
-            mask = mask_all[..., i] * mask
-
-        # rest ctrl channel of dummies
-        inputs[:, mask[0], 0:self.control_bits] = 0
-
-        # Create the target with the dummies
-        target_with_dummies = torch.zeros_like(
-            inputs[:, :, self.control_bits:])
-        target_with_dummies[:, mask[0], :] = target
+        for xi in x:
+            pos = self.write_dummies(np_targets, np_mask, pos, xi)
 
-        # Return data tuple.
-        data_tuple = DataTuple(inputs, target_with_dummies)
-        # Returning maximum length of subsequence a - for now.
+        # Return tuples.
+        data_tuple = DataTuple(inputs, targets)
+        # Returning maximum length of sequence a - for now.
         aux_tuple = AlgSeqAuxTuple(
             mask, max(seq_lengths_a), nb_sub_seq_a + nb_sub_seq_b)
 
@@ -87,11 +87,11 @@ class SequenceComparisonCommandLines(AlgorithmicSeqToSeqProblem):
         markers = ctrl_data, ctrl_dummy, pos
 
         # set the sequence length of each marker
-        seq_length = np.random.randint(
+        seq_length = self.rng.randint(
             low=self.min_sequence_length, high=self.max_sequence_length + 1)
 
         #  generate subsequences for x and y
-        x = [np.array(np.random.binomial(
+        x = [np.array(self.rng.binomial(
             1, self.bias, (self.batch_size, seq_length, self.data_bits)))]
 
         # Generate the second sequence which is either a scrambled version of the first
@@ -100,11 +100,11 @@ class SequenceComparisonCommandLines(AlgorithmicSeqToSeqProblem):
 
         # First generate a random binomial of the same size as x, this will be
         # used be used with an xor operation to scamble x to get y
-        xor_scrambler = np.array(np.random.binomial(1, self.bias, x[0].shape))
+        xor_scrambler = np.array(self.rng.binomial(1, self.bias, x[0].shape))
 
         # Create a mask that will set entire batches of the xor_scrambler to zero. The batches that are zero
         # will force the xor to return the original x for that batch
-        scrambler_mask = np.array(np.random.binomial(
+        scrambler_mask = np.array(self.rng.binomial(
             1, self.bias, (self.batch_size, seq_length)))
         xor_scrambler = np.array(
             xor_scrambler * scrambler_mask[:, :, np.newaxis])
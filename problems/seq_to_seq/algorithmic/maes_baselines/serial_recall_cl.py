@@ -83,7 +83,7 @@ class SerialRecallCommandLines(AlgorithmicSeqToSeqProblem):
         else:
             if self.randomize_control_lines:
                 # Randomly pick one of the bits to be set.
-                ctrl_bit = np.random.randint(2, self.control_bits)
+                ctrl_bit = self.rng.randint(2, self.control_bits)
                 ctrl_aux[ctrl_bit] = 1
             else:
                 ctrl_aux[self.control_bits - 1] = 1
@@ -95,12 +95,12 @@ class SerialRecallCommandLines(AlgorithmicSeqToSeqProblem):
         marker_start_aux[1] = 1  # [0, 1, 0]
 
         # Set sequence length.
-        seq_length = np.random.randint(
+        seq_length = self.rng.randint(
             self.min_sequence_length, self.max_sequence_length + 1)
 
         # Generate batch of random bit sequences [BATCH_SIZE x SEQ_LENGTH X
         # DATA_BITS]
-        bit_seq = np.random.binomial(
+        bit_seq = self.rng.binomial(
             1, self.bias, (self.batch_size, seq_length, self.data_bits))
 
         # 1. Generate inputs.
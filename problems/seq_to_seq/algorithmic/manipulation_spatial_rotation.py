@@ -18,7 +18,6 @@
 """manipulation_spatial_rotate.py: Spatial rotation (bitshift) for all items in the sequence"""
 __author__ = "Tomasz Kornuta, Younes Bouhadjar"
 
-import torch
 import numpy as np
 from problems.problem import DataTuple
 from problems.seq_to_seq.algorithmic.algorithmic_seq_to_seq_problem import AlgorithmicSeqToSeqProblem, AlgSeqAuxTuple
@@ -67,19 +66,22 @@ class ManipulationSpatialRotation(AlgorithmicSeqToSeqProblem):
 
         """
         # Set sequence length.
-        seq_length = np.random.randint(
+        seq_length = self.rng.randint(
             self.min_sequence_length, self.max_sequence_length + 1)
 
         # Generate batch of random bit sequences [BATCH_SIZE x SEQ_LENGTH X
         # DATA_BITS]
-        bit_seq = np.random.binomial(
+        bit_seq = self.rng.binomial(
             1, self.bias, (self.batch_size, seq_length, self.data_bits))
 
-        # Generate input:  [BATCH_SIZE, 2*SEQ_LENGTH+2, CONTROL_BITS+DATA_BITS]
-        inputs = np.zeros([self.batch_size,
-                           2 * seq_length + 2,
-                           self.control_bits + self.data_bits],
-                          dtype=np.float32)
+        # Get buffers: input [BATCH_SIZE, 2*SEQ_LENGTH+2,
+        # CONTROL_BITS+DATA_BITS], target [BATCH_SIZE, 2*SEQ_LENGTH+2,
+        # DATA_BITS] (only data bits!) and mask [BATCH_SIZE, 2*SEQ_LENGTH+2].
+        ptinputs, pttargets, mask = self.acquire_buffers(2 * seq_length + 2)
+        # Fill them through numpy views.
+        inputs = ptinputs.numpy()
+        targets = pttargets.numpy()
+
         # Set start control marker.
         inputs[:, 0, 0] = 1  # Memorization bit.
         # Set bit sequence.
@@ -88,11 +90,6 @@ class ManipulationSpatialRotation(AlgorithmicSeqToSeqProblem):
         # Set end control marker.
         inputs[:, seq_length + 1, 1] = 1  # Recall bit.
 
-        # Generate target:  [BATCH_SIZE, 2*SEQ_LENGTH+2, DATA_BITS] (only data
-        # bits!)
-        targets = np.zeros([self.batch_size, 2 * seq_length + 2,
-                            self.data_bits], dtype=np.float32)
-
         # Rotate sequence by shifting the bits to right: data_bits >> num_bits
         num_bits = -self.num_bits
         # Check if we are using relative or absolute rotation.
@@ -108,15 +105,9 @@ class ManipulationSpatialRotation(AlgorithmicSeqToSeqProblem):
             (bit_seq[:, :, num_bits:], bit_seq[:, :, :num_bits]), axis=2)
         targets[:, seq_length + 2:, :] = bit_seq
 
-        # Generate target mask: [BATCH_SIZE, 2*SEQ_LENGTH+2]
-        mask = torch.zeros([self.batch_size, 2 * seq_length + 2]
-                           ).type(torch.ByteTensor)
+        # Set target mask.
         mask[:, seq_length + 2:] = 1
 
-        # PyTorch variables.
-        ptinputs = torch.from_numpy(inputs).type(self.dtype)
-        pttargets = torch.from_numpy(targets).type(self.dtype)
-
         # Return tuples.
         data_tuple = DataTuple(ptinputs, pttargets)
         aux_tuple = AlgSeqAuxTuple(mask, seq_length, 1)
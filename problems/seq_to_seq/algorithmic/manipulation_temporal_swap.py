@@ -18,7 +18,6 @@
 """serial_recall_original.py: Original serial recall problem (a.k.a. copy task)"""
 __author__ = "Tomasz Kornuta, Younes Bouhadjar"
 
-import torch
 import numpy as np
 from problems.problem import DataTuple
 from problems.seq_to_seq.algorithmic.algorithmic_seq_to_seq_problem import AlgorithmicSeqToSeqProblem, AlgSeqAuxTuple
@@ -65,19 +64,22 @@ class ManipulationTemporalSwap(AlgorithmicSeqToSeqProblem):
 
         """
         # Set sequence length.
-        seq_length = np.random.randint(
+        seq_length = self.rng.randint(
             self.min_sequence_length, self.max_sequence_length + 1)
 
         # Generate batch of random bit sequences [BATCH_SIZE x SEQ_LENGTH X
         # DATA_BITS]
-        bit_seq = np.random.binomial(
+        bit_seq = self.rng.binomial(
             1, self.bias, (self.batch_size, seq_length, self.data_bits))
 
-        # Generate input:  [BATCH_SIZE, 2*SEQ_LENGTH+2, CONTROL_BITS+DATA_BITS]
-        inputs = np.zeros([self.batch_size,
-                           2 * seq_length + 2,
-                           self.control_bits + self.data_bits],
-                          dtype=np.float32)
+        # Get buffers: input [BATCH_SIZE, 2*SEQ_LENGTH+2,
+        # CONTROL_BITS+DATA_BITS], target [BATCH_SIZE, 2*SEQ_LENGTH+2,
+        # DATA_BITS] (only data bits!) and mask [BATCH_SIZE, 2*SEQ_LENGTH+2].
+        ptinputs, pttargets, mask = self.acquire_buffers(2 * seq_length + 2)
+        # Fill them through numpy views.
+        inputs = ptinputs.numpy()
+        targets = pttargets.numpy()
+
         # Set start control marker.
         inputs[:, 0, 0] = 1  # Memorization bit.
         # Set bit sequence.
@@ -86,10 +88,6 @@ class ManipulationTemporalSwap(AlgorithmicSeqToSeqProblem):
         # Set end control marker.
         inputs[:, seq_length + 1, 1] = 1  # Recall bit.
 
-        # Generate target:  [BATCH_SIZE, 2*SEQ_LENGTH+2, DATA_BITS] (only data
-        # bits!)
-        targets = np.zeros([self.batch_size, 2 * seq_length + 2,
-                            self.data_bits], dtype=np.float32)
         # Set bit sequence.
 
         # Rotate sequence by shifting the items to right: seq >> num_items
@@ -110,15 +108,9 @@ class ManipulationTemporalSwap(AlgorithmicSeqToSeqProblem):
             (bit_seq[:, num_items:, :], bit_seq[:, :num_items, :]), axis=1)
         targets[:, seq_length + 2:, :] = bit_seq
 
-        # Generate target mask: [BATCH_SIZE, 2*SEQ_LENGTH+2]
-        mask = torch.zeros([self.batch_size, 2 * seq_length + 2]
-                           ).type(torch.ByteTensor)
+        # Set target mask.
         mask[:, seq_length + 2:] = 1
 
-        # PyTorch variables.
-        ptinputs = torch.from_numpy(inputs).type(self.dtype)
-        pttargets = torch.from_numpy(targets).type(self.dtype)
-
         # Return tuples.
         data_tuple = DataTuple(ptinputs, pttargets)
         aux_tuple = AlgSeqAuxTuple(mask, seq_length, 1)
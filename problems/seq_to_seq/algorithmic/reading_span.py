@@ -18,8 +18,6 @@
 """reading_span.py: contains code of reading span data generation"""
 __author__ = "Younes Bouhadjar"
 
-import torch
-import numpy as np
 from problems.problem import DataTuple
 from problems.seq_to_seq.algorithmic.algorithmic_seq_to_seq_problem import AlgorithmicSeqToSeqProblem, AlgSeqAuxTuple
 
@@ -53,76 +51,49 @@ class ReadingSpan(AlgorithmicSeqToSeqProblem):
         """
 
         # define control channel markers
-        pos = [0, 0]
-        ctrl_data = [0, 0]
-        ctrl_dummy = [0, 1]
+        ctrl_start = [1, 0]
         ctrl_inter = [0, 1]
-        # assign markers
-        markers = ctrl_data, ctrl_dummy, pos
 
         # number sub sequences
-        num_sub_seq = np.random.randint(
+        num_sub_seq = self.rng.randint(
             self.num_subseq_min, self.num_subseq_max + 1)
 
         # set the sequence length of each marker
-        seq_length = np.random.randint(
+        seq_length = self.rng.randint(
             low=self.min_sequence_length,
             high=self.max_sequence_length + 1,
             size=num_sub_seq)
 
         #  generate subsequences for x and y
         x = [
-            np.random.binomial(
+            self.rng.binomial(
                 1,
                 self.bias,
                 (self.batch_size,
                  n,
                  self.data_bits)) for n in seq_length]
-        x_last = [a[:, None, -1, :] for a in x]
-
-        # create the target
-        seq_length_tdummies = sum(seq_length) + seq_length.shape[0] + 1
-        dummies_target = np.zeros(
-            [self.batch_size, seq_length_tdummies, self.data_bits],
-            dtype=np.float32)
-        targets = np.concatenate([dummies_target] + x_last, axis=1)
-
-        # data of x and dummies
-        xx = [
-            self.augment(
-                seq,
-                markers,
-                ctrl_start=[
-                    1,
-                    0],
-                add_marker_data=True,
-                add_marker_dummy=False) for seq in x]
+
+        # Get buffers - sequence consists of markers and xs, marker separating
+        # data and dummies and single dummy for every x.
+        length = sum(seq_length) + 2 * num_sub_seq + 1
+        inputs, targets, mask = self.acquire_buffers(length)
+        # Fill them through numpy views.
+        np_inputs = inputs.numpy()
+        np_targets = targets.numpy()
+        np_mask = mask.numpy()
 
         # data of x
-        data_1 = [arr for a in xx for arr in a[:-1]]
+        pos = 0
+        for xi in x:
+            pos = self.write_marker(np_inputs, pos, ctrl_start)
+            pos = self.write_data(np_inputs, pos, xi)
 
         # this is a marker between sub sequence x and dummies
-        inter_seq = self.add_ctrl(
-            np.zeros((self.batch_size, 1, self.data_bits)), ctrl_inter, pos)
-
-        # dummies of x
-        x_dummy_last = [a[:, None, -1, :] for b in xx for a in b[-1:]]
-
-        # concatenate all parts of the inputs
-        inputs = np.concatenate(data_1 + [inter_seq] + x_dummy_last, axis=1)
-
-        # PyTorch variables
-        inputs = torch.from_numpy(inputs).type(self.dtype)
-        targets = torch.from_numpy(targets).type(self.dtype)
-        # TODO: batch might have different sequence lengths
-        mask_all = inputs[..., 0:self.control_bits] == 1
-        mask = mask_all[..., 0]
-        for i in range(self.control_bits):
-            mask = mask_all[..., i] * mask
-
-        # TODO: fix the batch indexing
-        # rest channel values of data dummies
-        inputs[:, mask[0], 0:self.control_bits] = 0
+        pos = self.write_marker(np_inputs, pos, ctrl_inter)
+
+        # dummies of x - targets are the last items of xs
+        for xi in x:
+            pos = self.write_dummies(np_targets, np_mask, pos, xi[:, -1:, :])
 
         # Return tuples.
         data_tuple = DataTuple(inputs, targets)
@@ -18,7 +18,6 @@
 """serial_recall_original.py: Original serial recall problem (a.k.a. copy task)"""
 __author__ = "Tomasz Kornuta, Younes Bouhadjar"
 
-import torch
 import numpy as np
 from problems.problem import DataTuple
 from problems.seq_to_seq.algorithmic.algorithmic_seq_to_seq_problem import AlgorithmicSeqToSeqProblem, AlgSeqAuxTuple
@@ -41,11 +40,13 @@ class SerialRecall(AlgorithmicSeqToSeqProblem):
 
     4. Minor modification II: generator returns a mask, which can be used for filtering important elements of the output.
 
-
-    TODO: sequences of different lengths in batch (filling with zeros?)
+    5. If per_sample_lengths is set, every sample has its own length - shorter samples are padded with zeros and masked out.
 
     """
 
+    # Lengths are drawn per sample (see per_sample_lengths).
+    supports_per_sample_lengths = True
+
     def __init__(self, params):
         """
         Constructor - stores parameters. Calls parent class initialization.
@@ -68,48 +69,46 @@ class SerialRecall(AlgorithmicSeqToSeqProblem):
 
         : returns: Tuple consisting of: input [BATCH_SIZE, 2*SEQ_LENGTH+2, CONTROL_BITS+DATA_BITS],
         output [BATCH_SIZE, 2*SEQ_LENGTH+2, DATA_BITS],
-        mask [BATCH_SIZE, 2*SEQ_LENGTH+2]
-
-        TODO: every item in batch has now the same seq_length.
+        mask [BATCH_SIZE, 2*SEQ_LENGTH+2], where SEQ_LENGTH is the maximal length in batch.
 
         """
-        # Set sequence length
-        seq_length = np.random.randint(
-            self.min_sequence_length, self.max_sequence_length + 1)
+        # Set sequence lengths (of all samples).
+        seq_lengths = self.sample_sequence_lengths()
+        seq_length = int(seq_lengths.max())
 
         # Generate batch of random bit sequences [BATCH_SIZE x SEQ_LENGTH X
         # DATA_BITS]
-        bit_seq = np.random.binomial(
+        bit_seq = self.rng.binomial(
             1, self.bias, (self.batch_size, seq_length, self.data_bits))
 
-        # Generate input:  [BATCH_SIZE, 2*SEQ_LENGTH+2, CONTROL_BITS+DATA_BITS]
-        inputs = np.zeros([self.batch_size,
-                           2 * seq_length + 2,
-                           self.control_bits + self.data_bits],
-                          dtype=np.float32)
+        # Get buffers: input [BATCH_SIZE, 2*SEQ_LENGTH+2,
+        # CONTROL_BITS+DATA_BITS], target [BATCH_SIZE, 2*SEQ_LENGTH+2,
+        # DATA_BITS] (only data bits!) and mask [BATCH_SIZE, 2*SEQ_LENGTH+2].
+        ptinputs, pttargets, mask = self.acquire_buffers(2 * seq_length + 2)
+        # Fill them through numpy views.
+        inputs = ptinputs.numpy()
+        targets = pttargets.numpy()
+        npmask = mask.numpy()
+
+        # Items within the lengths of samples.
+        items = self.sequence_mask(seq_lengths, seq_length)
+        # Indices of those items - sample and position in subsequence.
+        rows, cols = np.nonzero(items)
+
         # Set start control marker.
         inputs[:, 0, 0] = 1  # Memorization bit.
-        # Set bit sequence.
+        # Set bit sequences (padding is left empty).
         inputs[:, 1:seq_length + 1,
-               self.control_bits:self.control_bits + self.data_bits] = bit_seq
-        # Set end control marker.
-        inputs[:, seq_length + 1, 1] = 1  # Recall bit.
-
-        # Generate target:  [BATCH_SIZE, 2*SEQ_LENGTH+2, DATA_BITS] (only data
-        # bits!)
-        targets = np.zeros([self.batch_size, 2 * seq_length + 2,
-                            self.data_bits], dtype=np.float32)
-        # Set bit sequence.
-        targets[:, seq_length + 2:, :] = bit_seq
-
-        # Generate target mask: [BATCH_SIZE, 2*SEQ_LENGTH+2]
-        mask = torch.zeros([self.batch_size, 2 * seq_length + 2]
-                           ).type(torch.ByteTensor)
-        mask[:, seq_length + 2:] = 1
-
-        # PyTorch variables.
-        ptinputs = torch.from_numpy(inputs).type(self.dtype)
-        pttargets = torch.from_numpy(targets).type(self.dtype)
+               self.control_bits:self.control_bits + self.data_bits] = \
+            bit_seq * items[:, :, np.newaxis]
+        # Set end control markers.
+        inputs[np.arange(self.batch_size), seq_lengths + 1, 1] = 1  # Recall bit.
+
+        # Set bit sequences.
+        targets[rows, seq_lengths[rows] + 2 + cols, :] = bit_seq[rows, cols]
+
+        # Set target mask.
+        npmask[rows, seq_lengths[rows] + 2 + cols] = 1
 
         # Return tuples.
         data_tuple = DataTuple(ptinputs, pttargets)
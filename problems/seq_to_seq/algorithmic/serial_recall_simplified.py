@@ -18,8 +18,6 @@
 """serial_recall_simplified.py: Simplified serial recall problem (a.k.a. copy task)"""
 __author__ = "Tomasz Kornuta, Younes Bouhadjar"
 
-import torch
-import numpy as np
 from problems.problem import DataTuple
 from problems.seq_to_seq.algorithmic.algorithmic_seq_to_seq_problem import AlgorithmicSeqToSeqProblem, AlgSeqAuxTuple
 
@@ -70,18 +68,22 @@ class SerialRecallSimplified(AlgorithmicSeqToSeqProblem):
 
         """
         # Set sequence length.
-        seq_length = np.random.randint(
+        seq_length = self.rng.randint(
             self.min_sequence_length, self.max_sequence_length + 1)
 
         # Generate batch of random bit sequences [BATCH_SIZE x SEQ_LENGTH X
         # DATA_BITS]
-        bit_seq = np.random.binomial(
+        bit_seq = self.rng.binomial(
             1, self.bias, (self.batch_size, seq_length, self.data_bits))
 
-        # Generate input:  [BATCH_SIZE, 2*SEQ_LENGTH, CONTROL_BITS+DATA_BITS]
-        inputs = np.zeros([self.batch_size, 2 *
-                           seq_length, self.control_bits +
-                           self.data_bits], dtype=np.float32)
+        # Get buffers: input [BATCH_SIZE, 2*SEQ_LENGTH,
+        # CONTROL_BITS+DATA_BITS], target [BATCH_SIZE, 2*SEQ_LENGTH, DATA_BITS]
+        # (only data bits!) and mask [BATCH_SIZE, 2*SEQ_LENGTH].
+        ptinputs, pttargets, mask = self.acquire_buffers(2 * seq_length)
+        # Fill them through numpy views.
+        inputs = ptinputs.numpy()
+        targets = pttargets.numpy()
+
         # Set memorization bit for the whole bit sequence that need to be
         # memorized.
         inputs[:, seq_length:, 0] = 1
@@ -89,22 +91,12 @@ class SerialRecallSimplified(AlgorithmicSeqToSeqProblem):
         inputs[:, :seq_length, self.control_bits:self.control_bits +
                self.data_bits] = bit_seq
 
-        # Generate target:  [BATCH_SIZE, 2*SEQ_LENGTH, DATA_BITS] (only data
-        # bits!)
-        targets = np.zeros([self.batch_size, 2 * seq_length,
-                            self.data_bits], dtype=np.float32)
         # Set bit sequence.
         targets[:, seq_length:, :] = bit_seq
 
-        # Generate target mask: [BATCH_SIZE, 2*SEQ_LENGTH]
-        mask = torch.zeros([self.batch_size, 2 * seq_length]
-                           ).type(torch.ByteTensor)
+        # Set target mask.
         mask[:, seq_length:] = 1
 
-        # PyTorch variables.
-        ptinputs = torch.from_numpy(inputs).type(self.dtype)
-        pttargets = torch.from_numpy(targets).type(self.dtype)
-
         # Return tuples.
         data_tuple = DataTuple(ptinputs, pttargets)
         aux_tuple = AlgSeqAuxTuple(mask, seq_length, 1)
@@ -18,7 +18,7 @@
 """problem.py: contains base class for all seq2seq problems"""
 __author__ = "Tomasz Kornuta"
 
-from problems.problem import Problem
+from problems.problem import Problem, DataTuple
 
 
 class SeqToSeqProblem(Problem):
@@ -58,3 +58,30 @@ class SeqToSeqProblem(Problem):
             loss = self.loss_function(logits, data_tuple.targets)
 
         return loss
+
+    def slice_sequences(self, data_tuple, aux_tuple, start, end):
+        """
+        Returns a window of the batch (along the time axis) that can be used
+        for evaluation of the loss, e.g. during truncated backpropagation
+        through time. When mask is used, it is sliced as well.
+
+        :param data_tuple: Data tuple containing inputs and targets.
+        :param aux_tuple: Auxiliary tuple containing mask.
+        :param start: Index of the first item of window.
+        :param end: Index of the item following the last item of window.
+        :returns: Pair of Data and Auxiliary tuples of the window or None, if the mask covers none of the window items (i.e. there is nothing to evaluate).
+
+        """
+        # Unpack tuple.
+        (inputs, targets) = data_tuple
+        window_data_tuple = DataTuple(
+            inputs[:, start:end], targets[:, start:end])
+
+        if self.use_mask:
+            window_mask = aux_tuple.mask[:, start:end]
+            # Skip windows without any masked-in item.
+            if window_mask.sum() == 0:
+                return None
+            aux_tuple = aux_tuple._replace(mask=window_mask)
+
+        return window_data_tuple, aux_tuple
@@ -1,3 +1,5 @@
+from .in_memory_dataset import load_images_and_labels, to_float_images, RandomBatchSampler
 from .language import Language
 
-__all__ = ['Language']
+__all__ = ['load_images_and_labels', 'to_float_images',
+           'RandomBatchSampler', 'Language']
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""in_memory_dataset.py: contains helpers for generating batches of images from datasets loaded into memory as a whole"""
+__author__ = "Tomasz Kornuta"
+
+import numpy as np
+import torch
+
+
+def load_images_and_labels(dataset):
+    """
+    Copies all images and labels of a torchvision dataset (e.g. MNIST,
+    CIFAR10) into contiguous tensors, so batches can be formed by indexing
+    instead of transforming samples one by one.
+
+    :param dataset: Torchvision dataset (with data/targets or train_data/train_labels attributes).
+    :returns: Tuple (images [NUM_SAMPLES x CHANNELS x HEIGHT x WIDTH] (uint8), labels [NUM_SAMPLES] (LongTensor)).
+
+    """
+    # Older torchvision versions keep train and test sets in different
+    # attributes.
+    if hasattr(dataset, 'data'):
+        images, labels = dataset.data, dataset.targets
+    elif dataset.train:
+        images, labels = dataset.train_data, dataset.train_labels
+    else:
+        images, labels = dataset.test_data, dataset.test_labels
+
+    if isinstance(images, np.ndarray):
+        # Images stored as [NUM_SAMPLES x HEIGHT x WIDTH x CHANNELS] (CIFAR).
+        images = torch.from_numpy(images).permute(0, 3, 1, 2)
+    else:
+        # Grayscale images [NUM_SAMPLES x HEIGHT x WIDTH] (MNIST).
+        images = images.unsqueeze(1)
+
+    return images.contiguous(), torch.as_tensor(labels, dtype=torch.int64)
+
+
+def to_float_images(images_uint8):
+    """
+    Converts images to floats from range [0, 1] (as transforms.ToTensor()
+    does).
+
+    :param images_uint8: Tensor with images (uint8).
+    :returns: FloatTensor with images.
+
+    """
+    return images_uint8.float().div_(255)
+
+
+class RandomBatchSampler(object):
+    """
+    Samples batches of indices of a subset of a dataset in random order,
+    without replacement. The order is drawn once per epoch (all batches of an
+    epoch are slices of a single permutation), and all batches are full, i.e.
+    the samples remaining at the end of an epoch are dropped.
+    """
+
+    def __init__(self, indices, batch_size):
+        """
+        Initializes the sampler.
+
+        :param indices: List of indices of samples of the subset.
+        :param batch_size: Size of the batch.
+
+        """
+        self.indices = torch.LongTensor(indices)
+        self.batch_size = batch_size
+        assert len(self.indices) >= batch_size, \
+            "Subset of {} samples is smaller than batch size {}".format(
+                len(self.indices), batch_size)
+
+        # Number of the epoch and permutation of its indices.
+        self.epoch = -1
+        self.permuted_indices = self.indices[:0]
+        self.position = 0
+
+    def next_indices(self):
+        """
+        Returns indices of samples of the next batch, starting a new epoch
+        when the current one is exhausted.
+
+        :returns: LongTensor [BATCH_SIZE].
+
+        """
+        if self.position + self.batch_size > len(self.permuted_indices):
+            # New epoch - draw a new permutation.
+            self.epoch += 1
+            self.permuted_indices = self.indices[torch.randperm(
+                len(self.indices))]
+            self.position = 0
+
+        batch_indices = self.permuted_indices[self.position:self.position + self.batch_size]
+        self.position += self.batch_size
+        return batch_indices
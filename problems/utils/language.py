@@ -70,6 +70,53 @@ class Language(object):
         self.unk_token = "<unk>"
         self.pad_token = "<pad>"
 
+        # Caches, created when the vocabulary is built.
+        self.stoi = None
+        self.unk_index = 0
+        self.normalized_vectors = None
+        self.nn_index = None
+
+    def sentences_to_indices(self, sentences):
+        """
+        Converts a list of sentences into indices of their words. Sentences are
+        tokenized once and all words are looked up in a single pass.
+
+        :param sentences: A list of strings containing the words to convert
+        :returns: Tuple (LongTensor of indices of words of all sentences, concatenated [total number of words], list of lengths of sentences)
+
+        """
+        tokenized_sentences = [sentence.split() for sentence in sentences]
+        lengths = [len(words) for words in tokenized_sentences]
+
+        # unknown words are mapped to the <unk> token (without being added to
+        # the vocabulary).
+        stoi, unk_index = self.stoi, self.unk_index
+        indices = torch.LongTensor(
+            [stoi.get(word, unk_index) for words in tokenized_sentences for word in words])
+
+        return indices, lengths
+
+    def embed_sentences(self, sentences):
+        """
+        Embed a list of sentences using a pretrained embedding, with a single
+        lookup of all words.
+
+        :param sentences: A list of strings containing the words to embed
+        :returns: Tuple (FloatTensor of embedded vectors, padded with zeros [number of sentences, max_sentence_length, embedding size], list of lengths of sentences)
+
+        """
+        indices, lengths = self.sentences_to_indices(sentences)
+        max_length = max(lengths, default=0)
+
+        # mask of words (in the order of concatenated words).
+        mask = torch.arange(max_length).unsqueeze(0) < torch.LongTensor(lengths).unsqueeze(1)
+
+        outsentences = torch.zeros(
+            (len(sentences), max_length, self.vocab.vectors.size(1)))
+        outsentences[mask] = self.vocab.vectors.index_select(0, indices)
+
+        return outsentences, lengths
+
     def embed_sentence(self, sentence):
         """
         Embed an entire sentence using a pretrained embedding.
@@ -78,14 +125,8 @@ class Language(object):
         :returns: FloatTensor of embedded vectors [max_sentence_length, embedding size]
 
         """
-        outsentence = torch.zeros(
-            (len(sentence.split()), self.vocab.vectors.size()[1]))
-
-        # embed a word at a time
-        for i, word in enumerate(sentence.split()):
-            outsentence[i, :] = self.embed_word(word)
-
-        return outsentence
+        outsentences, _ = self.embed_sentences([sentence])
+        return outsentences[0]
 
     def embed_word(self, word):
         """
@@ -97,7 +138,7 @@ class Language(object):
         """
         # convert the word to an integer index and return the corresponding
         # embedding vector
-        index = self.vocab.stoi[word]
+        index = self.return_index_from_word(word)
         return self.vocab.vectors[index]
 
     def return_index_from_word(self, word):
@@ -107,7 +148,7 @@ class Language(object):
         :param word: String of word in dictionary
 
         """
-        return self.vocab.stoi[word]
+        return self.stoi.get(word, self.unk_index)
 
     def return_word_from_index(self, index):
         """
@@ -142,6 +183,119 @@ class Language(object):
             if tok is not None))
         self.vocab = self.vocab_cls(counter, specials=specials, **kwargs)
 
+        # Cache the words-to-indices dictionary (a plain dict, so lookups of
+        # unknown words do not extend it) & reset the neighbours search.
+        self.stoi = dict(self.vocab.stoi)
+        self.unk_index = self.stoi.get(self.unk_token, 0)
+        self.normalized_vectors = None
+        self.nn_index = None
+
+    def get_normalized_vectors(self):
+        """
+        Returns the embedding vectors normalized to unit length (computed once).
+
+        :returns: FloatTensor [vocabulary size, embedding size]
+
+        """
+        if self.normalized_vectors is None:
+            norms = self.vocab.vectors.norm(p=2, dim=1, keepdim=True)
+            # vectors of special tokens might be zeros.
+            self.normalized_vectors = self.vocab.vectors / norms.clamp(min=1e-8)
+        return self.normalized_vectors
+
+    def build_nearest_neighbour_index(self, num_clusters=None, num_iterations=10,
+                                      max_training_vectors=50000):
+        """
+        Builds an approximate nearest-neighbour index for closest(): the
+        normalized vectors are clustered with (spherical) k-means, so a query
+        has to be compared only with the centroids and the vectors of a few
+        closest clusters. Useful for large vocabularies (e.g. 400k words of
+        GloVe).
+
+        :param num_clusters: Number of clusters (DEFAULT: sqrt of the vocabulary size)
+        :param num_iterations: Number of k-means iterations
+        :param max_training_vectors: Maximal number of (randomly chosen) vectors used to find the centroids
+
+        """
+        vectors = self.get_normalized_vectors()
+        num_words = vectors.size(0)
+        if num_clusters is None:
+            num_clusters = max(1, int(num_words ** 0.5))
+
+        # find centroids on a subset of vectors.
+        training_vectors = vectors[torch.randperm(num_words)[:max_training_vectors]]
+        centroids = training_vectors[torch.randperm(training_vectors.size(0))[:num_clusters]].clone()
+        for _ in range(num_iterations):
+            assignment = (training_vectors @ centroids.t()).argmax(dim=1)
+            sums = torch.zeros_like(centroids).index_add_(0, assignment, training_vectors)
+            # keep the old centroid for empty clusters.
+            nonempty = sums.norm(p=2, dim=1) > 0
+            centroids[nonempty] = sums[nonempty] / sums[nonempty].norm(p=2, dim=1, keepdim=True)
+
+        # assign all words to clusters & store them grouped by cluster.
+        assignment = (vectors @ centroids.t()).argmax(dim=1)
+        order = assignment.argsort()
+        counts = torch.bincount(assignment, minlength=centroids.size(0))
+        offsets = torch.cat([torch.zeros(1, dtype=torch.int64), counts.cumsum(0)])
+
+        self.nn_index = (centroids, order, offsets)
+
+    def closest(self, vector, n=10, exclude=(), num_probes=None):
+        """
+        Finds the words whose embeddings are closest (in cosine similarity) to
+        a given vector. Uses the approximate index (searching only num_probes
+        closest clusters) if it was built with build_nearest_neighbour_index().
+
+        :param vector: FloatTensor [embedding size]
+        :param n: Number of words to return
+        :param exclude: Words to be skipped
+        :param num_probes: Number of searched clusters (DEFAULT: 8, used only with the approximate index)
+        :returns: List of n tuples (word, cosine similarity), from the closest word
+
+        """
+        vectors = self.get_normalized_vectors()
+        query = vector / vector.norm(p=2).clamp(min=1e-8)
+
+        if self.nn_index is None:
+            # exact search: similarities to all words at once.
+            candidates = None
+            similarities = vectors @ query
+        else:
+            centroids, order, offsets = self.nn_index
+            num_probes = 8 if num_probes is None else num_probes
+            probes = (centroids @ query).topk(min(num_probes, centroids.size(0)))[1]
+            candidates = torch.cat([order[offsets[c]:offsets[c + 1]] for c in probes.tolist()])
+            similarities = vectors[candidates] @ query
+
+        # take a few more words, as some of them might be excluded.
+        excluded_indices = set(self.stoi.get(word, -1) for word in exclude)
+        k = min(n + len(excluded_indices), similarities.size(0))
+        top_similarities, top_indices = similarities.topk(k)
+        if candidates is not None:
+            top_indices = candidates[top_indices]
+
+        return [(self.vocab.itos[index], similarity)
+                for index, similarity in zip(top_indices.tolist(), top_similarities.tolist())
+                if index not in excluded_indices][:n]
+
+    def analogy(self, w1, w2, w3, n=5, num_probes=None):
+        """
+        Finds the closest words for vector operation w2.vector - w1.vector +
+        w3.vector (w1 : w2 :: w3 : ?).
+
+        :param w1: String of word to be subtracted
+        :param w2: String of word to be added
+        :param w3: String of second word to be added
+        :param n: number of words to search for
+        :param num_probes: Number of searched clusters (used only with the approximate index)
+        :returns: List of n tuples (word, cosine similarity), from the closest word
+
+        """
+        vector = self.get_normalized_vectors()[
+            [self.return_index_from_word(w) for w in [w2, w1, w3]]]
+        return self.closest(vector[0] - vector[1] + vector[2], n=n,
+                            exclude=[w1, w2, w3], num_probes=num_probes)
+
 
 """
 The names of the classes available in torchtext vocab for reference
@@ -252,22 +406,11 @@ if __name__ == '__main__':
 
     print(len(lang.embed_word('<pad>')))
 
-    def closest(vec, n=10):
-        """
-        Find the closest words for a given vector.
-
-        :param vec: vector of an embedded word
-
-        """
-        all_dists = [(w, torch.dist(vec, lang.embed_word(w)))
-                     for w in lang.vocab.itos]
-        return sorted(all_dists, key=lambda t: t[1])[:n]
-
     def print_tuples(tuples):
         """
-        Filters tuple so that it outputs (Euclidian distance) Word.
+        Filters tuple so that it outputs (cosine similarity) Word.
 
-        :param tuples: list of tuples that contains euclidian distance and word string
+        :param tuples: list of tuples that contains word string and cosine similarity
 
         """
 
@@ -277,28 +420,19 @@ if __name__ == '__main__':
     # In the form w1 : w2 :: w3 : ?
     def analogy(w1, w2, w3, n=5):
         """
-        Finds the closest 5 words for vector operation w2.vector -w1.vector.
-
-        +w3.vector where this function does the embedding.
+        Prints the closest words for vector operation w2.vector - w1.vector +
+        w3.vector.
 
         :param w1: String of word to be subtracted
         :param w2: String of word to be added
         :param w3: String of second word to be added
         :param n: number of words to search for
-        :
 
         """
         print('\n[%s : %s :: %s : ?]' % (w1, w2, w3))
+        print_tuples(lang.analogy(w1, w2, w3, n))
 
-        # w2 - w1 + w3 = w4
-        closest_words = closest(lang.embed_word(
-            w2) - lang.embed_word(w1) + lang.embed_word(w3))
-
-        closest_words = [t for t in closest_words if t[0] not in [w1, w2, w3]]
-
-        print_tuples(closest_words[:n])
-
-    print_tuples(closest(lang.embed_word('google')))
+    print_tuples(lang.closest(lang.embed_word('google')))
     #analogy('man', 'king', 'woman')
     analogy('king', 'man', 'queen')
     analogy('man', 'actor', 'woman')
@@ -19,10 +19,10 @@
 __author__ = "Younes Bouhadjar"
 
 import torch
-from torchvision import datasets, transforms
-from torch.utils.data.sampler import SubsetRandomSampler
+from torchvision import datasets
 
 from problems.problem import DataTuple, MaskAuxTuple
+from problems.utils.in_memory_dataset import load_images_and_labels, to_float_images, RandomBatchSampler
 from problems.video_to_class.video_to_class_problem import VideoToClassProblem
 
 
@@ -47,41 +47,37 @@ class SequentialPixelMNIST(VideoToClassProblem):
         self.use_train_data = params['use_train_data']
         self.datasets_folder = params['mnist_folder']
 
-        # define transforms
-        train_transform = transforms.Compose([
-            transforms.ToTensor(), transforms.Lambda(lambda x: x.view(1, -1, 1))])
-
-        # load the datasets
+        # load the dataset
         self.train_datasets = datasets.MNIST(
             self.datasets_folder,
             train=self.use_train_data,
-            download=True,
-            transform=train_transform)
+            download=True)
+
+        # copy all images into a single tensor, with images flattened into
+        # sequences of pixels [NUM_SAMPLES x 1 x 784 x 1]
+        images, self.labels = load_images_and_labels(self.train_datasets)
+        self.images = images.view(len(images), 1, -1, 1)
+
         # set split
-        num_train = len(self.train_datasets)
+        num_train = len(self.images)
         indices = list(range(num_train))
 
         idx = indices[self.start_index: self.stop_index]
-        self.sampler = SubsetRandomSampler(idx)
-
-    def generate_batch(self):
-        # data loader
-        train_loader = torch.utils.data.DataLoader(
-            self.train_datasets,
-            batch_size=self.batch_size,
-            sampler=self.sampler)
-        # create an iterator
-        train_loader = iter(train_loader)
+        self.sampler = RandomBatchSampler(idx, self.batch_size)
 
         # create mask
         mask = torch.zeros(self.num_rows * self.num_columns)
         mask[-1] = 1
+        self.mask = mask.type(torch.uint8)
 
-        # train_loader a generator: (data, label)
-        (data, label) = next(train_loader)
+    def generate_batch(self):
+        # sample indices of the batch and gather the sequences
+        batch_indices = self.sampler.next_indices()
+        data = to_float_images(self.images[batch_indices])
+        label = self.labels[batch_indices]
 
         # Return DataTuple(!) and an empty (aux) tuple.
-        return DataTuple(data, label), MaskAuxTuple(mask.type(torch.uint8))
+        return DataTuple(data, label), MaskAuxTuple(self.mask)
 
 
 if __name__ == "__main__":
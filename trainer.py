@@ -42,10 +42,11 @@ import numpy as np
 from utils.app_state import AppState
 from utils.statistics_collector import StatisticsCollector
 from utils.param_interface import ParamInterface
-from utils.worker_utils import forward_step, check_and_set_cuda, recurrent_config_parse
+from utils.worker_utils import forward_step, truncated_forward_step, check_and_set_cuda, recurrent_config_parse
 
 # Import model and problem factories.
 from problems.problem_factory import ProblemFactory
+from problems.batch_prefetcher import BatchPrefetcher, BatchPool
 from models.model_factory import ModelFactory
 
 def validation(
@@ -291,6 +292,34 @@ if __name__ == '__main__':
         # If not using curriculum then it does not have to be finished.
         must_finish_curriculum = False
 
+    # Number of batches generated in the background (DEFAULT: 0, i.e.
+    # batches are generated synchronously).
+    try:
+        prefetch_depth = param_interface['training']['prefetch_depth']
+    except KeyError:
+        prefetch_depth = 0
+
+    # Number of processes generating the batches (DEFAULT: 0, i.e. batches
+    # are prefetched by a single background thread).
+    try:
+        prefetch_workers = param_interface['training']['prefetch_workers']
+    except KeyError:
+        prefetch_workers = 0
+
+    if prefetch_depth > 0 and prefetch_workers > 0:
+        # Wrap the problem - batches will be generated by a pool of processes.
+        batch_source = BatchPool(problem, prefetch_depth, prefetch_workers)
+        logger.info(
+            "Prefetching up to {} training batches using {} processes".format(
+                prefetch_depth, prefetch_workers))
+    elif prefetch_depth > 0:
+        # Wrap the problem - batches will be generated in a separate thread.
+        batch_source = BatchPrefetcher(problem, prefetch_depth)
+        logger.info(
+            "Prefetching up to {} training batches in the background".format(prefetch_depth))
+    else:
+        batch_source = problem
+
     # Model validation interval (DEFAULT: 100).
     try:
         model_validation_interval = param_interface['training'][
@@ -355,6 +384,49 @@ if __name__ == '__main__':
             model.parameters()),
         **optimizer_conf)
 
+    # Check if truncated backpropagation through time should be used
+    # (DEFAULT: 0, i.e. backpropagate through whole episodes).
+    try:
+        truncation_length = param_interface['training']['truncated_bptt_length']
+    except KeyError:
+        truncation_length = 0
+
+    if truncation_length > 0:
+        # Both model and problem must support it - check it once, here.
+        if not model.supports_truncated_bptt:
+            logger.error("Model {} does not support truncated backpropagation through time "
+                         "(truncated_bptt_length), exiting".format(model_name))
+            exit(-1)
+        if not hasattr(problem, 'slice_sequences'):
+            logger.error("Problem {} does not support truncated backpropagation through time "
+                         "(truncated_bptt_length), exiting".format(task_name))
+            exit(-1)
+
+    def optimization_step(loss):
+        """
+        Performs backward gradient flow, (optional) gradient clipping and
+        optimization step.
+
+        :param loss: Loss to be minimized.
+
+        """
+        # reset gradients
+        optimizer.zero_grad()
+        # Backward gradient flow.
+        loss.backward()
+        # Check the presence of parameter 'gradient_clipping'.
+        try:
+            # if present - clip gradients to a range (-gradient_clipping,
+            # gradient_clipping)
+            val = param_interface['training']['gradient_clipping']
+            nn.utils.clip_grad_value_(model.parameters(), val)
+        except KeyError:
+            # Else - do nothing.
+            pass
+
+        # Perform optimization.
+        optimizer.step()
+
     # Ok, finished loading the configuration.
     # Save the resulting configuration into a yaml settings file, under log_dir
     with open(log_dir + "training_configuration.yaml", 'w') as yaml_backup_file:
@@ -382,13 +454,10 @@ if __name__ == '__main__':
     terminal_condition = False
 
     # Main training and verification loop.
-    for data_tuple, aux_tuple in problem.return_generator():
+    for data_tuple, aux_tuple in batch_source.return_generator():
 
         # apply curriculum learning - change problem max seq_length
-        curric_done = problem.curriculum_learning_update_params(episode)
-
-        # reset gradients
-        optimizer.zero_grad()
+        curric_done = batch_source.curriculum_learning_update_params(episode)
 
         # Check visualization flag - turn on when we wanted to visualize (at
         # least) validation.
@@ -399,9 +468,19 @@ if __name__ == '__main__':
 
         # Turn on training mode.
         model.train()
-        # 1. Perform forward step, calculate logits and loss.
-        logits, loss = forward_step(
-            model, problem, episode, stat_col, data_tuple, aux_tuple)
+        if truncation_length > 0:
+            # 1-3. Perform forward step, backward gradient flow and
+            # optimization window by window.
+            logits, loss = truncated_forward_step(
+                model, problem, episode, stat_col, data_tuple, aux_tuple,
+                truncation_length, optimization_step)
+        else:
+            # 1. Perform forward step, calculate logits and loss.
+            logits, loss = forward_step(
+                model, problem, episode, stat_col, data_tuple, aux_tuple)
+
+            # 2-3. Backward gradient flow and optimization.
+            optimization_step(loss)
 
         if not use_validation_problem:
             # Store the calculated loss on a list.
@@ -410,21 +489,6 @@ if __name__ == '__main__':
             if len(last_losses) > loss_length:
                 last_losses.popleft()
 
-        # 2. Backward gradient flow.
-        loss.backward()
-        # Check the presence of parameter 'gradient_clipping'.
-        try:
-            # if present - clip gradients to a range (-gradient_clipping,
-            # gradient_clipping)
-            val = param_interface['training']['gradient_clipping']
-            nn.utils.clip_grad_value_(model.parameters(), val)
-        except KeyError:
-            # Else - do nothing.
-            pass
-
-        # 3. Perform optimization.
-        optimizer.step()
-
         # 4. Log statistics.
         # Log to logger.
         logger.info(stat_col.export_statistics_to_string())
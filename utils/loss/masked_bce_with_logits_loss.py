@@ -57,11 +57,12 @@ class MaskedBCEWithLogitsLoss(nn.Module):
         # Set the loss per element to zero for unneeded output
         masked_loss_per = mask_float * loss_per_element
 
-        # obtain the number of non-zero elements in the mask.
-        # nonzero() returns the indices so you have to divide by the number of dimensions
+        # obtain the number of non-zero elements in the mask (i.e. outputs of
+        # all samples, no matter how long they are) - summed as floats, so
+        # no index tensor is created.
         # The mask lacks the last dimension of the targets so needs to be
         # scaled up
-        size = mask.nonzero().numel() / len(mask.shape) * logits.shape[-1]
+        size = mask_float.sum() * logits.shape[-1]
 
         loss = torch.sum(masked_loss_per) / size
 
@@ -85,7 +86,7 @@ class MaskedBCEWithLogitsLoss(nn.Module):
 
         # The mask lacks the last dimension of the targets so needs to be
         # scaled up
-        size = mask.nonzero().numel() / len(mask.shape) * logits.shape[-1]
+        size = mask_float.sum().item() * logits.shape[-1]
 
         masked_acc_per = mask_float * acc_per
 
@@ -59,10 +59,9 @@ class MaskedCrossEntropyLoss(nn.Module):
         # Set the loss per element to zero for unneeded output
         masked_loss_per = mask_float * loss_per_element
 
-        # obtain the number of non-zero elements in the mask.
-        # nonzero() returns the indices so you have to divide by the number of
-        # dimensions
-        size = mask.nonzero().numel() / len(mask.shape)
+        # obtain the number of non-zero elements in the mask - summed as
+        # floats, so no index tensor is created.
+        size = mask_float.sum()
 
         # add up the loss scaling by only the needed outputs
         loss = torch.sum(masked_loss_per) / size
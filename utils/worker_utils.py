@@ -56,6 +56,60 @@ def forward_step(model, problem, episode, stat_col, data_tuple, aux_tuple):
     return logits, loss
 
 
+def truncated_forward_step(model, problem, episode, stat_col, data_tuple,
+                           aux_tuple, truncation_length, optimization_step):
+    """
+    Function performs a single forward step with truncated backpropagation
+    through time: the episode is split into windows of truncation_length
+    items and the loss of every window is passed to optimization_step (e.g.
+    performing backward pass and updating the parameters) just after the
+    model processes the window. The model state is detached between windows.
+
+    Loss and statistics are collected for the whole episode.
+
+    :param truncation_length: Number of items in window.
+    :param optimization_step: Function called with the loss of every window.
+    :returns: logits (detached) and loss of the whole episode
+
+    """
+    # convert to CUDA
+    if AppState().use_CUDA:
+        data_tuple, aux_tuple = problem.turn_on_cuda(data_tuple, aux_tuple)
+
+    def window_step(start, window_logits):
+        # Get targets (and mask) of window.
+        window_tuples = problem.slice_sequences(
+            data_tuple, aux_tuple, start, start + window_logits.size(1))
+        # Skip windows with nothing to evaluate.
+        if window_tuples is None:
+            return
+        window_data_tuple, window_aux_tuple = window_tuples
+        # Evaluate loss of window and optimize.
+        optimization_step(problem.evaluate_loss(
+            window_data_tuple, window_logits, window_aux_tuple))
+
+    # Perform forward calculation, backpropagating window by window.
+    model.set_truncated_bptt(truncation_length, window_step)
+    try:
+        logits = model(data_tuple)
+    finally:
+        model.set_truncated_bptt(0)
+
+    # Evaluate loss function - over the whole episode.
+    loss = problem.evaluate_loss(data_tuple, logits, aux_tuple)
+
+    # Collect "elementary" statistics - episode and loss.
+    stat_col['episode'] = episode
+    stat_col['loss'] = loss
+
+    # Collect other (potential) statistics from problem & model.
+    problem.collect_statistics(stat_col, data_tuple, logits, aux_tuple)
+    model.collect_statistics(stat_col, data_tuple, logits)
+
+    # Return tuple: logits, loss.
+    return logits, loss
+
+
 def check_and_set_cuda(params, logger):
     """
     Enables Cuda if available and sets the default data types.